@@ -1,5 +1,6 @@
 """Админ-команды бота (отдельный Router)."""
 
+import asyncio
 import io
 import logging
 
@@ -16,6 +17,7 @@ from db import db_commands
 from db.download_log import get_today_stats
 from data import config
 from models import User
+import route_health
 import yt_cookie_utils
 
 admin_router = Router(name="admin")
@@ -111,6 +113,50 @@ async def stats_command(message: Message, session: AsyncSession) -> None:
     await message.answer(text, parse_mode="Markdown")
 
 
+@admin_router.message(Command("health"))
+async def health_command(message: Message, session: AsyncSession) -> None:
+    """Здоровье прокси и cookie-слотов: доля успехов, задержки, последняя ошибка (только для админов)"""
+    user = await db_commands.get_item(User, "tg_id", message.from_user.id, message, session)
+    if user is None or not user.is_admin:
+        await message.answer("У вас нет прав!")
+        return
+
+    try:
+        routes = await asyncio.to_thread(route_health.snapshot)
+    except Exception as e:
+        logger.error(f"route_health.snapshot: {e}")
+        await message.answer("Не удалось прочитать статистику маршрутов.")
+        return
+    if not routes:
+        await message.answer("Статистики по прокси, cookies и доставке пока нет.")
+        return
+
+    state_icons = {"ok": "🟢", "half-open": "🟡", "open": "🔴"}
+    kind_titles = {
+        route_health.KIND_PROXY: "🌐 **Прокси (YouTube):**",
+        route_health.KIND_INSTAGRAM_PROXY: "🌐 **Прокси (Instagram):**",
+        route_health.KIND_INSTAGRAM_COOKIE: "🍪 **Cookies Instagram:**",
+        route_health.KIND_DELIVERY: "📤 **Доставка:**",
+    }
+
+    text = "🩺 **Здоровье маршрутов**\n"
+    kind = None
+    for r in routes:
+        if r["kind"] != kind:
+            kind = r["kind"]
+            text += f"\n{kind_titles.get(kind, kind)}\n"
+        rate = f"{r['success_rate'] * 100:.0f}%" if r["success_rate"] is not None else "—"
+        latency = (
+            f"p50 {r['p50']:.1f}s / p95 {r['p95']:.1f}s" if r["p50"] is not None else "нет удачных"
+        )
+        text += f"  {state_icons.get(r['state'], '⚪')} `{r['route']}` — {rate} из {r['attempts']}, {latency}"
+        if r["last_error"]:
+            text += f", ошибка: `{r['last_error']}`"
+        text += "\n"
+
+    await message.answer(text, parse_mode="Markdown")
+
+
 @admin_router.message(Command("grant_admin"))
 async def command_grant_admin(
     message: Message, command: CommandObject, session: AsyncSession
@@ -0,0 +1,201 @@
+"""
+Стриминг аудио Mini App через API: /audio/{id}/stream вместо ссылки api.telegram.org/file/bot<TOKEN>/...
+
+Ссылка подписана (HMAC от токена бота, срок STREAM_LINK_TTL) — токен бота клиенту не уходит,
+а <audio> может запрашивать её без заголовков авторизации. Range/206 поддерживается:
+- трек в кеше на диске — отдаётся с диска (полный файл — FileResponse, диапазон — кусками из файла);
+- иначе запрос (с тем же Range) проксируется в Telegram потоком, без буферизации всего файла.
+Трек, который запросили AUDIO_CACHE_MIN_PLAYS раз, в фоне скачивается целиком в AUDIO_CACHE_DIR;
+кеш ограничен AUDIO_CACHE_MAX_MB (вытесняются давно не игравшие).
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from typing import AsyncIterator, Dict, Iterable, Optional, Tuple
+
+from cache_utils import evict_lru
+from data.config import (
+    AUDIO_CACHE_DIR,
+    AUDIO_CACHE_MAX_MB,
+    AUDIO_CACHE_MIN_PLAYS,
+    BOT_TOKEN,
+    STREAM_LINK_TTL,
+    STREAM_PREFETCH_CONCURRENCY,
+)
+from api import telegram_files
+
+logger = logging.getLogger(__name__)
+
+_CHUNK = 64 * 1024
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_SECRET = hashlib.sha256(b"audio-stream:" + BOT_TOKEN.encode()).digest()
+
+_plays: Counter = Counter()
+_caching: Dict[str, asyncio.Task] = {}
+_prefetching = set()
+
+
+# ==================== Подписанные ссылки ====================
+
+def _signature(audio_id: int, expires: int) -> str:
+    return hmac.new(_SECRET, f"{audio_id}:{expires}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def signed_url(audio_id: int) -> Tuple[str, int]:
+    """(/api/audio/{id}/stream?exp=...&sig=..., срок в сек)."""
+    expires = int(time.time()) + STREAM_LINK_TTL
+    return f"/api/audio/{audio_id}/stream?exp={expires}&sig={_signature(audio_id, expires)}", STREAM_LINK_TTL
+
+
+def verify(audio_id: int, expires: int, sig: str) -> bool:
+    return expires >= time.time() and hmac.compare_digest(_signature(audio_id, expires), sig or "")
+
+
+# ==================== Range ====================
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    'bytes=a-b' → (start, end) включительно; None — заголовка нет / он многодиапазонный (отдаём весь файл).
+    ValueError — диапазон вне файла (416).
+    """
+    match = _RANGE.match((header or "").strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+async def iter_file(path: str, start: int, end: int) -> AsyncIterator[bytes]:
+    """Кусок файла [start, end] без чтения целиком."""
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        left = end - start + 1
+        while left > 0:
+            chunk = await asyncio.to_thread(f.read, min(_CHUNK, left))
+            if not chunk:
+                break
+            left -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+# ==================== Кеш популярных треков ====================
+
+def cache_key(file_id: str, file_unique_id: Optional[str] = None) -> str:
+    return file_unique_id or hashlib.sha1(file_id.encode()).hexdigest()
+
+
+def cached_path(key: str) -> Optional[str]:
+    """Путь в кеше (mtime обновляется — для LRU) или None."""
+    path = os.path.join(AUDIO_CACHE_DIR, key)
+    try:
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+
+def media_type(file_path: Optional[str]) -> str:
+    return mimetypes.guess_type(file_path or "")[0] or "audio/mpeg"
+
+
+def sniff_type(path: str) -> str:
+    """Тип файла из кеша по сигнатуре (расширение там не хранится)."""
+    with open(path, "rb") as f:
+        head = f.read(12)
+    if head[4:8] == b"ftyp":
+        return "audio/mp4"
+    if head.startswith(b"OggS"):
+        return "audio/ogg"
+    if head.startswith(b"fLaC"):
+        return "audio/flac"
+    return "audio/mpeg"
+
+
+def _evict() -> None:
+    # .* — временные файлы загрузок, которые ещё идут
+    evict_lru(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_MB * 1024 * 1024, lambda name: not name.startswith("."))
+
+
+async def _download(key: str, file_id: str) -> None:
+    os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".", dir=AUDIO_CACHE_DIR)
+    os.close(fd)
+    try:
+        file_path = await telegram_files.get_file_path(file_id)
+        async with telegram_files.get_client().stream("GET", telegram_files.file_url(file_path)) as response:
+            if response.status_code != 200:
+                return
+            with open(tmp, "wb") as f:
+                async for chunk in response.aiter_bytes(_CHUNK):
+                    await asyncio.to_thread(f.write, chunk)
+        os.replace(tmp, os.path.join(AUDIO_CACHE_DIR, key))
+        await asyncio.to_thread(_evict)
+        logger.info(f"audio_stream: cached {key}")
+    except Exception as e:
+        logger.warning(f"audio_stream: caching {key} failed: {e}")
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def note_play(key: str, file_id: str, range_start: int) -> None:
+    """Засчитать прослушивание (перемотки не считаем) и при достаточной популярности закешировать трек."""
+    if range_start:
+        return
+    if len(_plays) > 10000:
+        _plays.clear()
+    _plays[key] += 1
+    if _plays[key] < AUDIO_CACHE_MIN_PLAYS or key in _caching:
+        return
+    task = asyncio.create_task(_download(key, file_id))
+    _caching[key] = task
+    task.add_done_callback(lambda _: (_caching.pop(key, None), _plays.pop(key, None)))
+
+
+async def _warm(file_ids: Iterable[str]) -> None:
+    semaphore = asyncio.Semaphore(max(1, STREAM_PREFETCH_CONCURRENCY))
+
+    async def one(file_id: str) -> None:
+        async with semaphore:
+            try:
+                await telegram_files.get_file_path(file_id)
+            except telegram_files.TelegramFileError as e:
+                logger.warning(f"audio_stream: prefetch getFile failed: {e}")
+
+    await asyncio.gather(*(one(file_id) for file_id in file_ids))
+
+
+def prefetch(tracks: Iterable[Tuple[str, Optional[str]]]) -> None:
+    """
+    В фоне прогреть кеш getFile для треков очереди ((file_id, file_unique_id)), кроме лежащих на диске:
+    первый байт следующего трека не ждёт Telegram. Не больше STREAM_PREFETCH_CONCURRENCY запросов сразу.
+    """
+    file_ids = [
+        file_id for file_id, unique_id in tracks
+        if not os.path.isfile(os.path.join(AUDIO_CACHE_DIR, cache_key(file_id, unique_id)))
+    ]
+    if not file_ids:
+        return
+    task = asyncio.create_task(_warm(file_ids))
+    _prefetching.add(task)
+    task.add_done_callback(_prefetching.discard)
@@ -0,0 +1,127 @@
+"""
+Кеш обложек для /audio/{id}/cover на диске.
+
+Ключ — thumbnail_file_id Telegram или video_id YouTube. Оригинал и уменьшенные варианты
+(COVER_VARIANT_SIZES, например 96 px для списков) лежат в COVER_CACHE_DIR и отдаются с диска;
+превью генерируются Pillow'ом один раз при сохранении оригинала. Размер кеша ограничен
+COVER_CACHE_MAX_MB — вытесняются файлы, к которым дольше всего не обращались (mtime обновляется
+при попадании). Содержимое ключа не меняется, поэтому ETag зависит только от ключа, варианта и размера файла.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from typing import Awaitable, Callable, Optional
+
+from PIL import Image
+
+from cache_utils import KeyedLocks, evict_lru
+from data.config import COVER_CACHE_DIR, COVER_CACHE_MAX_MB, COVER_VARIANT_SIZES
+
+logger = logging.getLogger(__name__)
+
+_SAFE_KEY = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_locks = KeyedLocks()
+
+
+def _file_key(key: str) -> str:
+    """video_id годится как имя файла; file_id Telegram длинный — берём хеш."""
+    return key if _SAFE_KEY.match(key) else hashlib.sha1(key.encode()).hexdigest()
+
+
+def variant_size(size: Optional[int]) -> Optional[int]:
+    """Ближайший готовый вариант не меньше запрошенного; None — оригинал."""
+    if not size:
+        return None
+    return next((s for s in sorted(COVER_VARIANT_SIZES) if s >= size), None)
+
+
+def _path(key: str, size: Optional[int]) -> str:
+    suffix = f"_{size}" if size else ""
+    return os.path.join(COVER_CACHE_DIR, f"{_file_key(key)}{suffix}.jpg")
+
+
+def etag(key: str, size: Optional[int], path: str) -> str:
+    digest = hashlib.sha1(f"{key}:{size or 0}:{os.path.getsize(path)}".encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def _atomic_write(dest: str, write: Callable) -> None:
+    fd, tmp = tempfile.mkstemp(prefix=".", suffix=".jpg", dir=COVER_CACHE_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _make_variant(original: str, dest: str, size: int) -> None:
+    with Image.open(original) as img:
+        img = img.convert("RGB")
+        img.thumbnail((size, size), Image.LANCZOS)
+        _atomic_write(dest, lambda f: img.save(f, "JPEG", quality=85))
+
+
+def _store(key: str, data: bytes) -> None:
+    """Оригинал + все варианты; битая картинка остаётся только оригиналом."""
+    os.makedirs(COVER_CACHE_DIR, exist_ok=True)
+    original = _path(key, None)
+    _atomic_write(original, lambda f: f.write(data))
+    for size in COVER_VARIANT_SIZES:
+        try:
+            _make_variant(original, _path(key, size), size)
+        except Exception as e:
+            logger.warning(f"cover_cache: variant {size} for {key[:16]}: {e}")
+            break
+
+
+def _evict() -> None:
+    # Временные файлы _atomic_write (.*.jpg) не трогаем — их ещё дописывают
+    evict_lru(COVER_CACHE_DIR, COVER_CACHE_MAX_MB * 1024 * 1024,
+              lambda name: name.endswith(".jpg") and not name.startswith("."))
+
+
+def _hit(path: str) -> bool:
+    try:
+        os.utime(path)
+        return True
+    except OSError:
+        return False
+
+
+async def get_cover(
+    key: str,
+    fetch: Callable[[], Awaitable[Optional[bytes]]],
+    size: Optional[int] = None,
+) -> Optional[str]:
+    """
+    Путь к обложке (варианту size, если он есть, иначе к оригиналу).
+    fetch() вызывается только при промахе и только одним запросом на ключ.
+    """
+    path = _path(key, size)
+    if _hit(path):
+        return path
+    async with _locks.hold(key):
+        if _hit(path):
+            return path
+        original = _path(key, None)
+        if not _hit(original):
+            data = await fetch()
+            if not data:
+                return None
+            await asyncio.to_thread(_store, key, data)
+            await asyncio.to_thread(_evict)
+        elif size:
+            try:
+                await asyncio.to_thread(_make_variant, original, path, size)
+            except Exception as e:
+                logger.warning(f"cover_cache: variant {size} for {key[:16]}: {e}")
+    if os.path.isfile(path):
+        return path
+    return original if os.path.isfile(original) else None
@@ -0,0 +1,252 @@
+"""
+Импорт трека с YouTube в библиотеку Mini App фоновой задачей.
+
+POST /youtube/import сразу возвращает задачу; статус — GET /youtube/import/{job} или поток SSE.
+Скачивание идёт через общую очередь (jobs.run_job('youtube_audio') — пул процессов или consumer),
+одновременно не больше IMPORT_CONCURRENCY скачиваний из API. Одно видео импортируется за раз:
+остальные импорты того же video_id (в т.ч. других пользователей) ждут и получают уже загруженный
+в Telegram файл — sendAudio по file_id из media_cache, без скачивания.
+Задачи живут в памяти процесса API; завершённые хранятся IMPORT_JOB_TTL сек.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+
+import bot_api
+import jobs
+import thumbnails
+import worker
+from cache_utils import KeyedLocks
+from api.deps import async_session_maker
+from api.telegram_upload import notify_dev_channel, send_audio_to_telegram_user
+from data.config import IMPORT_CONCURRENCY, IMPORT_JOB_TTL
+from db.audio_commands import get_audio_by_file_id
+from db.audio_helper import save_audio_from_api_response
+from db.download_log import log_download
+from db.media_cache import drop_cached_media, get_cached_media, save_cached_media
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+UPLOADING = "uploading"
+DONE = "done"
+FAILED = "failed"
+
+
+class ImportFailed(Exception):
+    """Импорт не удался; текст — для пользователя (поле error задачи)."""
+
+
+@dataclass
+class ImportJob:
+    id: str
+    user_id: int
+    video_id: str
+    user_label: str = ""
+    status: str = QUEUED
+    audio_id: Optional[int] = None  # status=done
+    error: Optional[str] = None  # status=failed
+    finished_at: Optional[float] = None
+    version: int = 0  # растёт при каждой смене статуса
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def link(self) -> str:
+        return f"https://www.youtube.com/watch?v={self.video_id}"
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def update(self, status: str, **values) -> None:
+        self.status = status
+        for name, value in values.items():
+            setattr(self, name, value)
+        if self.finished:
+            self.finished_at = time.monotonic()
+        self.version += 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_change(self, timeout: float) -> bool:
+        """Дождаться следующей смены статуса; False — за timeout ничего не изменилось."""
+        changed = self._changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+_jobs: Dict[str, ImportJob] = {}
+_tasks: Set[asyncio.Task] = set()
+_video_locks = KeyedLocks()
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _prune() -> None:
+    now = time.monotonic()
+    for job in list(_jobs.values()):
+        if job.finished and now - job.finished_at > IMPORT_JOB_TTL:
+            _jobs.pop(job.id, None)
+
+
+def get_job(job_id: str, user_id: int) -> Optional[ImportJob]:
+    """Задача пользователя (чужие не видны)."""
+    job = _jobs.get(job_id)
+    return job if job and job.user_id == user_id else None
+
+
+def completed(user_id: int, video_id: str, audio_id: int) -> ImportJob:
+    """Завершённая задача для трека, который уже есть в библиотеке."""
+    _prune()
+    job = ImportJob(uuid.uuid4().hex, user_id, video_id)
+    job.update(DONE, audio_id=audio_id)
+    _jobs[job.id] = job
+    return job
+
+
+def start(user_id: int, video_id: str, user_label: str) -> ImportJob:
+    """Запустить импорт в фоне; повторный запрос того же видео тем же пользователем — та же задача."""
+    _prune()
+    for job in _jobs.values():
+        if job.user_id == user_id and job.video_id == video_id and not job.finished:
+            return job
+    job = ImportJob(uuid.uuid4().hex, user_id, video_id, user_label)
+    _jobs[job.id] = job
+    task = asyncio.create_task(_run(job))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+
+
+async def _run(job: ImportJob) -> None:
+    try:
+        job.update(DONE, audio_id=await _import(job))
+    except ImportFailed as e:
+        job.update(FAILED, error=str(e))
+    except Exception as e:
+        logger.exception("youtube import %s failed: %s", job.video_id, e)
+        job.update(FAILED, error="Не удалось добавить трек")
+    if job.status == FAILED:
+        async with async_session_maker() as db:
+            await log_download(db, job.user_id, "audio", job.link, status=False)
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(max(1, IMPORT_CONCURRENCY))
+    return _semaphore
+
+
+async def _import(job: ImportJob) -> int:
+    audio_id = await _send_cached(job)
+    if audio_id:
+        return audio_id
+    async with _video_locks.hold(job.video_id):
+        # Пока ждали, это видео мог загрузить импорт другого пользователя — тогда оно уже в кеше
+        audio_id = await _send_cached(job)
+        if audio_id:
+            return audio_id
+        async with _get_semaphore():
+            return await _download_and_send(job)
+
+
+async def _send_cached(job: ImportJob) -> Optional[int]:
+    """Отправить уже загруженный в Telegram файл по file_id; None — в кеше нет или file_id отвергнут."""
+    async with async_session_maker() as db:
+        entry = await get_cached_media(db, job.link, "audio")
+        if not entry or entry.media_type != "audio":
+            return None
+        job.update(UPLOADING)
+        tg_resp = await bot_api.call(
+            "sendAudio", {"chat_id": job.user_id, "audio": entry.file_id}, base=bot_api.CLOUD_BASE
+        )
+        if not tg_resp.get("ok"):
+            logger.warning(f"media_cache: file_id rejected for {entry.source_key}: {tg_resp.get('description')}")
+            await drop_cached_media(db, entry)
+            return None
+        logger.info(f"media_cache hit: {entry.source_key} [{entry.variant}] -> Mini App user {job.user_id}")
+        return await _save(db, job, tg_resp)
+
+
+async def _download_and_send(job: ImportJob) -> int:
+    job.update(DOWNLOADING)
+    try:
+        result = await jobs.run_job("youtube_audio", link=job.link)
+    except Exception as e:
+        logger.exception("youtube_audio job: %s", e)
+        raise ImportFailed("Не удалось скачать аудио с YouTube") from e
+    if not result or not result.get("audio"):
+        raise ImportFailed("Видео недоступно или ошибка загрузки")
+
+    audio_path = result["audio"]
+    thumb_path = result.get("thumbnail")
+    try:
+        if not os.path.isfile(audio_path):
+            raise ImportFailed("Файл аудио не найден после загрузки")
+
+        title = os.path.splitext(os.path.basename(audio_path))[0].replace("_", " ")
+        performer = ""
+        try:
+            info = await asyncio.to_thread(worker.get_youtube_video_info, job.link)
+            if info:
+                title = info.get("title") or title
+                performer = info.get("channel") or ""
+        except Exception:
+            pass
+
+        job.update(UPLOADING)
+        tg_resp = await send_audio_to_telegram_user(
+            chat_id=job.user_id,
+            audio_path=audio_path,
+            thumbnail_path=thumb_path if thumb_path and os.path.isfile(thumb_path) else None,
+            title=title,
+            performer=performer,
+        )
+    finally:
+        try:
+            if os.path.isfile(audio_path):
+                os.remove(audio_path)
+            thumbnails.discard(thumb_path)
+        except OSError as e:
+            logger.warning("cleanup temp audio: %s", e)
+
+    if not tg_resp.get("ok"):
+        logger.error("sendAudio failed: %s", tg_resp)
+        raise ImportFailed(str(tg_resp.get("description", "Telegram error")))
+
+    async with async_session_maker() as db:
+        return await _save(db, job, tg_resp)
+
+
+async def _save(db, job: ImportJob, tg_resp: dict) -> int:
+    """Трек из ответа sendAudio → библиотека пользователя и media_cache; возвращает id трека."""
+    saved_ok = await save_audio_from_api_response(
+        db, job.user_id, tg_resp, source="youtube", source_url=job.link
+    )
+    if not saved_ok:
+        raise ImportFailed("Не удалось сохранить трек в библиотеке")
+
+    audio = (tg_resp.get("result") or {}).get("audio") or {}
+    file_id = audio.get("file_id")
+    if not file_id:
+        raise ImportFailed("Нет file_id в ответе Telegram")
+    await save_cached_media(db, job.link, "audio", "audio", file_id, file_unique_id=audio.get("file_unique_id"))
+
+    audio_row = await get_audio_by_file_id(db, file_id, job.user_id)
+    if not audio_row:
+        raise ImportFailed("Трек не найден в БД после сохранения")
+
+    await notify_dev_channel(
+        f"Пользователь {job.user_label} искал: Mini App поиск и успешно скачал аудио из #YouTube"
+    )
+    await log_download(db, job.user_id, "audio", job.link, status=True)
+    return audio_row.id
@@ -4,6 +4,11 @@ from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 
+import bot_api
+import thumbnails
+import workspace
+import yt_search
+from api import telegram_files
 from api.deps import get_db, get_user_id
 from api.routes import audio, playlists, favorites, search
 from api.schemas import UserStatsResponse
@@ -34,6 +39,21 @@ app.include_router(favorites.router)
 app.include_router(search.router)
 
 
+@app.on_event("startup")
+async def _startup():
+    telegram_files.get_client()
+    await workspace.start_janitor()
+
+
+@app.on_event("shutdown")
+async def _shutdown():
+    await workspace.stop_janitor()
+    await bot_api.close_session()
+    await thumbnails.close_session()
+    await yt_search.close_session()
+    await telegram_files.close_client()
+
+
 @app.get("/")
 async def root():
     """Проверка работоспособности API"""
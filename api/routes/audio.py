@@ -1,41 +1,38 @@
 """Роуты для аудио"""
 
+import os
 import re
-import httpx
 from typing import Optional, Set
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import RedirectResponse, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from api.deps import get_db, get_user_id
-from api.schemas import AudioListResponse, AudioResponse, AudioStreamUrlResponse
+from api.schemas import (
+    AudioListResponse,
+    AudioResponse,
+    AudioStreamUrlBatchRequest,
+    AudioStreamUrlBatchResponse,
+    AudioStreamUrlResponse,
+)
 from db.audio_commands import (
     get_user_audio_list, 
     get_audio_by_id, 
+    get_user_audio_by_ids,
     delete_audio, 
     count_user_audio,
     is_audio_favorite
 )
+from api import audio_stream, cover_cache, telegram_files
 from models import Favorite
-from data.config import BOT_TOKEN
 
 
 router = APIRouter(prefix="/audio", tags=["Audio"])
 
-# Telegram Bot API base URL
-TELEGRAM_API_URL = f"https://api.telegram.org/bot{BOT_TOKEN}"
-TELEGRAM_FILE_URL = f"https://api.telegram.org/file/bot{BOT_TOKEN}"
-
-# Кеш для обложек (file_id -> url, expires_at)
-_cover_cache: dict = {}
-
-
-def get_youtube_thumbnail_url(source_url: Optional[str]) -> Optional[str]:
-    """
-    Генерирует прямой URL обложки YouTube.
-    Используется как fallback в endpoint /cover.
-    """
+def get_youtube_video_id(source_url: Optional[str]) -> Optional[str]:
+    """video_id из ссылки YouTube (или сам id)."""
     if not source_url:
         return None
     
@@ -48,12 +45,20 @@ def get_youtube_thumbnail_url(source_url: Optional[str]) -> Optional[str]:
     for pattern in patterns:
         match = re.search(pattern, source_url)
         if match:
-            video_id = match.group(1)
-            return f"https://img.youtube.com/vi/{video_id}/mqdefault.jpg"
+            return match.group(1)
     
     return None
 
 
+def get_youtube_thumbnail_url(source_url: Optional[str]) -> Optional[str]:
+    """
+    Генерирует прямой URL обложки YouTube.
+    Используется как fallback в endpoint /cover.
+    """
+    video_id = get_youtube_video_id(source_url)
+    return f"https://img.youtube.com/vi/{video_id}/mqdefault.jpg" if video_id else None
+
+
 def get_thumbnail_url(source: Optional[str], source_url: Optional[str]) -> Optional[str]:
     """Для обратной совместимости"""
     if source == 'youtube':
@@ -128,6 +133,45 @@ async def list_audio(
     )
 
 
+@router.post("/stream-urls", response_model=AudioStreamUrlBatchResponse)
+async def get_stream_urls(
+    data: AudioStreamUrlBatchRequest,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Ссылки для стриминга всех треков очереди одним запросом (как /{id}/stream-url для каждого).
+    
+    Владение проверяется одним запросом к БД; getFile для треков прогревается в фоне
+    (ограниченно по параллельности), чтобы переход на следующий трек не ждал Telegram.
+    """
+    audio_ids = list(dict.fromkeys(data.audio_ids))
+    audio_list = await get_user_audio_by_ids(db, user_id, audio_ids)
+    by_id = {audio.id: audio for audio in audio_list}
+    
+    items = []
+    for audio_id in audio_ids:
+        audio = by_id.get(audio_id)
+        if audio is None:
+            continue
+        url, expires_in = audio_stream.signed_url(audio.id)
+        items.append(AudioStreamUrlResponse(
+            url=url,
+            expires_in=expires_in,
+            file_id=audio.file_id,
+            audio_id=audio.id,
+            title=audio.title,
+            artist=audio.artist,
+            duration=audio.duration
+        ))
+    audio_stream.prefetch((audio.file_id, audio.file_unique_id) for audio in audio_list)
+    
+    return AudioStreamUrlBatchResponse(
+        items=items,
+        missing=[audio_id for audio_id in audio_ids if audio_id not in by_id],
+    )
+
+
 @router.get("/{audio_id}", response_model=AudioResponse)
 async def get_audio(
     audio_id: int,
@@ -191,7 +235,8 @@ async def get_stream_url(
     """
     Получить временный URL для стриминга аудио.
     
-    ⚠️ **URL действителен ~1 час!**
+    ⚠️ **URL действителен `expires_in` сек!** Это подписанная ссылка на `/audio/{id}/stream`
+    (токен бота клиенту не передаётся, перемотка — через Range).
     
     ## Гибридный плеер:
     
@@ -210,47 +255,16 @@ async def get_stream_url(
     if audio.user_id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Получаем file_path через Telegram Bot API
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{TELEGRAM_API_URL}/getFile",
-                params={"file_id": audio.file_id},
-                timeout=10.0
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=502, 
-                    detail="Failed to get file from Telegram"
-                )
-            
-            data = response.json()
-            
-            if not data.get("ok"):
-                raise HTTPException(
-                    status_code=502, 
-                    detail=f"Telegram API error: {data.get('description', 'Unknown error')}"
-                )
-            
-            file_path = data["result"]["file_path"]
-            stream_url = f"{TELEGRAM_FILE_URL}/{file_path}"
-            
-            return AudioStreamUrlResponse(
-                url=stream_url,
-                expires_in=3600,  # ~1 час
-                file_id=audio.file_id,
-                audio_id=audio.id,
-                title=audio.title,
-                artist=audio.artist,
-                duration=audio.duration
-            )
-            
-    except httpx.RequestError as e:
-        raise HTTPException(
-            status_code=502, 
-            detail=f"Failed to connect to Telegram API: {str(e)}"
-        )
+    url, expires_in = audio_stream.signed_url(audio.id)
+    return AudioStreamUrlResponse(
+        url=url,
+        expires_in=expires_in,
+        file_id=audio.file_id,
+        audio_id=audio.id,
+        title=audio.title,
+        artist=audio.artist,
+        duration=audio.duration
+    )
 
 
 @router.post("/{audio_id}/refresh-url", response_model=AudioStreamUrlResponse)
@@ -268,9 +282,108 @@ async def refresh_stream_url(
     return await get_stream_url(audio_id, user_id, db)
 
 
+def _stream_headers(**extra: str) -> dict:
+    return {"Accept-Ranges": "bytes", "Cache-Control": "private, max-age=3600", **extra}
+
+
+def _stream_cached(path: str, range_header: Optional[str]) -> Response:
+    size = os.path.getsize(path)
+    media_type = audio_stream.sniff_type(path)
+    try:
+        byte_range = audio_stream.parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=_stream_headers())
+    start, end = byte_range
+    return StreamingResponse(
+        audio_stream.iter_file(path, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=_stream_headers(**{"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)}),
+    )
+
+
+async def _open_upstream(file_id: str, range_header: Optional[str]):
+    """Поток из Telegram; протухший file_path (404/403) — один повтор со свежим getFile."""
+    client = telegram_files.get_client()
+    headers = {"Range": range_header} if range_header else {}
+    for refresh in (False, True):
+        file_path = await telegram_files.get_file_path(file_id, refresh=refresh)
+        request = client.build_request("GET", telegram_files.file_url(file_path), headers=headers)
+        response = await client.send(request, stream=True)
+        if response.status_code not in (403, 404) or refresh:
+            return file_path, response
+        await response.aclose()
+
+
+@router.get("/{audio_id}/stream")
+async def stream_audio(
+    audio_id: int,
+    request: Request,
+    exp: int = Query(...),
+    sig: str = Query(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Аудио по подписанной ссылке из /stream-url (поддерживает Range для перемотки).
+    Популярные треки отдаются из кеша на диске, остальные — потоком из Telegram.
+    """
+    if not audio_stream.verify(audio_id, exp, sig):
+        raise HTTPException(status_code=403, detail="Link expired or invalid")
+    
+    audio = await get_audio_by_id(db, audio_id)
+    if not audio:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    
+    key = audio_stream.cache_key(audio.file_id, audio.file_unique_id)
+    range_header = request.headers.get("range")
+    path = audio_stream.cached_path(key)
+    if path:
+        return _stream_cached(path, range_header)
+    
+    try:
+        file_path, upstream = await _open_upstream(audio.file_id, range_header)
+    except telegram_files.TelegramFileError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to connect to Telegram API: {e}")
+    
+    if upstream.status_code not in (200, 206):
+        await upstream.aclose()
+        if upstream.status_code == 416:
+            return Response(status_code=416, headers={"Content-Range": upstream.headers.get("content-range", "")})
+        raise HTTPException(status_code=502, detail="Failed to get file from Telegram")
+    
+    match = audio_stream.parse_range(range_header, 1 << 62) if upstream.status_code == 206 else None
+    audio_stream.note_play(key, audio.file_id, match[0] if match else 0)
+    headers = _stream_headers(**{
+        name: upstream.headers[name]
+        for name in ("Content-Length", "Content-Range")
+        if name in upstream.headers
+    })
+    return StreamingResponse(
+        upstream.aiter_bytes(),
+        status_code=upstream.status_code,
+        media_type=audio_stream.media_type(file_path),
+        headers=headers,
+        background=BackgroundTask(upstream.aclose),
+    )
+
+
+async def _fetch_telegram_cover(file_id: str) -> Optional[bytes]:
+    try:
+        file_path = await telegram_files.get_file_path(file_id)
+    except telegram_files.TelegramFileError:
+        return None
+    return await telegram_files.fetch_bytes(telegram_files.file_url(file_path))
+
+
 @router.get("/{audio_id}/cover")
 async def get_audio_cover(
     audio_id: int,
+    request: Request,
+    size: Optional[int] = Query(None, ge=16, le=1280),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -281,73 +394,42 @@ async def get_audio_cover(
     2. YouTube thumbnail (если source='youtube')
     3. 404
     
-    Возвращает саму картинку (проксирование для обхода блокировок).
+    Картинка скачивается один раз и дальше отдаётся из кеша на диске (api/cover_cache.py);
+    size — готовое превью (например 96 для списков). Поддерживается If-None-Match → 304.
     """
-    import time
-    
     audio = await get_audio_by_id(db, audio_id)
     
     if not audio:
         raise HTTPException(status_code=404, detail="Audio not found")
     
-    cover_url = None
+    variant = cover_cache.variant_size(size)
+    path = None
+    key = None
     
     # 1. Пробуем Telegram thumbnail
     if audio.thumbnail_file_id:
-        cache_key = audio.thumbnail_file_id
-        now = time.time()
-        
-        # Проверяем кеш (URL валиден ~1 час, кешируем на 50 мин)
-        if cache_key in _cover_cache:
-            cached_url, expires_at = _cover_cache[cache_key]
-            if now < expires_at:
-                cover_url = cached_url
-        
-        if not cover_url:
-            # Получаем новый URL от Telegram
-            try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(
-                        f"{TELEGRAM_API_URL}/getFile",
-                        params={"file_id": audio.thumbnail_file_id},
-                        timeout=10.0
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data.get("ok"):
-                            file_path = data["result"]["file_path"]
-                            cover_url = f"{TELEGRAM_FILE_URL}/{file_path}"
-                            
-                            # Кешируем на 50 минут
-                            _cover_cache[cache_key] = (cover_url, now + 3000)
-            except httpx.RequestError:
-                pass
+        key = audio.thumbnail_file_id
+        path = await cover_cache.get_cover(key, lambda: _fetch_telegram_cover(audio.thumbnail_file_id), variant)
     
     # 2. Fallback на YouTube thumbnail
-    if not cover_url and audio.source == 'youtube':
-        cover_url = get_youtube_thumbnail_url(audio.source_url)
+    if not path and audio.source == 'youtube':
+        video_id = get_youtube_video_id(audio.source_url)
+        if video_id:
+            key = video_id
+            path = await cover_cache.get_cover(key, lambda: telegram_files.fetch_bytes(get_youtube_thumbnail_url(video_id)), variant)
     
     # 3. Нет обложки
-    if not cover_url:
+    if not key:
         raise HTTPException(status_code=404, detail="Cover not found")
-    
-    # Проксируем картинку через сервер
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(cover_url, timeout=15.0)
-            
-            if response.status_code == 200:
-                content_type = response.headers.get("content-type", "image/jpeg")
-                return Response(
-                    content=response.content,
-                    media_type=content_type,
-                    headers={
-                        "Cache-Control": "public, max-age=86400",  # Кешировать на сутки
-                    }
-                )
-    except httpx.RequestError:
-        pass
-    
-    raise HTTPException(status_code=502, detail="Failed to fetch cover")
-
+    if not path:
+        raise HTTPException(status_code=502, detail="Failed to fetch cover")
+    
+    served = variant if path.endswith(f"_{variant}.jpg") else None
+    tag = cover_cache.etag(key, served, path)
+    headers = {
+        "ETag": tag,
+        "Cache-Control": "public, max-age=86400",  # Кешировать на сутки
+    }
+    if tag in (request.headers.get("if-none-match") or ""):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
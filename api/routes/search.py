@@ -1,29 +1,93 @@
-"""Поиск по библиотеке + YouTube и импорт трека в библиотеку (Mini App)."""
+"""Поиск по библиотеке + YouTube и импорт трека в библиотеку (Mini App, фоновые задачи — api/import_jobs.py)."""
 
+import asyncio
+import json
 import logging
-import os
-from typing import Optional
+from typing import List, Set, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.deps import get_current_user, get_db, get_user_id
+from api import import_jobs
+from api.deps import async_session_maker, get_current_user, get_db, get_user_id
 from api.routes.audio import get_cover_url_for_audio, get_favorite_audio_ids
-from api.schemas import AudioResponse, CombinedSearchResponse, YouTubeImportRequest, YouTubeSearchItem
-from api.telegram_upload import notify_dev_channel, send_audio_to_telegram_user
-from db.download_log import log_download
+from api.schemas import (
+    AudioResponse,
+    CombinedSearchResponse,
+    YouTubeImportJobResponse,
+    YouTubeImportRequest,
+    YouTubeSearchItem,
+)
 from db.audio_commands import (
-    get_audio_by_file_id,
+    get_audio_by_id,
     get_audio_by_user_and_source_url,
     get_user_audio_list,
 )
-from db.audio_helper import save_audio_from_api_response
 import worker
+from data.config import SEARCH_YOUTUBE_TIMEOUT
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Search"])
 
+_background: Set[asyncio.Task] = set()
+
+
+async def _youtube_candidates(q: str) -> List[YouTubeSearchItem]:
+    yt_raw = await worker.search_youtube_music_candidates(
+        q, max_results=20, max_duration_sec=600, fetch_cap=50
+    )
+    return [YouTubeSearchItem(**x) for x in yt_raw]
+
+
+def _reap(task: asyncio.Task) -> None:
+    _background.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"YouTube search failed: {task.exception()}")
+
+
+def _start_youtube(q: str) -> asyncio.Task:
+    """Поиск YouTube отдельной задачей: идёт, пока читается библиотека, и не отменяется по таймауту."""
+    task = asyncio.create_task(_youtube_candidates(q))
+    _background.add(task)
+    task.add_done_callback(_reap)
+    return task
+
+
+async def _wait_youtube(task: asyncio.Task) -> Tuple[List[YouTubeSearchItem], bool]:
+    """(кандидаты, timed_out). По таймауту поиск не прерывается — его результат попадёт в кеш yt_search."""
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), SEARCH_YOUTUBE_TIMEOUT), False
+    except asyncio.TimeoutError:
+        logger.info(f"YouTube search exceeded {SEARCH_YOUTUBE_TIMEOUT}s, answering with library only")
+        return [], True
+    except Exception:
+        return [], False  # залогировано в _reap
+
+
+def _audio_response(a, favorite_ids: Set[int]) -> AudioResponse:
+    return AudioResponse(
+        id=a.id,
+        file_id=a.file_id,
+        title=a.title,
+        artist=a.artist,
+        duration=a.duration,
+        source=a.source,
+        source_url=a.source_url,
+        created_at=a.created_at,
+        is_favorite=a.id in favorite_ids,
+        thumbnail_url=get_cover_url_for_audio(a),
+    )
+
+
+async def _library_items(db: AsyncSession, user_id: int, q: str, limit: int) -> List[AudioResponse]:
+    library_rows = await get_user_audio_list(db, user_id, limit, 0, q)
+    favorite_ids = await get_favorite_audio_ids(db, user_id)
+
+    return [_audio_response(a, favorite_ids) for a in library_rows]
+
 
 @router.get("/search", response_model=CombinedSearchResponse)
 async def combined_search(
@@ -32,43 +96,66 @@ async def combined_search(
     user_id: int = Depends(get_user_id),
     db: AsyncSession = Depends(get_db),
 ):
-    """Треки из библиотеки + результаты поиска YouTube (музыка, до 10 мин)."""
-    library_rows = await get_user_audio_list(db, user_id, limit, 0, q.strip())
-    favorite_ids = await get_favorite_audio_ids(db, user_id)
+    """
+    Треки из библиотеки + результаты поиска YouTube (музыка, до 10 мин).
+    Библиотека и YouTube ищутся параллельно; YouTube ждём не дольше SEARCH_YOUTUBE_TIMEOUT.
+    """
+    youtube = _start_youtube(q.strip())
+    lib_items = await _library_items(db, user_id, q.strip(), limit)
+    yt_items, timed_out = await _wait_youtube(youtube)
+
+    return CombinedSearchResponse(library=lib_items, youtube=yt_items, youtube_timed_out=timed_out)
 
-    lib_items = [
-        AudioResponse(
-            id=a.id,
-            file_id=a.file_id,
-            title=a.title,
-            artist=a.artist,
-            duration=a.duration,
-            source=a.source,
-            source_url=a.source_url,
-            created_at=a.created_at,
-            is_favorite=a.id in favorite_ids,
-            thumbnail_url=get_cover_url_for_audio(a),
-        )
-        for a in library_rows
-    ]
-
-    yt_raw = worker.search_youtube_music_candidates(
-        q.strip(), max_results=20, max_duration_sec=600, fetch_cap=50
+
+@router.get("/search/stream")
+async def combined_search_stream(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(50, ge=1, le=100),
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    То же, что /search, но по частям (NDJSON): сначала строка {"library": [...]} сразу после запроса к БД,
+    затем {"youtube": [...], "youtube_timed_out": bool}, когда придёт выдача YouTube.
+    """
+    youtube = _start_youtube(q.strip())
+    lib_items = await _library_items(db, user_id, q.strip(), limit)
+
+    async def lines():
+        yield json.dumps({"library": jsonable_encoder(lib_items)}, ensure_ascii=False) + "\n"
+        yt_items, timed_out = await _wait_youtube(youtube)
+        yield json.dumps(
+            {"youtube": jsonable_encoder(yt_items), "youtube_timed_out": timed_out}, ensure_ascii=False
+        ) + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
     )
-    yt_items = [YouTubeSearchItem(**x) for x in yt_raw]
 
-    return CombinedSearchResponse(library=lib_items, youtube=yt_items)
+
+async def _import_job_response(db: AsyncSession, job: import_jobs.ImportJob) -> YouTubeImportJobResponse:
+    audio = None
+    if job.audio_id is not None:
+        row = await get_audio_by_id(db, job.audio_id)
+        if row:
+            audio = _audio_response(row, await get_favorite_audio_ids(db, job.user_id))
+    return YouTubeImportJobResponse(
+        job_id=job.id, video_id=job.video_id, status=job.status, audio=audio, error=job.error
+    )
 
 
-@router.post("/youtube/import", response_model=AudioResponse)
+@router.post("/youtube/import", response_model=YouTubeImportJobResponse, status_code=202)
 async def import_youtube_track(
     body: YouTubeImportRequest,
     user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
-    Скачивает аудио через worker (yt-dlp + ffmpeg), отправляет пользователю через Bot API,
-    сохраняет трек в БД — отображается в Mini App.
+    Ставит импорт в фон и сразу возвращает задачу: скачивание (yt-dlp + ffmpeg), отправка пользователю
+    через Bot API и сохранение в БД идут без удержания запроса. Статус — GET /youtube/import/{job_id}
+    или SSE /youtube/import/{job_id}/events. Трек, который уже есть в библиотеке, — сразу status=done.
     """
     user_id = user["id"]
     uname = user.get("username")
@@ -77,97 +164,53 @@ async def import_youtube_track(
 
     existing = await get_audio_by_user_and_source_url(db, user_id, link)
     if existing:
-        favorite_ids = await get_favorite_audio_ids(db, user_id)
-        return AudioResponse(
-            id=existing.id,
-            file_id=existing.file_id,
-            title=existing.title,
-            artist=existing.artist,
-            duration=existing.duration,
-            source=existing.source,
-            source_url=existing.source_url,
-            created_at=existing.created_at,
-            is_favorite=existing.id in favorite_ids,
-            thumbnail_url=get_cover_url_for_audio(existing),
-        )
-
-    try:
-        result = await worker.get_audio_from_youtube(link)
-    except Exception as e:
-        logger.exception("get_audio_from_youtube: %s", e)
-        raise HTTPException(status_code=502, detail="Не удалось скачать аудио с YouTube") from e
-
-    if not result:
-        raise HTTPException(status_code=502, detail="Видео недоступно или ошибка загрузки")
-
-    filename = result["audio"]
-    thumb_path = result.get("thumbnail")
-    audio_full_path = f"./audio/youtube/{filename}"
-
-    if not os.path.isfile(audio_full_path):
-        raise HTTPException(status_code=502, detail="Файл аудио не найден после загрузки")
-
-    title = os.path.splitext(filename)[0].replace("_", " ")
-    performer: Optional[str] = None
-    try:
-        info = worker.get_youtube_video_info(link)
-        if info:
-            title = info.get("title") or title
-            performer = info.get("channel")
-    except Exception:
-        pass
-
-    try:
-        tg_resp = await send_audio_to_telegram_user(
-            chat_id=user_id,
-            audio_path=audio_full_path,
-            thumbnail_path=thumb_path if thumb_path and os.path.isfile(thumb_path) else None,
-            title=title,
-            performer=performer or "",
-        )
-    finally:
-        try:
-            if os.path.isfile(audio_full_path):
-                os.remove(audio_full_path)
-            if thumb_path and os.path.isfile(thumb_path):
-                os.remove(thumb_path)
-        except OSError as e:
-            logger.warning("cleanup temp audio: %s", e)
-
-    if not tg_resp.get("ok"):
-        err = tg_resp.get("description", "Telegram error")
-        logger.error("sendAudio failed: %s", tg_resp)
-        raise HTTPException(status_code=502, detail=str(err))
-
-    saved_ok = await save_audio_from_api_response(
-        db, user_id, tg_resp, source="youtube", source_url=link
-    )
-    if not saved_ok:
-        raise HTTPException(status_code=500, detail="Не удалось сохранить трек в библиотеке")
+        job = import_jobs.completed(user_id, body.video_id, existing.id)
+    else:
+        job = import_jobs.start(user_id, body.video_id, user_label)
+    return await _import_job_response(db, job)
 
-    file_id = (tg_resp.get("result") or {}).get("audio", {}).get("file_id")
-    if not file_id:
-        raise HTTPException(status_code=500, detail="Нет file_id в ответе Telegram")
 
-    audio_row = await get_audio_by_file_id(db, file_id)
-    if not audio_row:
-        raise HTTPException(status_code=500, detail="Трек не найден в БД после сохранения")
+@router.get("/youtube/import/{job_id}", response_model=YouTubeImportJobResponse)
+async def get_import_job(
+    job_id: str,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """Статус фонового импорта."""
+    job = import_jobs.get_job(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return await _import_job_response(db, job)
 
-    await notify_dev_channel(
-        f"Пользователь {user_label} искал: Mini App поиск и успешно скачал аудио из #YouTube"
-    )
-    await log_download(db, user_id, "audio", link, status=True)
 
-    favorite_ids = await get_favorite_audio_ids(db, user_id)
-    return AudioResponse(
-        id=audio_row.id,
-        file_id=audio_row.file_id,
-        title=audio_row.title,
-        artist=audio_row.artist,
-        duration=audio_row.duration,
-        source=audio_row.source,
-        source_url=audio_row.source_url,
-        created_at=audio_row.created_at,
-        is_favorite=audio_row.id in favorite_ids,
-        thumbnail_url=get_cover_url_for_audio(audio_row),
+@router.get("/youtube/import/{job_id}/events")
+async def import_job_events(
+    job_id: str,
+    user_id: int = Depends(get_user_id),
+):
+    """
+    SSE: событие status при каждой смене статуса (первое — сразу), поток закрывается после done / failed.
+    Каждые 15 сек без изменений — комментарий keep-alive, чтобы прокси не рвали соединение.
+    """
+    job = import_jobs.get_job(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+
+    async def events():
+        sent = None
+        while True:
+            if job.version != sent:
+                sent = job.version
+                async with async_session_maker() as db:
+                    data = (await _import_job_response(db, job)).model_dump_json()
+                yield f"event: status\ndata: {data}\n\n"
+                if job.finished:
+                    return
+            elif not await job.wait_change(15):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
     )
@@ -35,13 +35,13 @@ class AudioListResponse(BaseModel):
 
 class AudioStreamUrlResponse(BaseModel):
     """
-    Временный URL для стриминга аудио.
+    Временный URL для стриминга аудио (подписанная ссылка на /audio/{id}/stream).
     
-    ⚠️ URL действителен примерно 1 час!
+    ⚠️ URL действителен expires_in секунд!
     После истечения нужно запросить новый через /refresh-url
     """
     url: str  # Временный URL для скачивания/стриминга
-    expires_in: int = 3600  # Время жизни URL в секундах (~1 час)
+    expires_in: int = 3600  # Время жизни подписанной ссылки в секундах
     file_id: str  # Telegram file_id для использования с ботом
     audio_id: int
     title: Optional[str] = None
@@ -49,6 +49,16 @@ class AudioStreamUrlResponse(BaseModel):
     duration: Optional[int] = None
 
 
+class AudioStreamUrlBatchRequest(BaseModel):
+    audio_ids: List[int] = Field(..., min_length=1, max_length=200)
+
+
+class AudioStreamUrlBatchResponse(BaseModel):
+    """Ссылки на все треки очереди сразу; missing — ID, которых нет у пользователя"""
+    items: List[AudioStreamUrlResponse]
+    missing: List[int] = []
+
+
 # ==================== Playlists ====================
 
 class PlaylistCreate(BaseModel):
@@ -156,6 +166,8 @@ class YouTubeSearchItem(BaseModel):
 class CombinedSearchResponse(BaseModel):
     library: List[AudioResponse]
     youtube: List[YouTubeSearchItem]
+    # YouTube не ответил за SEARCH_YOUTUBE_TIMEOUT — в youtube пусто, повторный запрос возьмёт выдачу из кеша
+    youtube_timed_out: bool = False
 
 
 class YouTubeImportRequest(BaseModel):
@@ -167,3 +179,12 @@ class YouTubeImportResponse(AudioResponse):
 
     pass
 
+
+class YouTubeImportJobResponse(BaseModel):
+    """Фоновый импорт с YouTube: status — queued / downloading / uploading / done / failed."""
+    job_id: str
+    video_id: str
+    status: str
+    audio: Optional[AudioResponse] = None  # status=done
+    error: Optional[str] = None  # status=failed
+
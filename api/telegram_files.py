@@ -0,0 +1,119 @@
+"""
+Общий HTTP-клиент API и кеш getFile Telegram.
+
+Один httpx.AsyncClient на всё время жизни приложения (keep-alive, HTTP/2 если установлен h2,
+не больше API_HTTP_MAX_CONNECTIONS соединений) — стрим и обложки не открывают TLS заново на каждый запрос.
+file_id → file_path кешируется на TG_FILE_PATH_TTL сек (ссылка Telegram живёт ~1 час);
+одновременные запросы одного file_id ждут один getFile.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import httpx
+
+from cache_utils import SingleFlight
+from data.config import API_HTTP_MAX_CONNECTIONS, BOT_TOKEN, TG_FILE_PATH_TTL
+
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_URL = f"https://api.telegram.org/bot{BOT_TOKEN}"
+TELEGRAM_FILE_URL = f"https://api.telegram.org/file/bot{BOT_TOKEN}"
+
+_CACHE_SIZE = 4096
+
+_client: Optional[httpx.AsyncClient] = None
+# file_id → (file_path, monotonic-время getFile)
+_file_paths: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+_inflight = SingleFlight()
+
+
+class TelegramFileError(Exception):
+    """getFile не удался (сеть, HTTP или ok=false); текст — для detail ответа 502."""
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=_HTTP2,
+            timeout=httpx.Timeout(15.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=API_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=API_HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """Закрыть клиент (shutdown приложения)."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def file_url(file_path: str) -> str:
+    return f"{TELEGRAM_FILE_URL}/{file_path}"
+
+
+async def _get_file(file_id: str) -> str:
+    try:
+        response = await get_client().get(f"{TELEGRAM_API_URL}/getFile", params={"file_id": file_id}, timeout=10.0)
+    except httpx.RequestError as e:
+        raise TelegramFileError(f"Failed to connect to Telegram API: {e}") from e
+    if response.status_code != 200:
+        raise TelegramFileError("Failed to get file from Telegram")
+    try:
+        data = response.json()
+    except ValueError as e:
+        raise TelegramFileError("Failed to get file from Telegram") from e
+    if not data.get("ok"):
+        raise TelegramFileError(f"Telegram API error: {data.get('description', 'Unknown error')}")
+    return data["result"]["file_path"]
+
+
+async def get_file_path(file_id: str, refresh: bool = False) -> str:
+    """
+    file_path для file_id (из кеша, если не истёк).
+    refresh=True — ссылка у клиента уже протухла: кеш игнорируется.
+    """
+    now = time.monotonic()
+    cached = _file_paths.get(file_id)
+    if cached and not refresh and now - cached[1] < TG_FILE_PATH_TTL:
+        _file_paths.move_to_end(file_id)
+        return cached[0]
+
+    async def fetch_and_cache() -> str:
+        try:
+            file_path = await _get_file(file_id)
+        except Exception:
+            _file_paths.pop(file_id, None)
+            raise
+        _file_paths[file_id] = (file_path, time.monotonic())
+        _file_paths.move_to_end(file_id)
+        while len(_file_paths) > _CACHE_SIZE:
+            _file_paths.popitem(last=False)
+        return file_path
+
+    return await _inflight.run(file_id, fetch_and_cache)
+
+
+async def fetch_bytes(url: str) -> Optional[bytes]:
+    """Скачать небольшой файл (обложку) общим клиентом; None при ошибке."""
+    try:
+        response = await get_client().get(url)
+    except httpx.RequestError as e:
+        logger.warning(f"fetch {url.split('/bot')[0]}: {e}")
+        return None
+    return response.content if response.status_code == 200 else None
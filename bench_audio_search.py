@@ -0,0 +1,129 @@
+"""
+Бенчмарк поиска по библиотеке (get_user_audio_list) на «тяжёлом» пользователе.
+
+В транзакции засевает N треков (по умолчанию 100 000) тестовому user_id, делает ANALYZE и сравнивает
+время поиска через search_key (GIN pg_trgm, миграция 007) со старым ILIKE по title/artist.
+В конце транзакция откатывается — в базе ничего не остаётся (если не указан --keep).
+
+    python bench_audio_search.py --tracks 100000 --runs 20 --explain
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from data.config import DB_PATH
+from db.audio_commands import get_user_audio_list
+from models import UserAudio
+
+BENCH_USER_ID = -424242
+
+# Слова для названий: кириллица и латиница вперемешку, чтобы проверить транслит
+SEED_SQL = """
+INSERT INTO user_audio (user_id, file_id, file_unique_id, title, artist, duration, source)
+SELECT
+    :user_id,
+    'bench-' || g,
+    'bench-' || g,
+    (ARRAY['Группа крови', 'Звезда по имени Солнце', 'Summer Nights', 'Midnight City', 'Перемен',
+           'Кукушка', 'Blinding Lights', 'Ночь', 'Dancing Queen', 'Лето', 'Smells Like Teen Spirit',
+           'Любовь', 'Bohemian Rhapsody', 'Город', 'Shape of You', 'Восьмиклассница'])[1 + g % 16]
+        || ' ' || (ARRAY['remix', 'live', 'acoustic', 'demo', 'remaster', 'cover', '', 'edit'])[1 + (g / 16) % 8]
+        || ' ' || g,
+    (ARRAY['Кино', 'Queen', 'Ария', 'M83', 'Сплин', 'The Weeknd', 'ДДТ', 'ABBA', 'Земфира', 'Nirvana',
+           'Би-2', 'Ed Sheeran', 'Мумий Тролль', 'Daft Punk', 'Ленинград', 'Muse'])[1 + (g / 7) % 16]
+        || ' ' || (g % 500),
+    120 + g % 300,
+    'bench'
+FROM generate_series(1, :tracks) AS g
+"""
+
+DEFAULT_QUERIES = ["кино", "kino", "группа крови", "gruppa krovi", "Bohemian", "zemfira", "blindng lights", "ddt"]
+
+
+def legacy_query(user_id: int, search: str):
+    """Поиск до миграции 007 — для сравнения."""
+    pattern = f"%{search}%"
+    return (
+        select(UserAudio)
+        .where(UserAudio.user_id == user_id)
+        .where(UserAudio.title.ilike(pattern) | UserAudio.artist.ilike(pattern))
+        .order_by(UserAudio.created_at.desc())
+        .limit(50)
+    )
+
+
+async def timed(runs: int, call) -> tuple:
+    timings = []
+    rows = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        rows = await call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings), len(rows)
+
+
+async def run(tracks: int, runs: int, queries: list, explain: bool, keep: bool):
+    engine = create_async_engine(DB_PATH, echo=False)
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        session = AsyncSession(bind=conn, expire_on_commit=False)
+        try:
+            started = time.perf_counter()
+            await conn.execute(text(SEED_SQL), {"user_id": BENCH_USER_ID, "tracks": tracks})
+            await conn.execute(text("ANALYZE user_audio"))
+            print(f"Seeded {tracks} tracks in {time.perf_counter() - started:.1f}s\n")
+
+            print(f"{'query':<20} {'trgm p50':>10} {'max':>8} {'rows':>5}   {'ilike p50':>10} {'max':>8} {'rows':>5}")
+            for q in queries:
+                new = await timed(runs, lambda: get_user_audio_list(session, BENCH_USER_ID, 50, 0, q))
+                old = await timed(runs, lambda: _legacy(session, q))
+                print(f"{q:<20} {new[0]:>8.1f}ms {new[1]:>6.1f}ms {new[2]:>5}   {old[0]:>8.1f}ms {old[1]:>6.1f}ms {old[2]:>5}")
+
+            if explain and queries:
+                print(f"\nEXPLAIN ANALYZE for {queries[0]!r}:")
+                print(await _explain(conn, queries[0]))
+        finally:
+            await session.close()
+            if keep:
+                await trans.commit()
+            else:
+                await trans.rollback()
+    await engine.dispose()
+
+
+async def _legacy(session: AsyncSession, q: str):
+    result = await session.execute(legacy_query(BENCH_USER_ID, q))
+    return result.scalars().all()
+
+
+async def _explain(conn, q: str) -> str:
+    result = await conn.execute(
+        text(
+            "EXPLAIN (ANALYZE, BUFFERS) SELECT id FROM user_audio "
+            "WHERE user_id = :user_id AND (search_key LIKE '%' || btrim(audio_search_key(:q, NULL)) || '%' "
+            "OR btrim(audio_search_key(:q, NULL)) <% search_key) "
+            "ORDER BY word_similarity(btrim(audio_search_key(:q, NULL)), search_key) DESC LIMIT 50"
+        ),
+        {"user_id": BENCH_USER_ID, "q": q},
+    )
+    return "\n".join(row[0] for row in result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark library search on a seeded power-user library")
+    parser.add_argument("--tracks", type=int, default=100_000, help="tracks to seed (default 100000)")
+    parser.add_argument("--runs", type=int, default=10, help="runs per query (median is reported)")
+    parser.add_argument("--query", action="append", dest="queries", help="search query (repeatable)")
+    parser.add_argument("--explain", action="store_true", help="print EXPLAIN ANALYZE for the first query")
+    parser.add_argument("--keep", action="store_true", help="commit the seeded tracks instead of rolling back")
+    args = parser.parse_args()
+    asyncio.run(run(args.tracks, args.runs, args.queries or DEFAULT_QUERIES, args.explain, args.keep))
+
+
+if __name__ == "__main__":
+    main()
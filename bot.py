@@ -6,6 +6,10 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
+import bot_api
+import thumbnails
+import workspace
+import yt_search
 from admin_commands import admin_router
 from bot_commands import router as media_router
 from inline_commands import inline_router
@@ -55,6 +59,11 @@ async def main() -> None:
     dp.include_router(admin_router)
     dp.include_router(media_router)
     dp.include_router(inline_router)
+    dp.startup.register(workspace.start_janitor)
+    dp.shutdown.register(workspace.stop_janitor)
+    dp.shutdown.register(bot_api.close_session)
+    dp.shutdown.register(thumbnails.close_session)
+    dp.shutdown.register(yt_search.close_session)
     await dp.start_polling(bot)
 
 
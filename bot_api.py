@@ -0,0 +1,271 @@
+"""
+Асинхронный клиент Telegram Bot API: локальный telegram-bot-api (большие файлы) и api.telegram.org.
+
+Один aiohttp-пул с keep-alive на event loop. Файлы уходят multipart'ом потоково с диска
+(aiohttp читает их кусками в executor'е) — загрузка в сотни МБ не блокирует loop и не лежит в памяти.
+Доступность локального сервера (getMe) кешируется на BOT_API_HEALTH_TTL сек.
+
+Если локальный сервер запущен с --local на этом же хосте, файлы передаются ссылкой file:///абсолютный/путь —
+сервер читает их с диска сам, без копии через HTTP. BOT_API_LOCAL_FILES: auto (пробуем, при отказе —
+multipart и больше не пробуем до рестарта), 1 (всегда), 0 (никогда).
+"""
+
+import asyncio
+import logging
+import mimetypes
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import aiofiles
+import aiohttp
+
+from cache_utils import LoopSession
+from data.config import (
+    BOT_API_HEALTH_TTL,
+    BOT_API_LOCAL_FILES,
+    BOT_API_POOL_SIZE,
+    BOT_API_UPLOAD_TIMEOUT,
+    BOT_TOKEN,
+    LOCAL_BOT_API_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+LOCAL_BASE = LOCAL_BOT_API_URL or "http://127.0.0.1:8081"
+CLOUD_BASE = "https://api.telegram.org"
+
+# Общая сессия (пул соединений); привязана к event loop'у — у задач очереди свой asyncio.run
+_session = LoopSession(lambda: aiohttp.ClientSession(
+    connector=aiohttp.TCPConnector(limit=max(1, BOT_API_POOL_SIZE), keepalive_timeout=60),
+))
+# base → (monotonic-время проверки, доступен ли)
+_health: Dict[str, Tuple[float, bool]] = {}
+# base → принимает ли file:// (None — ещё не проверяли)
+_local_files: Dict[str, Optional[bool]] = {}
+
+
+async def close_session() -> None:
+    """Закрыть общую сессию (при остановке бота / API или в конце своего event loop'а)."""
+    await _session.close()
+
+
+def _form_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+async def call(
+    method: str,
+    data: Optional[Dict[str, Any]] = None,
+    files: Optional[Dict[str, Tuple[str, Optional[str]]]] = None,
+    base: str = LOCAL_BASE,
+    timeout: float = BOT_API_UPLOAD_TIMEOUT,
+) -> Dict[str, Any]:
+    """
+    Вызов метода Bot API.
+
+    Args:
+        data: Обычные поля (None пропускаются)
+        files: {поле: (путь, mime или None)} — отправляются потоково с диска
+        base: LOCAL_BASE или CLOUD_BASE
+
+    Returns:
+        JSON-ответ Telegram; при сетевой ошибке или ошибке чтения файла — {'ok': False, 'description': ...}
+    """
+    url = f"{base}/bot{BOT_TOKEN}/{method}"
+    fields = {k: v for k, v in (data or {}).items() if v is not None}
+    opened = []
+    try:
+        if files:
+            form = aiohttp.FormData()
+            for key, value in fields.items():
+                form.add_field(key, _form_value(value))
+            for field, (path, mime) in files.items():
+                f = open(path, "rb")
+                opened.append(f)
+                form.add_field(
+                    field,
+                    f,
+                    filename=os.path.basename(path),
+                    content_type=mime or mimetypes.guess_type(path)[0] or "application/octet-stream",
+                )
+            body = {"data": form}
+        else:
+            body = {"json": fields}
+        session = await _session.get()
+        client_timeout = aiohttp.ClientTimeout(total=None, connect=30, sock_read=timeout)
+        async with session.post(url, timeout=client_timeout, **body) as resp:
+            try:
+                return await resp.json(content_type=None)
+            except ValueError:
+                text = await resp.text()
+                return {"ok": False, "error_code": resp.status, "description": text[:500]}
+    except asyncio.TimeoutError:
+        logger.error(f"Bot API {method}: timeout")
+        return {"ok": False, "description": "timeout"}
+    except (aiohttp.ClientError, OSError) as e:
+        # OSError — файл из files не открылся (удалён / нет прав)
+        logger.error(f"Bot API {method}: {e}")
+        return {"ok": False, "description": str(e)}
+    finally:
+        for f in opened:
+            f.close()
+
+
+async def is_healthy(base: str = LOCAL_BASE) -> bool:
+    """getMe с кешем на BOT_API_HEALTH_TTL сек — не лишний запрос перед каждой отправкой."""
+    checked = _health.get(base)
+    if checked and time.monotonic() - checked[0] < BOT_API_HEALTH_TTL:
+        return checked[1]
+    result = await call("getMe", base=base, timeout=10)
+    ok = bool(result.get("ok"))
+    if not ok:
+        logger.error(f"Bot API health check failed for {base}: {result.get('description')}")
+    _health[base] = (time.monotonic(), ok)
+    return ok
+
+
+def mark_unhealthy(base: str = LOCAL_BASE) -> None:
+    """Сбросить кеш после сетевой ошибки — следующая отправка перепроверит сервер."""
+    _health[base] = (time.monotonic(), False)
+
+
+def _local_files_enabled(base: str) -> bool:
+    if base != LOCAL_BASE or BOT_API_LOCAL_FILES in ("0", "false", "no", "off"):
+        return False
+    if BOT_API_LOCAL_FILES in ("1", "true", "yes", "on"):
+        return True
+    return _local_files.get(base) is not False
+
+
+def _file_uri(path: str) -> str:
+    return Path(os.path.abspath(path)).as_uri()
+
+
+# Ответы 400, означающие «file:// не принят» (а не ошибку в остальных полях запроса)
+_FILE_URI_ERRORS = ("wrong file identifier", "http url specified", "file not found", "wrong remote file")
+
+
+def _rejects_file_uri(response: Dict[str, Any]) -> bool:
+    description = str(response.get("description", "")).lower()
+    return any(marker in description for marker in _FILE_URI_ERRORS)
+
+
+async def upload(
+    method: str,
+    data: Dict[str, Any],
+    files: Dict[str, Tuple[str, Optional[str]]],
+    base: str = LOCAL_BASE,
+) -> Dict[str, Any]:
+    """
+    Отправка с файлами: в --local режиме — путями file://, иначе (или если сервер их не принял) — multipart.
+    Файлы не удаляются: вызывающий убирает их после ответа сервера.
+    """
+    if _local_files_enabled(base):
+        fields = dict(data)
+        fields.update({field: _file_uri(path) for field, (path, _) in files.items()})
+        response = await call(method, data=fields, base=base)
+        if response.get("ok"):
+            _local_files[base] = True
+            return response
+        if (
+            response.get("error_code") != 400
+            or _local_files.get(base) is True
+            or not _rejects_file_uri(response)
+        ):
+            # Сервер уже принимал file:// или ошибка не про ссылку на файл (чат, подпись...) — отдаём как есть
+            return response
+        # Сервер не принял ссылку file:// — он без --local (или не видит наш диск): дальше только multipart
+        logger.warning(f"Bot API {base}: file:// upload rejected ({response.get('description')}), using multipart")
+        if BOT_API_LOCAL_FILES == "auto":
+            _local_files[base] = False
+    return await call(method, data=data, files=files, base=base)
+
+
+async def send_video(
+    chat_id: int,
+    file_path: str,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    caption: Optional[str] = None,
+    base: str = LOCAL_BASE,
+) -> Dict[str, Any]:
+    return await upload(
+        "sendVideo",
+        data={
+            "chat_id": chat_id,
+            "caption": caption,
+            "width": width,
+            "height": height,
+            "supports_streaming": True,
+        },
+        files={"video": (file_path, None)},
+        base=base,
+    )
+
+
+async def send_document(
+    chat_id: int,
+    file_path: str,
+    caption: Optional[str] = None,
+    base: str = LOCAL_BASE,
+) -> Dict[str, Any]:
+    return await upload(
+        "sendDocument",
+        data={"chat_id": chat_id, "caption": caption},
+        files={"document": (file_path, None)},
+        base=base,
+    )
+
+
+async def send_audio(
+    chat_id: int,
+    file_path: str,
+    thumbnail_path: Optional[str] = None,
+    title: Optional[str] = None,
+    performer: Optional[str] = None,
+    caption: Optional[str] = None,
+    base: str = LOCAL_BASE,
+) -> Dict[str, Any]:
+    files = {"audio": (file_path, None)}
+    if thumbnail_path and os.path.isfile(thumbnail_path):
+        files["thumbnail"] = (thumbnail_path, "image/jpeg")
+    return await upload(
+        "sendAudio",
+        data={
+            "chat_id": chat_id,
+            "caption": caption,
+            "title": title[:200] if title else None,
+            "performer": performer[:200] if performer else None,
+        },
+        files=files,
+        base=base,
+    )
+
+
+async def download(file_path: str, dest_path: str, base: str = LOCAL_BASE) -> bool:
+    """Скачать файл по file_path из getFile потоково в dest_path (без чтения целиком в память)."""
+    url = f"{base}/file/bot{BOT_TOKEN}/{file_path.lstrip('/')}"
+    try:
+        session = await _session.get()
+        client_timeout = aiohttp.ClientTimeout(total=None, connect=30, sock_read=BOT_API_UPLOAD_TIMEOUT)
+        async with session.get(url, timeout=client_timeout) as resp:
+            if resp.status != 200:
+                logger.warning(f"Bot API download {file_path}: HTTP {resp.status}")
+                return False
+            async with aiofiles.open(dest_path, "wb") as f:
+                async for chunk in resp.content.iter_chunked(1024 * 1024):
+                    await f.write(chunk)
+        return True
+    except (asyncio.TimeoutError, aiohttp.ClientError, OSError) as e:
+        logger.warning(f"Bot API download {file_path}: {e}")
+        if os.path.isfile(dest_path):
+            os.remove(dest_path)
+        return False
+
+
+async def send_message(chat_id: int, text: str, base: str = CLOUD_BASE) -> Dict[str, Any]:
+    return await call("sendMessage", data={"chat_id": chat_id, "text": text[:4096]}, base=base, timeout=30)
@@ -1,11 +1,12 @@
 import os
 import subprocess
 import worker
+import jobs
+import bot_api
 import metadata
-import mimetypes
 import logging
 import pinterest
-import requests
+import thumbnails
 import re
 
 from aiogram import Router, F
@@ -13,13 +14,15 @@ from aiogram.filters import Command, CommandStart
 from aiogram.types import Message, FSInputFile, ContentType, FSInputFile, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.exceptions import TelegramEntityTooLarge, TelegramForbiddenError, TelegramBadRequest
+from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
 from aiogram.enums.chat_action import ChatAction
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from db import db_commands
-from db.audio_helper import save_sent_audio, save_audio_from_api_response
+from db.audio_helper import save_sent_audio
 from db.download_log import log_download, should_add_watermark
+from ingest import ingest_file
+from delivery import send_from_cache, deliver_video, deliver_audio, remember_delivery, save_delivered_audio
 from data import config
 from models import User
 from link_handler import handle_instagram_link, handle_youtube_link, handle_pinterest_link, handle_tiktok_link
@@ -32,42 +35,14 @@ logger = logging.getLogger(__name__)
 BOT_TOKEN = config.BOT_TOKEN
 
 
-def check_bot_api_health():
+async def check_bot_api_health():
     """
-    Проверка доступности локального Bot API
+    Проверка доступности локального Bot API (getMe, результат кешируется на BOT_API_HEALTH_TTL сек)
     """
-    try:
-        # Используем тот же URL, что и в curl
-        health_url = f"http://127.0.0.1:8081/bot{BOT_TOKEN}/getMe"
-        headers = {
-            'Connection': 'close',
-            'Expect': ''   # попытка убрать Expect: 100-continue
-        }
-        response = requests.get(health_url, headers=headers, timeout=10)
-        
-        logger.info(f"Bot API Health Check - Status: {response.status_code}")
-        
-        if response.status_code == 200:
-            data = response.json()
-            is_ok = data.get('ok', False)
-            logger.info(f"Bot API is OK: {is_ok}")
-            return is_ok
-        else:
-            logger.error(f"Bot API Health Check failed: {response.status_code}")
-            return False
-            
-    except requests.exceptions.ConnectionError as e:
-        logger.error(f"Bot API ConnectionError: {e}")
-        return False
-    except requests.exceptions.Timeout as e:
-        logger.error(f"Bot API Timeout: {e}")
-        return False
-    except Exception as e:
-        logger.error(f"Bot API Health Check error: {e}")
-        return False
+    return await bot_api.is_healthy()
     
 
-def send_video_through_api(chat_id, file_path, width, height):
+async def send_video_through_api(chat_id, file_path, width, height):
     """
     Отправка видео в Telegram через API.
 
@@ -77,45 +52,27 @@ def send_video_through_api(chat_id, file_path, width, height):
     :param height: Высота видео
     :return: True, если успешно отправлено, иначе False
     """
-    # Telegram API URL
-    url = f"http://127.0.0.1:8081/bot{BOT_TOKEN}/sendVideo"
-    response = None
-
     # Проверяем существование файла
     if not os.path.isfile(file_path):
         logger.error(f"Файл {file_path} не найден.")
         return False
     
-    if not check_bot_api_health():
+    if not await check_bot_api_health():
         logger.error("Локальный API не доступен")
         return False
 
-    # Отправка запроса
-    try:
-        with open(file_path, 'rb') as video:
-            files = {
-                # явно указываем имя файла и mime
-                'video': (os.path.basename(file_path), video, mimetypes.guess_type(file_path)[0] or 'application/octet-stream')
-            }
-            headers = {
-                'Connection': 'close',
-                'Expect': ''   # попытка убрать Expect: 100-continue
-            }
-            data = {
-                'chat_id': chat_id,
-                'caption': 'Ваше видео готово!\n@django_media_helper_bot',
-                'width': width,
-                'height': height,
-                'supports_streaming': True
-            }
-            response = requests.post(url, headers=headers, data=data, files=files, timeout=(30, 300))
-            logger.info(f"API Response: {response.status_code}, {response.text}")
-    except requests.exceptions.Timeout:
-        logger.error("Таймаут при отправке видео")
-        return False
-    except Exception as e:
-        logger.error(f"Ошибка при отправке видео: {e}")
-        return False
+    # Отправка запроса (файл читается с диска потоково, loop не блокируется)
+    response = await bot_api.send_video(
+        chat_id,
+        file_path,
+        width=width,
+        height=height,
+        caption='Ваше видео готово!\n@django_media_helper_bot',
+    )
+    logger.info(f"API Response: {response}")
+    if 'error_code' not in response and not response.get('ok'):
+        # Сетевая ошибка/таймаут — следующая отправка перепроверит сервер
+        bot_api.mark_unhealthy()
 
     # Удаляем файл после отправки
     if os.path.isfile(file_path):
@@ -126,15 +83,15 @@ def send_video_through_api(chat_id, file_path, width, height):
             logger.warning(f"Не удалось удалить файл {file_path}: {e}")
 
     # Проверяем статус ответа
-    if response.status_code == 200:
+    if response.get('ok'):
         logger.info("Видео успешно отправлено!")
         return True
     else:
-        logger.error(f"Ошибка при отправке видео: {response.status_code}, {response.text}")
+        logger.error(f"Ошибка при отправке видео: {response}")
         return False
 
 
-def send_audio_through_api(chat_id: int, file_path: str, thumbnail_path: str = None, delete_after: bool = False) -> dict:
+async def send_audio_through_api(chat_id: int, file_path: str, thumbnail_path: str = None, delete_after: bool = False) -> dict:
     """
     Отправка аудио в Telegram через API (аналогично send_video_through_api)
     
@@ -147,37 +104,18 @@ def send_audio_through_api(chat_id: int, file_path: str, thumbnail_path: str = N
     Returns:
         dict с ключами 'success' и 'response' (JSON ответ API)
     """
-    url = f"http://127.0.0.1:8081/bot{BOT_TOKEN}/sendAudio"
-    
     if not os.path.isfile(file_path):
         logger.error(f"Файл {file_path} не найден.")
         return {'success': False, 'response': None}
     
-    try:
-        files = {}
-        
-        with open(file_path, 'rb') as audio_file:
-            files['audio'] = (os.path.basename(file_path), audio_file.read(), 'audio/mpeg')
-        
-        # Добавляем thumbnail если есть
-        if thumbnail_path and os.path.isfile(thumbnail_path):
-            with open(thumbnail_path, 'rb') as thumb_file:
-                files['thumbnail'] = (os.path.basename(thumbnail_path), thumb_file.read(), 'image/jpeg')
-        
-        headers = {
-            'Connection': 'close',
-            'Expect': ''
-        }
-        data = {
-            'chat_id': chat_id,
-            'caption': 'Ваше аудио готово!\n@django_media_helper_bot',
-            'title': os.path.basename(file_path)
-        }
-        response = requests.post(url, headers=headers, data=data, files=files, timeout=(30, 300))
-        logger.info(f"Audio API Response: {response.status_code}")
-    except Exception as e:
-        logger.error(f"Ошибка при отправке аудио: {e}")
-        return {'success': False, 'response': None}
+    response = await bot_api.send_audio(
+        chat_id,
+        file_path,
+        thumbnail_path=thumbnail_path,
+        title=os.path.basename(file_path),
+        caption='Ваше аудио готово!\n@django_media_helper_bot',
+    )
+    logger.info(f"Audio API Response: ok={response.get('ok')}")
     
     # Удаляем файлы после отправки если указано
     if delete_after:
@@ -186,15 +124,12 @@ def send_audio_through_api(chat_id: int, file_path: str, thumbnail_path: str = N
                 os.remove(file_path)
             except Exception as e:
                 logger.warning(f"Не удалось удалить файл {file_path}: {e}")
-        if thumbnail_path and os.path.isfile(thumbnail_path):
-            try:
-                os.remove(thumbnail_path)
-            except Exception as e:
-                logger.warning(f"Не удалось удалить thumbnail {thumbnail_path}: {e}")
+        thumbnails.discard(thumbnail_path)
     
-    if response.status_code == 200:
-        return {'success': True, 'response': response.json()}
+    if response.get('ok'):
+        return {'success': True, 'response': response}
     else:
+        logger.error(f"Ошибка при отправке аудио: {response}")
         return {'success': False, 'response': None}
 
 
@@ -243,6 +178,18 @@ async def deliver_youtube_audio_to_chat(
     """Скачать аудио с YouTube и отправить в чат; сохранить в БД для Mini App."""
     video_id = selected_video["id"]
     link = f"https://www.youtube.com/watch?v={video_id}"
+    cached = await send_from_cache(
+        progress_message.bot, session, progress_message.chat.id, link, 'audio',
+        "Ваше аудио готово!\n@django_media_helper_bot"
+    )
+    if cached:
+        await progress_message.bot.send_message(
+            chat_id=config.DEV_CHANEL_ID,
+            text=f"Пользователь @{username} (ID: {user_id}) искал: {search_query} и успешно скачал аудио из #YouTube (кеш)"
+        )
+        await log_download(session, user_id, 'audio', link, status=True)
+        await save_sent_audio(session, cached, source='youtube', source_url=link)
+        return
     await _safe_edit_status_message(
         progress_message,
         f"⏬ Загружаю аудио...\n\n"
@@ -251,37 +198,30 @@ async def deliver_youtube_audio_to_chat(
     )
     await progress_message.bot.send_chat_action(progress_message.chat.id, ChatAction.UPLOAD_VOICE)
     try:
-        result = await worker.get_audio_from_youtube(link)
+        result = await jobs.run_job('youtube_audio', link=link)
     except Exception as e:
         logger.error(e)
         result = None
     if result:
-        filename = result["audio"]
+        audio_path = result["audio"]
         thumbnail_path = result.get("thumbnail")
         try:
-            thumbnail = FSInputFile(thumbnail_path) if thumbnail_path and os.path.isfile(thumbnail_path) else None
-
-            doc = await progress_message.answer_audio(
-                audio=FSInputFile(f"./audio/youtube/{filename}"),
-                thumbnail=thumbnail,
-                caption="Ваше аудио готово!\n@django_media_helper_bot"
-            )
-            await progress_message.bot.send_message(
-                chat_id=config.DEV_CHANEL_ID,
-                text=f"Пользователь @{username} (ID: {user_id}) искал: {search_query} и успешно скачал аудио из #YouTube"
-            )
-            await log_download(session, user_id, 'audio', link, status=True)
-            if doc:
-                await save_sent_audio(session, doc, source='youtube', source_url=link)
-        except TelegramEntityTooLarge:
-            logger.info("Обнаружен TelegramEntityTooLarge, переходим к отправке через API")
-            api_result = send_audio_through_api(
+            delivery = await deliver_audio(
+                progress_message.bot,
                 progress_message.chat.id,
-                f"./audio/youtube/{filename}",
+                audio_path,
+                "Ваше аудио готово!\n@django_media_helper_bot",
                 thumbnail_path=thumbnail_path,
-                delete_after=True
             )
-            if not api_result['success']:
+            if delivery.ok:
+                await progress_message.bot.send_message(
+                    chat_id=config.DEV_CHANEL_ID,
+                    text=f"Пользователь @{username} (ID: {user_id}) искал: {search_query} и успешно скачал аудио из #YouTube"
+                )
+                await log_download(session, user_id, 'audio', link, status=True)
+                await remember_delivery(session, link, 'audio', delivery)
+                await save_delivered_audio(session, user_id, delivery, source='youtube', source_url=link)
+            elif delivery.too_large:
                 await progress_message.edit_text("Извините, размер файла слишком большой для отправки по Telegram.")
                 await progress_message.bot.send_message(
                     chat_id=config.DEV_CHANEL_ID,
@@ -289,26 +229,16 @@ async def deliver_youtube_audio_to_chat(
                 )
                 await log_download(session, user_id, 'audio', link, status=False)
             else:
+                await progress_message.edit_text("Извините, произошла неизвестная ошибка при отправке аудио.")
                 await progress_message.bot.send_message(
                     chat_id=config.DEV_CHANEL_ID,
-                    text=f"Пользователь @{username} (ID: {user_id}) искал: {search_query} и успешно скачал аудио из #YouTube"
+                    text=f"Пользователь @{username} (ID: {user_id}) искал: {search_query}, но не смог скачать аудио из #YouTube, {delivery.error}"
                 )
-                await log_download(session, user_id, 'audio', link, status=True)
-                if api_result['response']:
-                    await save_audio_from_api_response(session, user_id, api_result['response'], source='youtube', source_url=link)
-        except Exception as e:
-            logger.error(f"Другая ошибка при отправке: {e}")
-            await progress_message.edit_text("Извините, произошла неизвестная ошибка при отправке аудио.")
-            await progress_message.bot.send_message(
-                chat_id=config.DEV_CHANEL_ID,
-                text=f"Пользователь @{username} (ID: {user_id}) искал: {search_query}, но не смог скачать аудио из #YouTube, {e}"
-            )
-            await log_download(session, user_id, 'audio', link, status=False)
+                await log_download(session, user_id, 'audio', link, status=False)
         finally:
-            if os.path.isfile(f"./audio/youtube/{filename}"):
-                os.remove(f"./audio/youtube/{filename}")
-            if thumbnail_path and os.path.isfile(thumbnail_path):
-                os.remove(thumbnail_path)
+            if os.path.isfile(audio_path):
+                os.remove(audio_path)
+            thumbnails.discard(thumbnail_path)
     else:
         await progress_message.edit_text("Извините, произошла ошибка. Видео недоступно!")
         await progress_message.bot.send_message(
@@ -470,107 +400,88 @@ async def get_link(message: Message, state: FSMContext, session: AsyncSession) -
         
         # Проверяем, нужен ли водяной знак
         add_wm = await should_add_watermark(session, user_id)
+
+        if await send_from_cache(message.bot, session, message.chat.id, link, 'video',
+                                 'Ваше видео готово!\n@django_media_helper_bot', watermark=add_wm):
+            await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #YouTube (кеш)")
+            await log_download(session, user_id, 'youtube', link, status=True)
+            await state.clear()
+            return
         
         try:
-            filename = await worker.download_from_youtube(link)
+            video_path = await jobs.run_job('youtube_video', link=link, watermark=add_wm)
         except Exception as e:
             logger.error(e)
-            filename = None
-        if filename:
-            video_path = f"./videos/youtube/{filename}"
-            # Добавляем водяной знак если нужно
-            final_path = worker.add_watermark_if_needed(video_path, add_wm)
-            
-            width, height = worker.get_video_resolution_moviepy(final_path)
-            file_size = os.path.getsize(final_path)
-            logger.info(f"Размер файла: {file_size} bytes ({file_size / 1024 / 1024:.2f} MB)")
+            video_path = None
+        if video_path:
             try:
-                doc = await message.bot.send_video(message.chat.id, FSInputFile(final_path), caption='Ваше видео готово!\n@django_media_helper_bot', supports_streaming=True, width=width, height=height)
-                await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #YouTube")
-                await log_download(session, user_id, 'youtube', link, status=True)
-                if not doc:
-                    await message.answer("Извините, произошла ошибка. Видео недоступно, либо указана неверная ссылка!")
-                    await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать видео из #YouTube")
-            except TelegramEntityTooLarge:
-                logger.info("Обнаружен TelegramEntityTooLarge, переходим к отправке через API")
-                sended = send_video_through_api(message.chat.id, final_path, width, height)
-                if not sended:
+                delivery = await deliver_video(message.bot, message.chat.id, video_path,
+                                               'Ваше видео готово!\n@django_media_helper_bot')
+                if delivery.ok:
+                    await remember_delivery(session, link, 'video', delivery, watermark=add_wm)
+                    await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #YouTube")
+                    await log_download(session, user_id, 'youtube', link, status=True)
+                elif delivery.too_large:
                     await message.answer("Извините, размер файла слишком большой для отправки по Telegram.")
                     await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать видео из #YouTube, размер файла слишком большой")
                     await log_download(session, user_id, 'youtube', link, status=False)
                 else:
-                    await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #YouTube")
-                    await log_download(session, user_id, 'youtube', link, status=True)
-            except Exception as e:
-                logger.error(f"Другая ошибка при отправке: {e}")
-                await message.answer("Извините, произошла неизвестная ошибка при отправке видео.")
-                await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать видео из #YouTube, {e}")
-                await log_download(session, user_id, 'youtube', link, status=False)
+                    await message.answer("Извините, произошла неизвестная ошибка при отправке видео.")
+                    await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать видео из #YouTube, {delivery.error}")
+                    await log_download(session, user_id, 'youtube', link, status=False)
             finally:
-                if os.path.isfile(final_path):
-                    os.remove(final_path)
-                if final_path != video_path and os.path.isfile(video_path):
+                if os.path.isfile(video_path):
                     os.remove(video_path)
         else:
             await message.answer("Извините, произошла ошибка. Видео недоступно, либо указана неверная ссылка!")
             await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать видео из #YouTube")
             await log_download(session, user_id, 'youtube', link, status=False)
             try:
-                if filename and os.path.isfile(f"./videos/youtube/{filename}"):
-                    os.remove(f"./videos/youtube/{filename}")
+                if video_path and os.path.isfile(video_path):
+                    os.remove(video_path)
             except Exception as e:
                 logger.error(e)
 
     elif state_info["command_type"] == 'audio':
+        cached = await send_from_cache(message.bot, session, message.chat.id, link, 'audio',
+                                       "Ваше аудио готово!\n@django_media_helper_bot")
+        if cached:
+            await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал аудио из #YouTube (кеш)")
+            await log_download(session, user_id, 'audio', link, status=True)
+            await save_sent_audio(session, cached, source='youtube', source_url=link)
+            await state.clear()
+            return
         await message.answer("Подождите загружаем аудио...")
         await message.bot.send_chat_action(message.chat.id, ChatAction.UPLOAD_VOICE)
         try:
-            result = await worker.get_audio_from_youtube(link)
+            result = await jobs.run_job('youtube_audio', link=link)
         except Exception as e:
             logger.error(e)
             result = None    
         if result:
-            filename = result['audio']
+            audio_path = result['audio']
             thumbnail_path = result.get('thumbnail')
             try:
-                thumbnail = FSInputFile(thumbnail_path) if thumbnail_path and os.path.isfile(thumbnail_path) else None
-                
-                doc = await message.answer_audio(
-                    audio=FSInputFile(f"./audio/youtube/{filename}"),
-                    thumbnail=thumbnail,
-                    caption="Ваше аудио готово!\n@django_media_helper_bot"
-                )
-                await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал аудио из #YouTube")
-                await log_download(session, user_id, 'audio', link, status=True)
-                if doc:
-                    await save_sent_audio(session, doc, source='youtube', source_url=link)
-            except TelegramEntityTooLarge:
-                logger.info("Обнаружен TelegramEntityTooLarge, переходим к отправке через API")
-                api_result = send_audio_through_api(
-                    message.chat.id, 
-                    f"./audio/youtube/{filename}",
-                    thumbnail_path=thumbnail_path,
-                    delete_after=True
-                )
-                if not api_result['success']:
+                delivery = await deliver_audio(message.bot, message.chat.id, audio_path,
+                                               "Ваше аудио готово!\n@django_media_helper_bot",
+                                               thumbnail_path=thumbnail_path)
+                if delivery.ok:
+                    await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал аудио из #YouTube")
+                    await log_download(session, user_id, 'audio', link, status=True)
+                    await remember_delivery(session, link, 'audio', delivery)
+                    await save_delivered_audio(session, user_id, delivery, source='youtube', source_url=link)
+                elif delivery.too_large:
                     await message.answer("Извините, размер файла слишком большой для отправки по Telegram.")
                     await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать аудио из #YouTube, размер файла слишком большой")
                     await log_download(session, user_id, 'audio', link, status=False)
                 else:
-                    await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал аудио из #YouTube")
-                    await log_download(session, user_id, 'audio', link, status=True)
-                    if api_result['response']:
-                        await save_audio_from_api_response(session, user_id, api_result['response'], source='youtube', source_url=link)
-            except Exception as e:
-                logger.error(f"Другая ошибка при отправке: {e}")
-                await message.answer("Извините, произошла неизвестная ошибка при отправке аудио.")
-                await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать аудио из #YouTube, {e}")
-                await log_download(session, user_id, 'audio', link, status=False)
+                    await message.answer("Извините, произошла неизвестная ошибка при отправке аудио.")
+                    await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать аудио из #YouTube, {delivery.error}")
+                    await log_download(session, user_id, 'audio', link, status=False)
             finally:
-                if os.path.isfile(f"./audio/youtube/{filename}"):
-                    os.remove(f"./audio/youtube/{filename}")
-                if thumbnail_path and os.path.isfile(thumbnail_path):
-                    os.remove(thumbnail_path)
+                if os.path.isfile(audio_path):
+                    os.remove(audio_path)
+                thumbnails.discard(thumbnail_path)
         else:
             await message.answer("Извините, произошла ошибка. Видео недоступно!")
             await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать аудио из #YouTube")
@@ -581,40 +492,37 @@ async def get_link(message: Message, state: FSMContext, session: AsyncSession) -
         
         # Проверяем, нужен ли водяной знак
         add_wm = await should_add_watermark(session, user_id)
+
+        if await send_from_cache(message.bot, session, message.chat.id, link, 'video',
+                                 "Ваш reels готов!\n@django_media_helper_bot", watermark=add_wm):
+            await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #reels (кеш)")
+            await log_download(session, user_id, 'reels', link, status=True)
+            await state.clear()
+            return
         
         try:
-            path = await worker.download_instagram_reels(link)
+            path = await jobs.run_job('instagram_reels', link=link, watermark=add_wm)
         except Exception as e:
             logger.error(e)
             path = None
         if path:
-            # Добавляем водяной знак если нужно
-            final_path = worker.add_watermark_if_needed(path, add_wm)
-            
             try:
-                doc = await message.answer_video(video=FSInputFile(final_path), caption="Ваш reels готов!\n@django_media_helper_bot")
-                await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #reels")
-                await log_download(session, user_id, 'reels', link, status=True)
-            except TelegramEntityTooLarge:
-                logger.info("Обнаружен TelegramEntityTooLarge, переходим к отправке через API")
-                width, height = worker.get_video_resolution_moviepy(final_path)
-                sended = send_video_through_api(message.chat.id, final_path, width, height)
-                if not sended:
+                delivery = await deliver_video(message.bot, message.chat.id, path,
+                                               "Ваш reels готов!\n@django_media_helper_bot")
+                if delivery.ok:
+                    await remember_delivery(session, link, 'video', delivery, watermark=add_wm)
+                    await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #reels")
+                    await log_download(session, user_id, 'reels', link, status=True)
+                elif delivery.too_large:
                     await message.answer("Извините, размер файла слишком большой для отправки по Telegram.")
                     await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать видео из #reels, размер файла слишком большой")
                     await log_download(session, user_id, 'reels', link, status=False)
                 else:
-                    await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #reels")
-                    await log_download(session, user_id, 'reels', link, status=True)
-            except Exception as e:
-                logger.error(f"Другая ошибка при отправке: {e}")
-                await message.answer("Извините, произошла неизвестная ошибка при отправке видео.")
-                await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать видео из #reels, {e}")
-                await log_download(session, user_id, 'reels', link, status=False)
+                    await message.answer("Извините, произошла неизвестная ошибка при отправке видео.")
+                    await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать видео из #reels, {delivery.error}")
+                    await log_download(session, user_id, 'reels', link, status=False)
             finally:
-                if os.path.isfile(final_path):
-                    os.remove(final_path)
-                if final_path != path and os.path.isfile(path):
+                if os.path.isfile(path):
                     os.remove(path)
         else:
             await message.answer("Произошла ошибка при загрузке reels. Попробуйте воспользоваться функцией позже.")
@@ -627,33 +535,32 @@ async def get_link(message: Message, state: FSMContext, session: AsyncSession) -
         
         # Проверяем, нужен ли водяной знак
         add_wm = await should_add_watermark(session, user_id)
+
+        if await send_from_cache(message.bot, session, message.chat.id, link, 'video',
+                                 "Ваше видео готово!\n@django_media_helper_bot", watermark=add_wm):
+            await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #Pinterest (кеш)")
+            await log_download(session, user_id, 'pinterest', link, status=True)
+            await state.clear()
+            return
         
         try:
-            filename = pinterest.download_pin(link)
+            video_path = await jobs.run_job('pinterest', link=link, watermark=add_wm)
         except Exception as e:
             logger.error(e)
-            filename = None
-        if filename:
-            video_path = f"./videos/pinterest/{filename}.mp4"
-            # Добавляем водяной знак если нужно
-            final_path = worker.add_watermark_if_needed(video_path, add_wm)
-            
+            video_path = None
+        if video_path:
             try:
-                doc = await message.answer_video(video=FSInputFile(final_path),
-                                                    caption="Ваше видео готово!\n@django_media_helper_bot")
-                await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #Pinterest")
-                await log_download(session, user_id, 'pinterest', link, status=True)
-                if doc:
-                    if os.path.isfile(final_path):
-                        os.remove(final_path)
-                    if final_path != video_path and os.path.isfile(video_path):
-                        os.remove(video_path)
-            except Exception as e:
-                logger.error(e)
-                await log_download(session, user_id, 'pinterest', link, status=False)
-                if os.path.isfile(final_path):
-                    os.remove(final_path)
-                if final_path != video_path and os.path.isfile(video_path):
+                delivery = await deliver_video(message.bot, message.chat.id, video_path,
+                                               "Ваше видео готово!\n@django_media_helper_bot")
+                if delivery.ok:
+                    await remember_delivery(session, link, 'video', delivery, watermark=add_wm)
+                    await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #Pinterest")
+                    await log_download(session, user_id, 'pinterest', link, status=True)
+                else:
+                    logger.error(f"Pinterest: delivery failed ({delivery.route}): {delivery.error}")
+                    await log_download(session, user_id, 'pinterest', link, status=False)
+            finally:
+                if os.path.isfile(video_path):
                     os.remove(video_path)
         else:
             await message.answer("Извините, произошла ошибка. Видео недоступно, либо указана неверная ссылка!")
@@ -666,34 +573,32 @@ async def get_link(message: Message, state: FSMContext, session: AsyncSession) -
         
         # Проверяем, нужен ли водяной знак
         add_wm = await should_add_watermark(session, user_id)
+
+        if await send_from_cache(message.bot, session, message.chat.id, link, 'video',
+                                 "Ваш tiktok готов!\n@django_media_helper_bot", watermark=add_wm):
+            await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #tiktok (кеш)")
+            await log_download(session, user_id, 'tiktok', link, status=True)
+            await state.clear()
+            return
         
-        tiktok_downloader = worker.TikTokDownloader("./videos/tiktok")
         try:
-            filename = tiktok_downloader.download_video(link)
+            video_path = await jobs.run_job('tiktok', link=link, watermark=add_wm)
         except Exception as e:
             logger.error(e)
-            filename = None
-        if filename:
-            video_path = f"./videos/tiktok/{filename}"
-            # Добавляем водяной знак если нужно
-            final_path = worker.add_watermark_if_needed(video_path, add_wm)
-            
+            video_path = None
+        if video_path:
             try:
-                doc = await message.answer_video(video=FSInputFile(final_path),
-                                                    caption="Ваш tiktok готов!\n@django_media_helper_bot")
-                await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #tiktok")
-                await log_download(session, user_id, 'tiktok', link, status=True)
-                if doc:
-                    if os.path.isfile(final_path):
-                        os.remove(final_path)
-                    if final_path != video_path and os.path.isfile(video_path):
-                        os.remove(video_path)
-            except Exception as e:
-                logger.error(e)
-                await log_download(session, user_id, 'tiktok', link, status=False)
-                if os.path.isfile(final_path):
-                    os.remove(final_path)
-                if final_path != video_path and os.path.isfile(video_path):
+                delivery = await deliver_video(message.bot, message.chat.id, video_path,
+                                               "Ваш tiktok готов!\n@django_media_helper_bot")
+                if delivery.ok:
+                    await remember_delivery(session, link, 'video', delivery, watermark=add_wm)
+                    await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #tiktok")
+                    await log_download(session, user_id, 'tiktok', link, status=True)
+                else:
+                    logger.error(f"tiktok: delivery failed ({delivery.route}): {delivery.error}")
+                    await log_download(session, user_id, 'tiktok', link, status=False)
+            finally:
+                if os.path.isfile(video_path):
                     os.remove(video_path)
         else:
             await message.answer("Извините, произошла ошибка. Видео недоступно, либо указана неверная ссылка!")
@@ -715,16 +620,13 @@ async def process_video(message: Message, state: FSMContext, session: AsyncSessi
         tmp = rev.find('.')
         filename = rev[:tmp:-1]
         format = rev[tmp-1::-1]
-        video_file = await message.bot.get_file(video_id)
-        video_path = video_file.file_path  # Путь к загруженному видео
         os.makedirs("./videos/for_convert/", exist_ok=True)
         # Генерируем уникальное имя файла
         ind = 1
         while os.path.isfile(f"./videos/for_convert/{filename}.{format}"):
             filename = filename + f"({ind})"
             ind += 1
-        await message.bot.download_file(video_path, f"./videos/for_convert/{filename}.{format}")
-        video_path = f"./videos/for_convert/{filename}.{format}"
+        video_path = await ingest_file(message.bot, video_id, f"./videos/for_convert/{filename}.{format}")
         filename = await worker.convert_to_audio(video_path, filename=filename)
         # Отправляем извлечённое аудио обратно пользователю
         doc = await message.answer_audio(audio=FSInputFile(f"./audio/converted/{filename}"), caption="Вот ваше аудио!\n@django_media_helper_bot")
@@ -757,14 +659,11 @@ async def process_metadata(message: Message, state: FSMContext) -> None:
             tmp = rev.find('.')
             filename = rev[:tmp:-1]
             format = rev[tmp-1::-1]
-            file_tg = await message.bot.get_file(file_id)
-            file_path = file_tg.file_path  # Путь к загруженному видео
             ind = 1
             while os.path.isfile(f"./metadata/{filename}.{format}"):
                 filename = filename + f"({ind})"
                 ind += 1
-            await message.bot.download_file(file_path, f"./metadata/{filename}.{format}")
-            file_path = f"./metadata/{filename}.{format}"
+            file_path = await ingest_file(message.bot, file_id, f"./metadata/{filename}.{format}")
             print(file_path)
             meta = metadata.get_metadata(file_path)
             print(meta)
@@ -795,8 +694,6 @@ async def replace_audio_video(message: Message, state: FSMContext) -> None:
         tmp = rev.find('.')
         filename = rev[:tmp:-1]
         format = rev[tmp-1::-1]
-        video_file = await message.bot.get_file(video_id)
-        video_path = video_file.file_path  # Путь к загруженному видео
         os.makedirs("./videos/for_replace/", exist_ok=True)
         # Генерируем уникальное имя файла
         ind = 1
@@ -804,8 +701,7 @@ async def replace_audio_video(message: Message, state: FSMContext) -> None:
             filename = filename + f"({ind})"
             ind += 1
         filename = filename.strip()
-        await message.bot.download_file(video_path, f"./videos/for_replace/{filename}.{format}")
-        video_path = f"./videos/for_replace/{filename}.{format}"
+        video_path = await ingest_file(message.bot, video_id, f"./videos/for_replace/{filename}.{format}")
         await state.update_data(video=video_path)
         await message.answer("Теперь отправь аудио.")
         await state.set_state(ReplaceAudioState.audio)
@@ -832,15 +728,12 @@ async def replace_audio_audio(message: Message, state: FSMContext) -> None:
         tmp = rev.find('.')
         filename = rev[:tmp:-1]
         format = rev[tmp-1::-1]
-        audio_tg = await message.bot.get_file(audio_id)
-        audio_path = audio_tg.file_path  # Путь к загруженному видео
         ind = 1
         while os.path.isfile(f"./audio/for_replace/{filename}.{format}"):
             filename = filename + f"({ind})"
             ind += 1
         filename = filename.strip()
-        await message.bot.download_file(audio_path, f"./audio/for_replace/{filename}.{format}")
-        audio_path = f"./audio/for_replace/{filename}.{format}"
+        audio_path = await ingest_file(message.bot, audio_id, f"./audio/for_replace/{filename}.{format}")
         await state.update_data(audio=audio_path)
         data = await state.get_data()
         result_path = worker.replace_audio(data.get('video'), data.get('audio'))
@@ -945,7 +838,7 @@ async def handle_search_query(message: Message, state: FSMContext, session: Asyn
     await message.answer("🔍 Ищу видео...")
 
     # Выполняем поиск (10 сырых результатов, без эвристик — как раньше; Mini App использует другой API)
-    results = worker.search_videos(query, max_results=10)
+    results = await worker.search_videos(query, max_results=10)
     if not results:
         await message.answer("❌ По вашему запросу ничего не найдено.")
         await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) искал: {query}, но не смог ничего найти. из #YouTube")
@@ -1170,6 +1063,13 @@ async def handle_format_selection(callback: CallbackQuery, state: FSMContext, se
         return
     
     link = f"https://www.youtube.com/watch?v={selected_video['id']}"
+
+    if await send_from_cache(callback.bot, session, callback.message.chat.id, link, 'video',
+                             'Ваше видео готово!\n@django_media_helper_bot', format_id=format_id):
+        await callback.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) искал: {data.get('search_query', '')} и успешно скачал видео из #YouTube (кеш)")
+        await log_download(session, user_id, 'youtube', link, status=True)
+        await state.clear()
+        return
     
     # Меняем сообщение на "загрузка"
     await callback.message.edit_text(
@@ -1180,46 +1080,36 @@ async def handle_format_selection(callback: CallbackQuery, state: FSMContext, se
     
     # Загружаем видео
     try:
-        filename = await worker.download_from_youtube(link, format_id=format_id)
+        video_path = await jobs.run_job('youtube_video', link=link, format_id=format_id)
     except Exception as e:
         logger.error(e)
-        filename = None
-    if filename:
-        width, height = worker.get_video_resolution_moviepy(f"./videos/youtube/{filename}")
-        file_size = os.path.getsize(f"./videos/youtube/{filename}")
-        logger.info(f"Размер файла: {file_size} bytes ({file_size / 1024 / 1024:.2f} MB)")
+        video_path = None
+    if video_path:
         try:
-            doc = await callback.message.bot.send_video(callback.message.chat.id, FSInputFile(f"./videos/youtube/{filename}"), caption='Ваше видео готово!\n@django_media_helper_bot', supports_streaming=True, width=width, height=height)
-            await callback.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) искал: {data.get('search_query', '')} и успешно скачал видео из #YouTube")
-            await log_download(session, user_id, 'youtube', link, status=True)
-            if not doc:
-                await callback.message.edit_text("Извините, произошла ошибка. Видео недоступно, либо указана неверная ссылка!")
-                await callback.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) искал: {data.get('search_query', '')}, но не смог скачать видео из #YouTube")
-        except TelegramEntityTooLarge:
-            logger.info("Обнаружен TelegramEntityTooLarge, переходим к отправке через API")
-            sended = send_video_through_api(callback.message.chat.id, f"./videos/youtube/{filename}", width, height)
-            if not sended:
+            delivery = await deliver_video(callback.message.bot, callback.message.chat.id, video_path,
+                                           'Ваше видео готово!\n@django_media_helper_bot')
+            if delivery.ok:
+                await remember_delivery(session, link, 'video', delivery, format_id=format_id)
+                await callback.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) искал: {data.get('search_query', '')} и успешно скачал видео из #YouTube")
+                await log_download(session, user_id, 'youtube', link, status=True)
+            elif delivery.too_large:
                 await callback.message.edit_text("Извините, размер файла слишком большой для отправки по Telegram.")
                 await callback.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) искал: {data.get('search_query', '')}, но не смог скачать видео из #YouTube, размер файла слишком большой")
                 await log_download(session, user_id, 'youtube', link, status=False)
             else:
-                await callback.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) искал: {data.get('search_query', '')} и успешно скачал видео из #YouTube")
-                await log_download(session, user_id, 'youtube', link, status=True)
-        except Exception as e:
-            logger.error(f"Другая ошибка при отправке: {e}")
-            await callback.message.edit_text("Извините, произошла неизвестная ошибка при отправке видео.")
-            await callback.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) искал: {data.get('search_query', '')}, но не смог скачать видео из #YouTube, {e}")
-            await log_download(session, user_id, 'youtube', link, status=False)
+                await callback.message.edit_text("Извините, произошла неизвестная ошибка при отправке видео.")
+                await callback.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) искал: {data.get('search_query', '')}, но не смог скачать видео из #YouTube, {delivery.error}")
+                await log_download(session, user_id, 'youtube', link, status=False)
         finally:
-            if os.path.isfile(f"./videos/youtube/{filename}"):
-                os.remove(f"./videos/youtube/{filename}")
+            if os.path.isfile(video_path):
+                os.remove(video_path)
     else:
         await callback.message.edit_text("Извините, произошла ошибка. Видео недоступно, либо указана неверная ссылка!")
         await callback.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) искал: {data.get('search_query', '')}, но не смог скачать видео из #YouTube")
         await log_download(session, user_id, 'youtube', link, status=False)
         try:
-            if os.path.isfile(f"./videos/youtube/{filename}"):
-                os.remove(f"./videos/youtube/{filename}")
+            if video_path and os.path.isfile(video_path):
+                os.remove(video_path)
         except Exception as e:
             logger.error(e)
     
@@ -1288,11 +1178,9 @@ async def handle_voice_recognition(message: Message, state: FSMContext, session:
     try:
         # Скачиваем голосовое сообщение
         voice = message.voice
-        voice_file = await message.bot.get_file(voice.file_id)
-        
-        os.makedirs("./audio/recognition/", exist_ok=True)
-        voice_path = f"./audio/recognition/{user_id}_{voice.file_unique_id}.ogg"
-        await message.bot.download_file(voice_file.file_path, voice_path)
+        voice_path = await ingest_file(
+            message.bot, voice.file_id, f"./audio/recognition/{user_id}_{voice.file_unique_id}.ogg"
+        )
         
         # Распознаём музыку
         recognized = await worker.recognize_music(voice_path)
@@ -1445,11 +1333,9 @@ async def handle_video_recognition(message: Message, state: FSMContext, session:
     
     try:
         # Скачиваем видео
-        video_file = await message.bot.get_file(video.file_id)
-        
-        os.makedirs("./audio/recognition/", exist_ok=True)
-        video_path = f"./audio/recognition/{user_id}_{video.file_unique_id}.mp4"
-        await message.bot.download_file(video_file.file_path, video_path)
+        video_path = await ingest_file(
+            message.bot, video.file_id, f"./audio/recognition/{user_id}_{video.file_unique_id}.mp4"
+        )
         
         # Извлекаем аудио из видео через ffmpeg
         audio_path = f"./audio/recognition/{user_id}_{video.file_unique_id}.ogg"
@@ -1633,7 +1519,7 @@ async def handle_shazam_download(callback: CallbackQuery, state: FSMContext, ses
     
     try:
         # Ищем на YouTube
-        search_results = worker.search_videos(query, max_results=1)
+        search_results = await worker.search_videos(query, max_results=1)
         
         if not search_results:
             await status_msg.edit_text("❌ Не удалось найти трек на YouTube")
@@ -1650,11 +1536,32 @@ async def handle_shazam_download(callback: CallbackQuery, state: FSMContext, ses
         
         video = search_results[0]
         youtube_url = f"https://www.youtube.com/watch?v={video['id']}"
+
+        caption = (
+            f"🎵 {recognized['artist']} - {recognized['title']}\n"
+            f"@django_media_helper_bot"
+        )
+        cached = await send_from_cache(callback.bot, session, callback.message.chat.id, youtube_url, 'audio', caption)
+        if cached:
+            await save_sent_audio(session, cached, source='youtube', source_url=youtube_url)
+            await log_download(session, user_id, 'audio', link=youtube_url, status=True)
+            try:
+                await status_msg.delete()
+            except Exception:
+                pass
+            try:
+                await callback.message.bot.send_message(
+                    chat_id=config.DEV_CHANEL_ID,
+                    text=f"✅ @{username} (ID: {user_id}) скачал через Shazam (кеш): {recognized['artist']} - {recognized['title']} #shazam_download"
+                )
+            except Exception:
+                pass
+            return
         
         await status_msg.edit_text("⬇️ Скачиваю...")
         
         # Скачиваем аудио
-        result = await worker.get_audio_from_youtube(youtube_url)
+        result = await jobs.run_job('youtube_audio', link=youtube_url)
         
         if not result or not result.get('audio'):
             await status_msg.edit_text("❌ Не удалось скачать трек")
@@ -1669,56 +1576,36 @@ async def handle_shazam_download(callback: CallbackQuery, state: FSMContext, ses
             await state.clear()
             return
         
-        filename = result['audio']
         thumbnail_path = result.get('thumbnail')
-        file_path = f"./audio/youtube/{filename}"
+        file_path = result['audio']
         
         await status_msg.edit_text("📤 Отправляю...")
         
-        # Формируем caption
-        caption = (
-            f"🎵 {recognized['artist']} - {recognized['title']}\n"
-            f"@django_media_helper_bot"
+        # Отправляем аудио с правильными метаданными (большой файл — через локальный API)
+        delivery = await deliver_audio(
+            callback.message.bot,
+            callback.message.chat.id,
+            file_path,
+            caption,
+            thumbnail_path=thumbnail_path,
+            title=recognized['title'],
+            performer=recognized['artist'],
         )
-        
-        # Отправляем аудио с правильными метаданными
-        file_size = os.path.getsize(file_path) if os.path.isfile(file_path) else 0
-        
-        if file_size < 50 * 1024 * 1024:  # < 50MB
-            doc = await callback.message.answer_audio(
-                audio=FSInputFile(file_path),
-                title=recognized['title'],
-                performer=recognized['artist'],
-                thumbnail=FSInputFile(thumbnail_path) if thumbnail_path and os.path.isfile(thumbnail_path) else None,
-                caption=caption
-            )
-            
+        if delivery.ok:
             # Сохраняем в библиотеку (source_url сохранит ссылку на YouTube)
-            await save_sent_audio(session, doc, source='youtube', source_url=youtube_url)
+            await remember_delivery(session, youtube_url, 'audio', delivery)
+            await save_delivered_audio(session, user_id, delivery, source='youtube', source_url=youtube_url)
             await log_download(session, user_id, 'audio', link=youtube_url, status=True)
         else:
-            # Большой файл — через локальный API
-            api_result = send_audio_through_api(
-                user_id,
-                file_path,
-                thumbnail_path=thumbnail_path,
-                delete_after=False
-            )
-            
-            if api_result['success']:
-                await save_audio_from_api_response(session, user_id, api_result['response'], source='youtube', source_url=youtube_url)
-                await log_download(session, user_id, 'audio', link=youtube_url, status=True)
-                await callback.message.answer(caption)
-            else:
-                await log_download(session, user_id, 'audio', link=youtube_url, status=False)
-                await callback.message.answer("❌ Не удалось отправить файл")
-                try:
-                    await callback.message.bot.send_message(
-                        chat_id=config.DEV_CHANEL_ID,
-                        text=f"❌ @{username} (ID: {user_id}) не смог отправить большой файл через Shazam #shazam_download #error"
-                    )
-                except Exception:
-                    pass
+            await log_download(session, user_id, 'audio', link=youtube_url, status=False)
+            await callback.message.answer("❌ Не удалось отправить файл")
+            try:
+                await callback.message.bot.send_message(
+                    chat_id=config.DEV_CHANEL_ID,
+                    text=f"❌ @{username} (ID: {user_id}) не смог отправить файл через Shazam ({delivery.route}: {delivery.error}) #shazam_download #error"
+                )
+            except Exception:
+                pass
         
         try:
             await status_msg.delete()
@@ -1761,11 +1648,7 @@ async def handle_shazam_download(callback: CallbackQuery, state: FSMContext, ses
                 os.remove(file_path)
             except Exception:
                 pass
-        if thumbnail_path and os.path.isfile(thumbnail_path):
-            try:
-                os.remove(thumbnail_path)
-            except Exception:
-                pass
+        thumbnails.discard(thumbnail_path)
 
 
 @router.message(F.audio)
@@ -0,0 +1,137 @@
+"""
+Общие примитивы кешей и пулов соединений.
+
+evict_lru — дисковый кеш с вытеснением по mtime (mtime обновляется при попадании).
+LoopSession — общая HTTP-сессия, привязанная к event loop'у: у задач очереди свой asyncio.run,
+сессия чужого (закрытого) loop'а там непригодна — создаётся новая.
+SingleFlight — одинаковые запросы, идущие одновременно, выполняются один раз.
+KeyedLocks — asyncio.Lock на ключ; запись живёт, пока лок кто-то держит или ждёт.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+T = TypeVar("T")
+
+
+def evict_lru(directory: str, max_bytes: int, include: Callable[[str], bool]) -> int:
+    """
+    Держать файлы directory (те, чьё имя проходит include) в max_bytes: удаляются самые старые по mtime.
+    Возвращает число удалённых файлов.
+    """
+    entries = []
+    total = 0
+    try:
+        scan = list(os.scandir(directory))
+    except OSError:
+        return 0
+    for entry in scan:
+        try:
+            if entry.is_file() and include(entry.name):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        except OSError:
+            continue
+    removed = 0
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+class LoopSession:
+    """
+    Общая сессия (aiohttp.ClientSession) на event loop: factory() вызывается при первом обращении,
+    после close() и когда текущий loop не тот, в котором сессия создана.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._session = None
+        self._loop = None
+
+    async def get(self):
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = self._factory()
+            self._loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class SingleFlight:
+    """
+    Одновременные вызовы run() с одним ключом: func() выполняет первый, остальные ждут его результат
+    (или исключение). Если первого отменили — ожидающие не падают, а один из них выполняет func() сам.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        while True:
+            fut = self._inflight.get(key)
+            if fut is None:
+                break
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if not fut.cancelled():
+                    raise  # отменили самого ожидающего
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await func()
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # ожидающих может не быть — помечаем исключение полученным
+            raise
+        except BaseException:
+            fut.cancel()
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+
+class KeyedLocks:
+    """
+    Лок на ключ (например, одно скачивание на video_id). Счётчик держателей и ожидающих:
+    запись удаляется, только когда лок больше никому не нужен — новый вызов не получит второй лок
+    на тот же ключ, пока первый ещё держат или ждут.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, List] = {}  # ключ → [asyncio.Lock, число пользователей]
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._locks.get(key) is entry:
+                del self._locks[key]
@@ -57,4 +57,100 @@ YT_PO_TOKEN = os.environ.get("YT_PO_TOKEN")
 YT_VISITOR_DATA = os.environ.get("YT_VISITOR_DATA")
 
 # Локальный Bot API (для больших файлов), например http://127.0.0.1:8081
-LOCAL_BOT_API_URL = os.environ.get("LOCAL_BOT_API_URL", "").rstrip("/")
\ No newline at end of file
+LOCAL_BOT_API_URL = os.environ.get("LOCAL_BOT_API_URL", "").rstrip("/")
+# Очередь скачиваний (jobs/): inprocess — пул процессов внутри бота;
+# sqlite / postgres — бот только ставит задачи, выполняет их отдельный `python worker.py queue`
+# (может быть запущен на нескольких хостах с общей папкой WORKSPACE_ROOT и общей БД).
+JOB_QUEUE_BACKEND = (os.environ.get("JOB_QUEUE_BACKEND") or "inprocess").strip().lower()
+JOB_QUEUE_SQLITE_PATH = os.environ.get("JOB_QUEUE_SQLITE_PATH", "./data/jobs.sqlite3")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", os.cpu_count() or 2))
+JOB_TIMEOUT = int(os.environ.get("JOB_TIMEOUT", 900))  # сек на одну задачу (ожидание в боте)
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 0.5))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 2))  # повтор задачи, если consumer упал на ней
+
+# Кеш квадратных обложек YouTube (thumbnails.py): папка, предел размера (МБ), сторона квадрата (px)
+THUMB_CACHE_DIR = os.environ.get("THUMB_CACHE_DIR", "./thumbnails")
+THUMB_CACHE_MAX_MB = float(os.environ.get("THUMB_CACHE_MAX_MB", 200))
+THUMB_SIZE = int(os.environ.get("THUMB_SIZE", 320))
+
+# Поиск YouTube (yt_search.py): сколько сек кешировать выдачу по запросу, таймаут одного запроса (сек),
+# попыток на поиск, одновременных запросов к YouTube
+YT_SEARCH_CACHE_TTL = int(os.environ.get("YT_SEARCH_CACHE_TTL", 900))
+YT_SEARCH_TIMEOUT = float(os.environ.get("YT_SEARCH_TIMEOUT", 8))
+YT_SEARCH_ATTEMPTS = int(os.environ.get("YT_SEARCH_ATTEMPTS", 3))
+YT_SEARCH_CONCURRENCY = int(os.environ.get("YT_SEARCH_CONCURRENCY", 8))
+# Сколько сек комбинированный поиск Mini App ждёт YouTube; дальше отвечает только библиотекой (поиск досчитывается в кеш)
+SEARCH_YOUTUBE_TIMEOUT = float(os.environ.get("SEARCH_YOUTUBE_TIMEOUT", 4))
+# Импорт трека с YouTube из Mini App (api/import_jobs.py): одновременных скачиваний; сколько сек хранить итог задачи
+IMPORT_CONCURRENCY = int(os.environ.get("IMPORT_CONCURRENCY", 2))
+IMPORT_JOB_TTL = int(os.environ.get("IMPORT_JOB_TTL", 900))
+
+# HTTP-клиент API (api/telegram_files.py): максимум соединений; сколько сек кешировать file_path из getFile
+API_HTTP_MAX_CONNECTIONS = int(os.environ.get("API_HTTP_MAX_CONNECTIONS", 32))
+TG_FILE_PATH_TTL = int(os.environ.get("TG_FILE_PATH_TTL", 3000))
+
+# Стриминг аудио Mini App (api/audio_stream.py): срок подписанной ссылки (сек); кеш популярных треков —
+# папка, предел (МБ), со скольких прослушиваний трек кешируется
+STREAM_LINK_TTL = int(os.environ.get("STREAM_LINK_TTL", 6 * 3600))
+AUDIO_CACHE_DIR = os.environ.get("AUDIO_CACHE_DIR", "./data/audio_cache")
+AUDIO_CACHE_MAX_MB = float(os.environ.get("AUDIO_CACHE_MAX_MB", 2048))
+AUDIO_CACHE_MIN_PLAYS = int(os.environ.get("AUDIO_CACHE_MIN_PLAYS", 2))
+# Прогрев getFile для очереди (POST /audio/stream-urls): одновременных запросов к Telegram
+STREAM_PREFETCH_CONCURRENCY = int(os.environ.get("STREAM_PREFETCH_CONCURRENCY", 8))
+
+# Кеш обложек Mini App (api/cover_cache.py): папка, предел размера (МБ), заранее готовые превью (px, через запятую)
+COVER_CACHE_DIR = os.environ.get("COVER_CACHE_DIR", "./data/covers")
+COVER_CACHE_MAX_MB = float(os.environ.get("COVER_CACHE_MAX_MB", 256))
+COVER_VARIANT_SIZES = tuple(
+    int(s) for s in (os.environ.get("COVER_VARIANT_SIZES") or "96").split(",") if s.strip().isdigit()
+)
+
+# Рабочие папки задач (workspace.py): корень, бюджет диска и минимум свободного места (МБ),
+# сколько задача ждёт места (сек), tmpfs для мелких задач (пусто — не использовать), срок жизни и период уборки
+WORKSPACE_ROOT = os.environ.get("WORKSPACE_ROOT", "./data/workspaces")
+WORKSPACE_DISK_BUDGET_MB = float(os.environ.get("WORKSPACE_DISK_BUDGET_MB", 20480))
+WORKSPACE_MIN_FREE_MB = float(os.environ.get("WORKSPACE_MIN_FREE_MB", 1024))
+WORKSPACE_ADMISSION_TIMEOUT = float(os.environ.get("WORKSPACE_ADMISSION_TIMEOUT", 300))
+WORKSPACE_TMPFS_DIR = os.environ.get("WORKSPACE_TMPFS_DIR", "")
+WORKSPACE_TMPFS_BUDGET_MB = float(os.environ.get("WORKSPACE_TMPFS_BUDGET_MB", 512))
+WORKSPACE_TTL = int(os.environ.get("WORKSPACE_TTL", 6 * 3600))
+WORKSPACE_JANITOR_INTERVAL = int(os.environ.get("WORKSPACE_JANITOR_INTERVAL", 600))
+
+# Hedged-режим download_from_youtube: стратегии (без прокси → прокси → широкие форматы) запускаются
+# внахлёст — следующая стартует, если предыдущая не закончилась за YT_HEDGE_DELAY сек; побеждает первая удачная.
+YT_HEDGE_ENABLED = (os.environ.get("YT_HEDGE_ENABLED") or "").strip().lower() in ("1", "true", "yes", "on")
+YT_HEDGE_DELAY = float(os.environ.get("YT_HEDGE_DELAY", 8))
+YT_HEDGE_MAX_PARALLEL = int(os.environ.get("YT_HEDGE_MAX_PARALLEL", 2))  # одновременно идущих стратегий на загрузку
+YT_HEDGE_PER_PROXY = int(os.environ.get("YT_HEDGE_PER_PROXY", 2))  # одновременных загрузок через один прокси
+YT_HEDGE_DEADLINE = float(os.environ.get("YT_HEDGE_DEADLINE", 300))  # общий лимит на загрузку, сек
+
+# Здоровье прокси и cookie-слотов (route_health.py): порядок перебора и отключение мёртвых маршрутов
+HEALTH_DB_PATH = os.environ.get("HEALTH_DB_PATH", "./data/route_health.sqlite3")
+HEALTH_FAIL_THRESHOLD = int(os.environ.get("HEALTH_FAIL_THRESHOLD", 3))  # неудач подряд до отключения
+HEALTH_OPEN_SECONDS = int(os.environ.get("HEALTH_OPEN_SECONDS", 600))  # через сколько дать пробную попытку
+
+# Кеш yt-dlp info (полный info.json ролика) — один extract_info на метаданные, выбор формата и загрузку.
+# Папка общая для бота, consumer'ов и API; ссылки на потоки YouTube живут ~6 ч, TTL держим меньше.
+YT_INFO_CACHE_DIR = os.environ.get("YT_INFO_CACHE_DIR", "./data/yt_info")
+YT_INFO_CACHE_TTL = int(os.environ.get("YT_INFO_CACHE_TTL", 1800))
+
+# Ограничение одновременных задач очереди на платформу (jobs._TASK_LIMITS): всплеск TikTok/Pinterest не займёт весь пул
+TIKTOK_MAX_CONCURRENCY = int(os.environ.get("TIKTOK_MAX_CONCURRENCY", 4))
+PINTEREST_MAX_CONCURRENCY = int(os.environ.get("PINTEREST_MAX_CONCURRENCY", 4))
+
+# Клиент Bot API (bot_api.py): пул keep-alive соединений, кеш getMe локального сервера, таймаут чтения ответа на загрузку
+BOT_API_POOL_SIZE = int(os.environ.get("BOT_API_POOL_SIZE", 16))
+BOT_API_HEALTH_TTL = float(os.environ.get("BOT_API_HEALTH_TTL", 30))
+BOT_API_UPLOAD_TIMEOUT = float(os.environ.get("BOT_API_UPLOAD_TIMEOUT", 600))
+
+# Маршрутизация отправки (delivery.py): лимиты загрузки облачного Bot API и локального telegram-bot-api, МБ
+TG_CLOUD_UPLOAD_LIMIT_MB = int(os.environ.get("TG_CLOUD_UPLOAD_LIMIT_MB", 50))
+TG_LOCAL_UPLOAD_LIMIT_MB = int(os.environ.get("TG_LOCAL_UPLOAD_LIMIT_MB", 2000))
+# Локальный telegram-bot-api с --local на этом же хосте принимает file:///путь вместо multipart: auto / 1 / 0
+BOT_API_LOCAL_FILES = (os.environ.get("BOT_API_LOCAL_FILES") or "auto").strip().lower()
+
+# Сжатие под размер (worker.compress_to_size): пресет x264, двухпроходное кодирование (иначе CRF с потолком битрейта),
+# резерв под звук, кбит/с
+COMPRESS_PRESET = os.environ.get("COMPRESS_PRESET", "veryfast")
+COMPRESS_TWO_PASS = os.environ.get("COMPRESS_TWO_PASS", "1").strip().lower() in ("1", "true", "yes", "on")
+COMPRESS_AUDIO_KBPS = int(os.environ.get("COMPRESS_AUDIO_KBPS", 96))
@@ -1,16 +1,23 @@
 """Команды для работы с аудио, плейлистами и избранным"""
 
 from typing import Optional, List, Set
-from sqlalchemy import select, delete, func
+from sqlalchemy import case, select, delete, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import IntegrityError
 
 from models import UserAudio, Playlist, PlaylistTrack, Favorite
 
+_TRGM_MIN_LEN = 3  # pg_trgm режет строку на триграммы: короче запрос — только поиск подстроки
+
 
 # ==================== UserAudio ====================
 
+def _search_key(text: str):
+    """Запрос → тот же вид, что у UserAudio.search_key (SQL-функция из миграции 007)."""
+    return func.btrim(func.audio_search_key(text, None))
+
+
 async def save_audio(
     session: AsyncSession,
     user_id: int,
@@ -54,17 +61,31 @@ async def get_user_audio_list(
     offset: int = 0,
     search: Optional[str] = None
 ) -> List[UserAudio]:
-    """Получить список аудио пользователя с пагинацией и поиском"""
+    """
+    Получить список аудио пользователя с пагинацией и поиском.
+
+    Поиск идёт по search_key (GIN pg_trgm): регистр и кириллица/латиница не важны («кино» = «Kino»).
+    Сначала точные вхождения подстроки, затем похожие (word_similarity, опечатки) — по убыванию сходства.
+    """
     query = select(UserAudio).where(UserAudio.user_id == user_id)
     
+    search = (search or "").strip()
     if search:
-        search_pattern = f"%{search}%"
-        query = query.where(
-            (UserAudio.title.ilike(search_pattern)) | 
-            (UserAudio.artist.ilike(search_pattern))
-        )
+        key = _search_key(search)
+        escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        substring = UserAudio.search_key.contains(_search_key(escaped), escape="\\")
+        if len(search) < _TRGM_MIN_LEN:
+            query = query.where(substring).order_by(UserAudio.created_at.desc())
+        else:
+            query = query.where(substring | key.op("<%")(UserAudio.search_key)).order_by(
+                case((substring, 0), else_=1),
+                func.word_similarity(key, UserAudio.search_key).desc(),
+                UserAudio.created_at.desc(),
+            )
+    else:
+        query = query.order_by(UserAudio.created_at.desc())
     
-    query = query.order_by(UserAudio.created_at.desc()).offset(offset).limit(limit)
+    query = query.order_by(UserAudio.id.desc()).offset(offset).limit(limit)
     result = await session.execute(query)
     return result.scalars().all()
 
@@ -75,9 +96,28 @@ async def get_audio_by_id(session: AsyncSession, audio_id: int) -> Optional[User
     return result.scalars().first()
 
 
-async def get_audio_by_file_id(session: AsyncSession, file_id: str) -> Optional[UserAudio]:
-    """Получить аудио по file_id"""
-    result = await session.execute(select(UserAudio).where(UserAudio.file_id == file_id))
+async def get_user_audio_by_ids(session: AsyncSession, user_id: int, audio_ids: List[int]) -> List[UserAudio]:
+    """Аудио пользователя из списка ID одним запросом (чужие и несуществующие не возвращаются)"""
+    if not audio_ids:
+        return []
+    result = await session.execute(
+        select(UserAudio).where(UserAudio.id.in_(audio_ids), UserAudio.user_id == user_id)
+    )
+    return result.scalars().all()
+
+
+async def get_audio_by_file_id(
+    session: AsyncSession, file_id: str, user_id: Optional[int] = None
+) -> Optional[UserAudio]:
+    """
+    Получить аудио по file_id.
+    С user_id — только в библиотеке этого пользователя: file_id из media_cache
+    переотправляется разным пользователям, и у каждого должна быть своя запись.
+    """
+    query = select(UserAudio).where(UserAudio.file_id == file_id)
+    if user_id is not None:
+        query = query.where(UserAudio.user_id == user_id)
+    result = await session.execute(query)
     return result.scalars().first()
 
 
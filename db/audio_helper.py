@@ -38,7 +38,7 @@ async def save_sent_audio(
         user_id = message.chat.id
         
         # Проверяем, не сохранено ли уже
-        existing = await get_audio_by_file_id(session, audio.file_id)
+        existing = await get_audio_by_file_id(session, audio.file_id, user_id)
         if existing:
             logger.info(f"Audio already saved: {audio.file_id}")
             return None  # Возвращаем None чтобы обработчик знал, что уже существует
@@ -112,7 +112,7 @@ async def save_audio_from_api_response(
             return False
         
         # Проверяем, не сохранено ли уже
-        existing = await get_audio_by_file_id(session, file_id)
+        existing = await get_audio_by_file_id(session, file_id, user_id)
         if existing:
             logger.info(f"Audio already saved: {file_id}")
             return True
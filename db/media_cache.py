@@ -0,0 +1,103 @@
+"""Кеш Telegram file_id по нормализованной ссылке и варианту (видео/аудио, формат, водяной знак)"""
+
+import hashlib
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import MediaCache
+from url_utils import normalize_source_url
+
+
+logger = logging.getLogger(__name__)
+
+
+def make_variant(kind: str, format_id: Optional[str] = None, watermark: bool = False) -> str:
+    """Строка варианта: video|fmt=best|wm=0"""
+    return f"{kind}|fmt={format_id or 'best'}|wm={int(bool(watermark))}"
+
+
+def make_cache_key(link: str, variant: str) -> str:
+    return hashlib.sha256(f"{normalize_source_url(link)}|{variant}".encode()).hexdigest()
+
+
+async def get_cached_media(
+    session: AsyncSession,
+    link: str,
+    kind: str,
+    format_id: Optional[str] = None,
+    watermark: bool = False
+) -> Optional[MediaCache]:
+    """Найти ранее отправленный файл для ссылки; отмечает попадание (hits, last_used_at)."""
+    if not link:
+        return None
+    key = make_cache_key(link, make_variant(kind, format_id, watermark))
+    try:
+        result = await session.execute(select(MediaCache).where(MediaCache.cache_key == key))
+        entry = result.scalars().first()
+        if entry:
+            await session.execute(
+                update(MediaCache)
+                .where(MediaCache.id == entry.id)
+                .values(hits=MediaCache.hits + 1, last_used_at=datetime.now())
+            )
+            await session.commit()
+        return entry
+    except Exception as e:
+        logger.warning(f"media_cache: lookup failed: {e}")
+        await session.rollback()
+        return None
+
+
+async def save_cached_media(
+    session: AsyncSession,
+    link: str,
+    kind: str,
+    media_type: str,
+    file_id: str,
+    file_unique_id: Optional[str] = None,
+    format_id: Optional[str] = None,
+    watermark: bool = False
+) -> None:
+    """Запомнить file_id после первой успешной отправки (upsert по cache_key)."""
+    if not link or not file_id:
+        return
+    variant = make_variant(kind, format_id, watermark)
+    values = dict(
+        cache_key=make_cache_key(link, variant),
+        source_key=normalize_source_url(link),
+        variant=variant,
+        media_type=media_type,
+        file_id=file_id,
+        file_unique_id=file_unique_id,
+    )
+    stmt = insert(MediaCache).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MediaCache.cache_key],
+        set_=dict(
+            media_type=stmt.excluded.media_type,
+            file_id=stmt.excluded.file_id,
+            file_unique_id=stmt.excluded.file_unique_id,
+            last_used_at=datetime.now(),
+        ),
+    )
+    try:
+        await session.execute(stmt)
+        await session.commit()
+    except Exception as e:
+        logger.warning(f"media_cache: save failed: {e}")
+        await session.rollback()
+
+
+async def drop_cached_media(session: AsyncSession, entry: MediaCache) -> None:
+    """Удалить запись (file_id больше не принимается Telegram)."""
+    try:
+        await session.execute(delete(MediaCache).where(MediaCache.id == entry.id))
+        await session.commit()
+    except Exception as e:
+        logger.warning(f"media_cache: drop failed: {e}")
+        await session.rollback()
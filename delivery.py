@@ -0,0 +1,354 @@
+"""
+Доставка медиа пользователю.
+Повторные ссылки отвечаются пересылкой file_id из media_cache — без скачивания, ffmpeg и загрузки.
+Новые файлы идут через deliver_video / deliver_audio: маршрут (облачный Bot API, локальный Bot API,
+сжатие под лимит облака, документ) выбирается по размеру и пробе файла до начала загрузки.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramEntityTooLarge
+from aiogram.types import FSInputFile, Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import bot_api
+import jobs
+import media_probe
+import route_health
+from data.config import TG_CLOUD_UPLOAD_LIMIT_MB, TG_LOCAL_UPLOAD_LIMIT_MB
+from db.audio_helper import save_audio_from_api_response, save_sent_audio
+from db.media_cache import get_cached_media, save_cached_media, drop_cached_media
+from models import MediaCache
+
+
+logger = logging.getLogger(__name__)
+
+
+async def get_cached_entry(
+    session: AsyncSession,
+    link: str,
+    kind: str,
+    format_id: Optional[str] = None,
+    watermark: bool = False
+) -> Optional[MediaCache]:
+    """
+    Запись кеша (для inline edit_message_media: нужны file_id и тип — video / audio / document).
+    Если Telegram её отверг — удалить через drop_cached_media.
+    """
+    return await get_cached_media(session, link, kind, format_id, watermark)
+
+
+async def send_from_cache(
+    bot: Bot,
+    session: AsyncSession,
+    chat_id: int,
+    link: str,
+    kind: str,
+    caption: str,
+    format_id: Optional[str] = None,
+    watermark: bool = False
+) -> Optional[Message]:
+    """
+    Отправить ранее загруженный файл по file_id.
+    Возвращает отправленное сообщение или None (нет в кеше / Telegram отверг file_id — запись удаляется).
+    """
+    entry = await get_cached_media(session, link, kind, format_id, watermark)
+    if not entry:
+        return None
+    try:
+        if entry.media_type == 'audio':
+            msg = await bot.send_audio(chat_id, entry.file_id, caption=caption)
+        elif entry.media_type == 'document':
+            msg = await bot.send_document(chat_id, entry.file_id, caption=caption)
+        else:
+            msg = await bot.send_video(chat_id, entry.file_id, caption=caption, supports_streaming=True)
+        logger.info(f"media_cache hit: {entry.source_key} [{entry.variant}] -> chat {chat_id}")
+        return msg
+    except TelegramBadRequest as e:
+        logger.warning(f"media_cache: file_id rejected for {entry.source_key} [{entry.variant}]: {e}")
+        await drop_cached_media(session, entry)
+        return None
+
+
+async def remember_sent(
+    session: AsyncSession,
+    link: str,
+    kind: str,
+    message: Optional[Message],
+    format_id: Optional[str] = None,
+    watermark: bool = False
+) -> None:
+    """Сохранить file_id только что отправленного сообщения в кеш."""
+    if not message:
+        return
+    if message.video:
+        media_type, media = 'video', message.video
+    elif message.audio:
+        media_type, media = 'audio', message.audio
+    elif message.document:
+        media_type, media = 'document', message.document
+    else:
+        return
+    await save_cached_media(
+        session, link, kind, media_type, media.file_id,
+        file_unique_id=media.file_unique_id,
+        format_id=format_id,
+        watermark=watermark,
+    )
+
+
+async def remember_api_response(
+    session: AsyncSession,
+    link: str,
+    kind: str,
+    api_response: Optional[dict],
+    format_id: Optional[str] = None,
+    watermark: bool = False
+) -> None:
+    """То же для ответа Bot API (отправка через локальный сервер)."""
+    result = (api_response or {}).get('result') or {}
+    for media_type in ('video', 'audio', 'document'):
+        media = result.get(media_type)
+        if media and media.get('file_id'):
+            await save_cached_media(
+                session, link, kind, media_type, media['file_id'],
+                file_unique_id=media.get('file_unique_id'),
+                format_id=format_id,
+                watermark=watermark,
+            )
+            return
+
+
+# ==================== Маршрутизация загрузки ====================
+
+ROUTE_CLOUD = 'cloud'        # api.telegram.org через aiogram (до TG_CLOUD_UPLOAD_LIMIT_MB)
+ROUTE_LOCAL = 'local'        # локальный telegram-bot-api (до TG_LOCAL_UPLOAD_LIMIT_MB)
+ROUTE_COMPRESS = 'compress'  # сжатие под лимит: облака (локальный недоступен) или локального (файл больше его лимита)
+ROUTE_DOCUMENT = 'document'  # нет видеопотока (или проба не удалась) — отправка документом
+
+_CLOUD_LIMIT = TG_CLOUD_UPLOAD_LIMIT_MB * 1024 * 1024
+_LOCAL_LIMIT = TG_LOCAL_UPLOAD_LIMIT_MB * 1024 * 1024
+
+
+@dataclass
+class Delivery:
+    """Итог отправки: маршрут и то, что вернул Telegram (сообщение aiogram или JSON локального API)."""
+    route: Optional[str]
+    ok: bool
+    message: Optional[Message] = None
+    api_response: Optional[dict] = None
+    error: Optional[str] = None
+
+    @property
+    def too_large(self) -> bool:
+        return self.error == 'too_large'
+
+    def _media(self):
+        """(тип, file_id) отправленного файла: 'video' / 'audio' / 'document'."""
+        for media_type in ('video', 'audio', 'document'):
+            if self.message is not None:
+                media = getattr(self.message, media_type)
+                file_id = media.file_id if media else None
+            else:
+                media = ((self.api_response or {}).get('result') or {}).get(media_type) or {}
+                file_id = media.get('file_id')
+            if file_id:
+                return media_type, file_id
+        return None, None
+
+    @property
+    def media_type(self) -> Optional[str]:
+        return self._media()[0]
+
+    @property
+    def file_id(self) -> Optional[str]:
+        return self._media()[1]
+
+    @property
+    def message_id(self) -> Optional[int]:
+        if self.message is not None:
+            return self.message.message_id
+        return ((self.api_response or {}).get('result') or {}).get('message_id')
+
+
+async def choose_route(size: int, media_type: str, info: Optional[media_probe.MediaInfo] = None) -> Optional[str]:
+    """Маршрут по размеру файла; None — отправить нельзя никак."""
+    if size <= _CLOUD_LIMIT:
+        if media_type == 'video' and (info is None or not info.video_codec):
+            return ROUTE_DOCUMENT
+        return ROUTE_CLOUD
+    if size <= _LOCAL_LIMIT and await bot_api.is_healthy():
+        return ROUTE_LOCAL
+    if media_type == 'video' and info is not None and info.duration:
+        return ROUTE_COMPRESS
+    return None
+
+
+async def _record(route: Optional[str], ok: bool, started: float, error: Optional[BaseException] = None) -> None:
+    if route:
+        await asyncio.to_thread(route_health.record, route_health.KIND_DELIVERY, route, ok,
+                                time.monotonic() - started, error)
+
+
+async def _send_cloud_video(bot: Bot, chat_id: int, path: str, caption: str, width, height, media_type: str):
+    if media_type == 'document':
+        return await bot.send_document(chat_id, FSInputFile(path), caption=caption)
+    return await bot.send_video(chat_id, FSInputFile(path), caption=caption, supports_streaming=True,
+                                width=width, height=height)
+
+
+async def _send_local_video(chat_id: int, path: str, caption: str, width, height, media_type: str) -> dict:
+    if media_type == 'document':
+        return await bot_api.send_document(chat_id, path, caption=caption)
+    return await bot_api.send_video(chat_id, path, width=width, height=height, caption=caption)
+
+
+async def deliver_video(
+    bot: Bot,
+    chat_id: int,
+    path: str,
+    caption: str,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+) -> Delivery:
+    """
+    Отправить видеофайл по маршруту, выбранному до загрузки.
+    Сам файл не удаляется (это делает обработчик); временный сжатый файл — удаляется.
+    """
+    info = await media_probe.probe(path)
+    size = info.size if info else os.path.getsize(path)
+    if width is None or height is None:
+        width, height = info.dimensions if info else media_probe.DEFAULT_DIMENSIONS
+    media_type = 'video' if info is not None and info.video_codec else 'document'
+    route = await choose_route(size, 'video', info)
+    logger.info(f"delivery: {path} ({size / 1024 / 1024:.1f} MB) -> {route}")
+    if route is None:
+        return Delivery(None, False, error='too_large')
+
+    started = time.monotonic()
+    send_path = path
+    via_local = route == ROUTE_LOCAL
+    try:
+        if route == ROUTE_COMPRESS:
+            # Сюда попадают и файлы больше лимита локального сервера — тогда жмём под его лимит
+            via_local = await bot_api.is_healthy()
+            target_mb = TG_LOCAL_UPLOAD_LIMIT_MB if via_local else TG_CLOUD_UPLOAD_LIMIT_MB
+            # x264 — задача очереди: пул процессов / consumer, своя рабочая папка и резерв диска
+            try:
+                send_path = await jobs.run_job('compress', path=path, max_size_mb=target_mb)
+            except Exception as e:
+                logger.error(f"delivery: compress job failed for {path}: {e}")
+                send_path = None
+            if not send_path:
+                await _record(route, False, started)
+                return Delivery(route, False, error='too_large')
+            width, height = await media_probe.get_dimensions(send_path)
+            media_type = 'video'  # compress_to_size выдаёт H.264 — это уже видео
+
+        if via_local:
+            response = await _send_local_video(chat_id, send_path, caption, width, height, media_type)
+            ok = bool(response.get('ok'))
+            if not ok and 'error_code' not in response:
+                bot_api.mark_unhealthy()
+            await _record(route, ok, started)
+            return Delivery(route, ok, api_response=response, error=None if ok else response.get('description'))
+
+        try:
+            msg = await _send_cloud_video(bot, chat_id, send_path, caption, width, height, media_type)
+        except TelegramEntityTooLarge as e:
+            # Лимит облака меньше настроенного — один раз пробуем локальный сервер
+            await _record(route, False, started, e)
+            if await bot_api.is_healthy():
+                started = time.monotonic()
+                route = ROUTE_LOCAL
+                response = await _send_local_video(chat_id, send_path, caption, width, height, media_type)
+                ok = bool(response.get('ok'))
+                await _record(route, ok, started)
+                return Delivery(route, ok, api_response=response, error=None if ok else response.get('description'))
+            return Delivery(None, False, error='too_large')
+        await _record(route, True, started)
+        return Delivery(route, True, message=msg)
+    except Exception as e:
+        logger.error(f"delivery: {route} failed for {path}: {e}")
+        await _record(route, False, started, e)
+        return Delivery(route, False, error=str(e))
+    finally:
+        if send_path and send_path != path and os.path.isfile(send_path):
+            os.remove(send_path)
+
+
+async def deliver_audio(
+    bot: Bot,
+    chat_id: int,
+    path: str,
+    caption: str,
+    thumbnail_path: Optional[str] = None,
+    title: Optional[str] = None,
+    performer: Optional[str] = None,
+) -> Delivery:
+    """То же для аудио: облако или локальный Bot API (сжатия нет)."""
+    size = os.path.getsize(path)
+    route = await choose_route(size, 'audio')
+    logger.info(f"delivery: {path} ({size / 1024 / 1024:.1f} MB) -> {route}")
+    if route is None:
+        return Delivery(None, False, error='too_large')
+    thumbnail_path = thumbnail_path if thumbnail_path and os.path.isfile(thumbnail_path) else None
+    started = time.monotonic()
+    try:
+        if route == ROUTE_LOCAL:
+            response = await bot_api.send_audio(chat_id, path, thumbnail_path=thumbnail_path,
+                                                title=title, performer=performer, caption=caption)
+            ok = bool(response.get('ok'))
+            if not ok and 'error_code' not in response:
+                bot_api.mark_unhealthy()
+            await _record(route, ok, started)
+            return Delivery(route, ok, api_response=response, error=None if ok else response.get('description'))
+        msg = await bot.send_audio(
+            chat_id,
+            FSInputFile(path),
+            caption=caption,
+            title=title,
+            performer=performer,
+            thumbnail=FSInputFile(thumbnail_path) if thumbnail_path else None,
+        )
+        await _record(route, True, started)
+        return Delivery(route, True, message=msg)
+    except Exception as e:
+        logger.error(f"delivery: {route} failed for {path}: {e}")
+        await _record(route, False, started, e)
+        return Delivery(route, False, error=str(e))
+
+
+async def remember_delivery(
+    session: AsyncSession,
+    link: str,
+    kind: str,
+    delivery: Delivery,
+    format_id: Optional[str] = None,
+    watermark: bool = False
+) -> None:
+    """remember_sent / remember_api_response — в зависимости от маршрута."""
+    if delivery.message is not None:
+        await remember_sent(session, link, kind, delivery.message, format_id=format_id, watermark=watermark)
+    elif delivery.api_response:
+        await remember_api_response(session, link, kind, delivery.api_response, format_id=format_id, watermark=watermark)
+
+
+async def save_delivered_audio(
+    session: AsyncSession,
+    user_id: int,
+    delivery: Delivery,
+    source: Optional[str] = None,
+    source_url: Optional[str] = None
+) -> None:
+    """Сохранить отправленное аудио в библиотеку пользователя (save_sent_audio / save_audio_from_api_response)."""
+    if delivery.message is not None:
+        await save_sent_audio(session, delivery.message, source=source, source_url=source_url)
+    elif delivery.api_response:
+        await save_audio_from_api_response(session, user_id, delivery.api_response, source=source, source_url=source_url)
@@ -0,0 +1,53 @@
+"""
+Приём файлов, которые пользователь прислал боту (видео, аудио, документы, голосовые).
+
+Если локальный Bot API доступен, getFile идёт через него: в --local режиме он отдаёт абсолютный путь
+на этом же диске — файл не копируется, а связывается жёсткой ссылкой (на другом разделе — копия
+в пределах хоста); без --local — потоковое скачивание с локального сервера. В обоих случаях
+облачный лимит getFile в 20 МБ не действует. Если локальный сервер недоступен — bot.download_file.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+
+from aiogram import Bot
+
+import bot_api
+
+logger = logging.getLogger(__name__)
+
+
+def _link_or_copy(src: str, dest: str) -> None:
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+async def ingest_file(bot: Bot, file_id: str, dest_path: str) -> str:
+    """
+    Положить файл пользователя в dest_path (обработчик удаляет его сам, как и раньше).
+
+    Returns:
+        dest_path
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    if await bot_api.is_healthy():
+        resp = await bot_api.call("getFile", data={"file_id": file_id})
+        file_path = (resp.get("result") or {}).get("file_path") if resp.get("ok") else None
+        if file_path and os.path.isabs(file_path) and os.path.isfile(file_path):
+            try:
+                await asyncio.to_thread(_link_or_copy, file_path, dest_path)
+                logger.info(f"ingest: {file_id} linked from local Bot API storage")
+                return dest_path
+            except OSError as e:
+                logger.warning(f"ingest: cannot link {file_path}: {e}")
+        elif file_path and await bot_api.download(file_path, dest_path):
+            return dest_path
+        else:
+            logger.warning(f"ingest: local Bot API getFile failed: {resp.get('description')}")
+    tg_file = await bot.get_file(file_id)
+    await bot.download_file(tg_file.file_path, dest_path)
+    return dest_path
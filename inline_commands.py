@@ -6,7 +6,6 @@ Inline режим бота для скачивания видео в любом
 import hashlib
 import os
 import logging
-import asyncio
 
 from aiogram import Router, F
 from aiogram.types import (
@@ -14,19 +13,22 @@ from aiogram.types import (
     InlineQueryResultArticle, 
     InputTextMessageContent,
     ChosenInlineResult,
-    FSInputFile,
     InputMediaVideo,
     InputMediaAudio,
+    InputMediaDocument,
     InlineKeyboardMarkup,
     InlineKeyboardButton,
     CallbackQuery
 )
 
+from aiogram.exceptions import TelegramBadRequest
 from sqlalchemy.ext.asyncio import AsyncSession
 
-import worker
-from bot_commands import send_video_through_api, send_audio_through_api
+import jobs
+import thumbnails
 from db.download_log import log_download, should_add_watermark
+from db.media_cache import drop_cached_media
+from delivery import get_cached_entry, deliver_audio, deliver_video, remember_delivery
 from data import config
 
 logger = logging.getLogger(__name__)
@@ -36,28 +38,6 @@ DEV_CHANEL_ID = config.DEV_CHANEL_ID
 inline_router = Router()
 
 
-def get_video_dimensions(file_path: str) -> tuple:
-    """Получает размеры видео через ffprobe"""
-    try:
-        import subprocess
-        import json
-        
-        cmd = [
-            'ffprobe', '-v', 'quiet', '-print_format', 'json',
-            '-show_streams', file_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-        info = json.loads(result.stdout)
-        
-        for stream in info.get('streams', []):
-            if stream.get('codec_type') == 'video':
-                return stream.get('width', 1280), stream.get('height', 720)
-        
-        return 1280, 720
-    except Exception:
-        return 1280, 720
-
-
 def detect_platform(url: str) -> str:
     """Определяет платформу по URL"""
     url_lower = url.lower()
@@ -213,56 +193,59 @@ async def chosen_inline_handler(chosen: ChosenInlineResult, session: AsyncSessio
         add_wm = await should_add_watermark(session, user_id)
     
     file_path = None
-    original_file_path = None
     thumbnail_path = None
     
     try:
+        # Этот файл уже отправлялся — подставляем file_id без скачивания
+        cached = await get_cached_entry(session, url, 'audio' if is_audio else 'video', watermark=add_wm)
+        if cached:
+            caption = "🎵 via @django_media_helper_bot" if is_audio else "🎥 via @django_media_helper_bot"
+            try:
+                # Тип — как при первой отправке: видео без видеопотока уходило документом
+                if can_edit_inline:
+                    media_class = {
+                        'audio': InputMediaAudio,
+                        'video': InputMediaVideo,
+                        'document': InputMediaDocument,
+                    }.get(cached.media_type, InputMediaVideo)
+                    await chosen.bot.edit_message_media(
+                        inline_message_id=inline_message_id,
+                        media=media_class(media=cached.file_id, caption=caption)
+                    )
+                elif cached.media_type == 'audio':
+                    await chosen.bot.send_audio(chat_id=user_id, audio=cached.file_id, caption=caption)
+                elif cached.media_type == 'document':
+                    await chosen.bot.send_document(chat_id=user_id, document=cached.file_id, caption=caption)
+                else:
+                    await chosen.bot.send_video(chat_id=user_id, video=cached.file_id, caption=caption)
+                logger.info(f"Inline cache hit: {platform} {'audio' if is_audio else 'video'} for user {user_id}")
+                await log_download(session, user_id, 'audio' if is_audio else platform, url, status=True)
+                return
+            except TelegramBadRequest as e:
+                logger.warning(f"Cached file_id rejected, downloading again: {e}")
+                await drop_cached_media(session, cached)
+
         # Скачиваем контент
         if is_audio and platform == 'youtube':
-            result = await worker.get_audio_from_youtube(url)
+            result = await jobs.run_job('youtube_audio', link=url)
             if result and result.get('audio'):
-                file_path = f"./audio/youtube/{result['audio']}"
+                file_path = result['audio']
                 thumbnail_path = result.get('thumbnail')
         else:
-            # Видео
-            if platform == 'youtube':
-                logger.info("Starting YouTube download...")
-                filename = await worker.download_from_youtube(url)
-                logger.info(f"YouTube download result: {filename}")
-                if filename:
-                    # download_from_youtube возвращает только имя файла
-                    file_path = f"./videos/youtube/{filename}"
-                    logger.info(f"File path: {file_path}")
-            elif platform == 'instagram':
-                logger.info("Starting Instagram download...")
-                result = await worker.download_instagram_reels(url)
-                logger.info(f"Instagram download result: {result}")
-                if result:
-                    # download_instagram_reels возвращает полный путь
-                    file_path = result
-                    logger.info(f"File path: {file_path}")
-            elif platform == 'tiktok':
-                logger.info("Starting TikTok download...")
-                downloader = worker.TikTokDownloader(save_path='videos/tiktok')
-                filename = downloader.download_video(url)
-                logger.info(f"TikTok download result: {filename}")
-                if filename:
-                    # TikTokDownloader возвращает только имя файла
-                    file_path = f"./videos/tiktok/{filename}"
-                    logger.info(f"File path: {file_path}")
-            elif platform == 'pinterest':
-                logger.info("Starting Pinterest download...")
+            # Видео: задачи очереди возвращают путь к файлу
+            task = {
+                'youtube': 'youtube_video',
+                'instagram': 'instagram_reels',
+                'tiktok': 'tiktok',
+                'pinterest': 'pinterest',
+            }.get(platform)
+            if task:
+                logger.info(f"Starting {platform} download...")
                 try:
-                    import pinterest
-                    import asyncio
-                    # download_pin - синхронная функция, запускаем в thread pool
-                    filename = await asyncio.to_thread(pinterest.download_pin, url)
-                    logger.info(f"Pinterest download result: {filename}")
-                    if filename:
-                        file_path = f"./videos/pinterest/{filename}.mp4"
-                        logger.info(f"File path: {file_path}")
+                    file_path = await jobs.run_job(task, link=url, watermark=add_wm)
                 except Exception as e:
-                    logger.error(f"Pinterest download error: {e}")
+                    logger.error(f"{platform} download error: {e}")
+                logger.info(f"{platform} download result: {file_path}")
         
         logger.info(f"Checking file_path: {file_path}")
         logger.info(f"File exists: {os.path.isfile(file_path) if file_path else 'N/A'}")
@@ -284,125 +267,41 @@ async def chosen_inline_handler(chosen: ChosenInlineResult, session: AsyncSessio
                 )
             return
         
-        # Добавляем водяной знак если нужно (только для видео)
-        original_file_path = file_path
-        if add_wm and not is_audio:
-            file_path = worker.add_watermark_if_needed(file_path, add_wm)
-            logger.info(f"Watermark applied: {file_path}")
-        
-        file_size = os.path.getsize(file_path)
-        logger.info(f"File size: {file_size} bytes ({file_size / 1024 / 1024:.2f} MB)")
-        is_large_file = file_size > 50 * 1024 * 1024  # > 50 МБ
-        
         # Загружаем файл в Telegram через личку пользователю, получаем file_id
+        # (облако или локальный Bot API — по размеру файла, до начала загрузки)
+        caption = "🎵 via @django_media_helper_bot" if is_audio else "🎥 via @django_media_helper_bot"
         if is_audio:
-            if is_large_file:
-                # Большой файл — через локальный Bot API
-                api_result = await asyncio.to_thread(
-                    send_audio_through_api,
-                    user_id,
-                    file_path,
-                    thumbnail_path,
-                    False  # delete_after
-                )
-                if not api_result.get('success'):
-                    await chosen.bot.edit_message_text(
-                        inline_message_id=inline_message_id,
-                        text="❌ Не удалось отправить большой файл."
-                    )
-                    return
-                
-                # Извлекаем file_id из ответа API
-                response = api_result.get('response', {})
-                result_data = response.get('result', {})
-                audio_data = result_data.get('audio', {})
-                file_id = audio_data.get('file_id')
-                temp_message_id = result_data.get('message_id')
-            else:
-                # Маленький файл — через aiogram
-                temp_msg = await chosen.bot.send_audio(
-                    chat_id=user_id,
-                    audio=FSInputFile(file_path),
-                    thumbnail=FSInputFile(thumbnail_path) if thumbnail_path and os.path.isfile(thumbnail_path) else None,
-                    caption="🎵 via @django_media_helper_bot"
-                )
-                file_id = temp_msg.audio.file_id
-                temp_message_id = temp_msg.message_id
-            
-            if not file_id:
-                error_text = "❌ Не удалось загрузить файл."
-                if can_edit_inline:
-                    await chosen.bot.edit_message_text(inline_message_id=inline_message_id, text=error_text)
-                else:
-                    await chosen.bot.send_message(chat_id=user_id, text=error_text)
-                return
-            
-            if can_edit_inline:
-                # Редактируем inline сообщение — заменяем текст на аудио
-                await chosen.bot.edit_message_media(
-                    inline_message_id=inline_message_id,
-                    media=InputMediaAudio(
-                        media=file_id,
-                        caption="🎵 via @django_media_helper_bot"
-                    )
-                )
-                # Удаляем временное сообщение из лички
-                if temp_message_id:
-                    await chosen.bot.delete_message(chat_id=user_id, message_id=temp_message_id)
-            # Если can_edit_inline=False, аудио уже отправлено в личку — ничего не делаем
-            
+            delivery = await deliver_audio(chosen.bot, user_id, file_path, caption, thumbnail_path=thumbnail_path)
         else:
-            # Видео
-            if is_large_file:
-                # Большой файл — через локальный Bot API
-                width, height = await asyncio.to_thread(get_video_dimensions, file_path)
-                
-                api_result = await asyncio.to_thread(
-                    send_video_through_api,
-                    user_id,
-                    file_path,
-                    width,
-                    height
-                )
-                if not api_result:
-                    error_text = "❌ Не удалось отправить большой файл."
-                    if can_edit_inline:
-                        await chosen.bot.edit_message_text(inline_message_id=inline_message_id, text=error_text)
-                    else:
-                        await chosen.bot.send_message(chat_id=user_id, text=error_text)
-                    return
-                
-                # Видео уже отправлено в личку через API
-                if can_edit_inline:
-                    await chosen.bot.edit_message_text(
-                        inline_message_id=inline_message_id,
-                        text="✅ Видео отправлено в личные сообщения бота.\nФайл слишком большой для inline."
-                    )
-                return
-            else:
-                # Маленький файл — через aiogram
-                logger.info(f"Sending video to user {user_id}...")
-                temp_msg = await chosen.bot.send_video(
-                    chat_id=user_id,
-                    video=FSInputFile(file_path),
-                    caption="🎥 via @django_media_helper_bot"
-                )
-                logger.info(f"Video sent! file_id: {temp_msg.video.file_id}")
-                file_id = temp_msg.video.file_id
-                temp_message_id = temp_msg.message_id
-            
+            logger.info(f"Sending video to user {user_id}...")
+            delivery = await deliver_video(chosen.bot, user_id, file_path, caption)
+        file_id = delivery.file_id if delivery.ok else None
+        
+        if not file_id:
+            error_text = "❌ Не удалось отправить большой файл." if delivery.too_large else "❌ Не удалось загрузить файл."
             if can_edit_inline:
-                # Редактируем inline сообщение — заменяем текст на видео
-                await chosen.bot.edit_message_media(
-                    inline_message_id=inline_message_id,
-                    media=InputMediaVideo(
-                        media=file_id,
-                        caption="🎥 via @django_media_helper_bot"
-                    )
-                )
-                # Удаляем временное сообщение из лички
-                await chosen.bot.delete_message(chat_id=user_id, message_id=temp_message_id)
-            # Если can_edit_inline=False, видео уже отправлено в личку — ничего не делаем
+                await chosen.bot.edit_message_text(inline_message_id=inline_message_id, text=error_text)
+            else:
+                await chosen.bot.send_message(chat_id=user_id, text=error_text)
+            return
+        logger.info(f"File sent via {delivery.route}! file_id: {file_id}")
+        await remember_delivery(session, url, 'audio' if is_audio else 'video', delivery, watermark=add_wm and not is_audio)
+        
+        if can_edit_inline:
+            # Редактируем inline сообщение — заменяем текст на файл
+            media_class = {
+                'audio': InputMediaAudio,
+                'video': InputMediaVideo,
+                'document': InputMediaDocument,
+            }[delivery.media_type]
+            await chosen.bot.edit_message_media(
+                inline_message_id=inline_message_id,
+                media=media_class(media=file_id, caption=caption)
+            )
+            # Удаляем временное сообщение из лички
+            if delivery.message_id:
+                await chosen.bot.delete_message(chat_id=user_id, message_id=delivery.message_id)
+        # Если can_edit_inline=False, файл уже отправлен в личку — ничего не делаем
         
         logger.info(f"Inline download success: {platform} {'audio' if is_audio else 'video'} for user {user_id}")
         
@@ -456,14 +355,4 @@ async def chosen_inline_handler(chosen: ChosenInlineResult, session: AsyncSessio
                 os.remove(file_path)
             except Exception:
                 pass
-        # Удаляем оригинальный файл если был добавлен водяной знак
-        if original_file_path and original_file_path != file_path and os.path.isfile(original_file_path):
-            try:
-                os.remove(original_file_path)
-            except Exception:
-                pass
-        if thumbnail_path and os.path.isfile(thumbnail_path):
-            try:
-                os.remove(thumbnail_path)
-            except Exception:
-                pass
+        thumbnails.discard(thumbnail_path)
@@ -0,0 +1,103 @@
+"""
+Очередь задач скачивания.
+Обработчики бота не запускают yt-dlp/ffmpeg сами, а вызывают `await run_job(task, **kwargs)`:
+backend (JOB_QUEUE_BACKEND) выполняет задачу в пуле процессов бота или отдаёт её
+внешнему consumer'у (`python worker.py queue`), а бот только ждёт результат и доставляет файл.
+"""
+
+import asyncio
+import logging
+from typing import Any, Optional
+
+import worker
+import workspace
+from data import config
+from jobs.backends import JobFailed, create_backend
+from jobs.tasks import TASKS
+from url_utils import normalize_source_url
+
+
+logger = logging.getLogger(__name__)
+
+_backend = None
+
+# Не больше N одновременных задач платформы, чтобы всплеск TikTok/Pinterest не занял весь пул
+_TASK_LIMITS = {
+    'tiktok': config.TIKTOK_MAX_CONCURRENCY,
+    'pinterest': config.PINTEREST_MAX_CONCURRENCY,
+}
+_task_semaphores = {}
+
+# Резерв места под задачу (МБ) в рабочей папке; звук — мелкая задача (может уйти в tmpfs)
+_TASK_DISK_MB = {
+    'youtube_video': 1024,
+    'youtube_audio': 100,
+    'instagram_reels': 200,
+    'tiktok': 200,
+    'pinterest': 200,
+}
+_SMALL_TASKS = {'youtube_audio'}
+
+
+def _reserve_mb(task: str, payload: dict) -> float:
+    """Резерв под задачу; у сжатия результат не больше цели (+10% на проходы x264 и контейнер)."""
+    if task == 'compress':
+        return float(payload.get('max_size_mb') or 0) * 1.1 or 500
+    return _TASK_DISK_MB.get(task, 500)
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = create_backend()
+    return _backend
+
+
+async def _run_in_workspace(task: str, payload: dict, timeout: float) -> Any:
+    """Своя папка под задачу (ждём места в бюджете диска); упавшая задача не оставляет файлов."""
+    async with workspace.job_workspace(task, _reserve_mb(task, payload), small=task in _SMALL_TASKS) as workdir:
+        return await _run_backend(task, {**payload, 'workdir': workdir}, timeout)
+
+
+async def _run_backend(task: str, payload: dict, timeout: float) -> Any:
+    limit = _TASK_LIMITS.get(task)
+    if not limit:
+        return await get_backend().run(task, payload, timeout)
+    if task not in _task_semaphores:
+        _task_semaphores[task] = asyncio.Semaphore(max(1, limit))
+    async with _task_semaphores[task]:
+        return await get_backend().run(task, payload, timeout)
+
+
+async def run_job(task: str, timeout: Optional[float] = None, **payload: Any) -> Any:
+    """
+    Выполнить задачу скачивания и дождаться результата.
+    Результат — путь к файлу (для youtube_audio — {'audio', 'thumbnail'}) или None.
+    Ошибки задачи/таймаут пробрасываются исключением, как раньше из download-функций.
+    Одинаковые задачи (task, нормализованная ссылка, остальные аргументы — в т.ч. watermark), поставленные
+    одновременно, выполняются один раз (worker.single_flight): каждый получает свой путь к файлу.
+    Задача пишет в свою рабочую папку (workspace.job_workspace); если места нет — ждёт.
+    """
+    if task not in TASKS:
+        raise ValueError(f"Unknown job task: {task}")
+    timeout = timeout or config.JOB_TIMEOUT
+    link = payload.get("link")
+    if not link:
+        return await asyncio.wait_for(_run_in_workspace(task, payload, timeout), timeout)
+    key = (
+        task,
+        normalize_source_url(link),
+        tuple(sorted((k, str(v)) for k, v in payload.items() if k != "link")),
+    )
+    return await asyncio.wait_for(
+        worker.single_flight(key, lambda: _run_in_workspace(task, payload, timeout)),
+        timeout,
+    )
+
+
+def serve(workers: Optional[int] = None) -> None:
+    from jobs.consumer import serve as _serve
+    _serve(workers)
+
+
+__all__ = ['run_job', 'get_backend', 'serve', 'JobFailed', 'TASKS']
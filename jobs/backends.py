@@ -0,0 +1,300 @@
+"""
+Бэкенды очереди задач.
+
+inprocess — задачи выполняются в ProcessPoolExecutor внутри процесса бота (без внешнего consumer'а).
+sqlite / postgres — бот кладёт задачу в таблицу и ждёт результат, задачи забирает
+`python worker.py queue` (jobs.consumer). Файлы-результаты должны быть доступны боту
+по тем же относительным путям (общий cwd / общий том).
+"""
+
+import abc
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from data import config
+from jobs.tasks import execute
+from models import DownloadJob
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobFailed(Exception):
+    """Задача завершилась ошибкой в consumer'е"""
+
+
+class InProcessBackend:
+    """Пул процессов в самом боте: yt-dlp/ffmpeg не держат event loop и GIL бота."""
+
+    shared = False
+
+    def __init__(self, workers: int):
+        self._workers = max(1, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._workers)
+        return self._pool
+
+    async def run(self, task: str, payload: Dict[str, Any], timeout: float) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._get_pool(), execute, task, payload)
+        return await asyncio.wait_for(future, timeout)
+
+
+class _SharedBackend(abc.ABC):
+    """Общая логика очередей в БД: enqueue + ожидание результата опросом."""
+
+    shared = True
+
+    @abc.abstractmethod
+    async def enqueue(self, task: str, payload: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def fetch(self, job_id: str) -> Tuple[str, Any, Optional[str]]:
+        """(status, result, error)"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def cancel(self, job_id: str) -> None:
+        """Снять задачу, которую так и не начали (бот перестал ждать)."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def claim(self, worker_id: str) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        """Забрать следующую задачу: (job_id, task, payload) или None."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def finish(self, job_id: str, result: Any = None, error: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    async def run(self, task: str, payload: Dict[str, Any], timeout: float) -> Any:
+        job_id = await self.enqueue(task, payload)
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            status, result, error = await self.fetch(job_id)
+            if status == "done":
+                return result
+            if status == "failed":
+                raise JobFailed(error or "job failed")
+            if asyncio.get_running_loop().time() >= deadline:
+                await self.cancel(job_id)
+                raise asyncio.TimeoutError(f"job {job_id} ({task}) timed out")
+            await asyncio.sleep(config.JOB_POLL_INTERVAL)
+
+    @staticmethod
+    def _stale_before() -> datetime:
+        """Задачи в running дольше этого — consumer умер, можно перезабрать."""
+        return datetime.now() - timedelta(seconds=config.JOB_TIMEOUT * 2)
+
+
+class SQLiteBackend(_SharedBackend):
+    """Очередь в файле SQLite (один хост, несколько процессов consumer'а)."""
+
+    def __init__(self, path: str):
+        self._path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS download_jobs (
+                    id TEXT PRIMARY KEY,
+                    task TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_download_jobs_status_created ON download_jobs (status, created_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._path, timeout=30, isolation_level=None)
+
+    def _enqueue_sync(self, task: str, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO download_jobs (id, task, payload, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, task, json.dumps(payload), datetime.now().isoformat()),
+            )
+        return job_id
+
+    def _fetch_sync(self, job_id: str) -> Tuple[str, Any, Optional[str]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT status, result, error FROM download_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if not row:
+            return "failed", None, "job disappeared"
+        status, result, error = row
+        return status, json.loads(result) if result else None, error
+
+    def _cancel_sync(self, job_id: str) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE download_jobs SET status = 'failed', error = 'timeout', finished_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (datetime.now().isoformat(), job_id),
+            )
+
+    def _claim_sync(self, worker_id: str) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        conn = self._connect()
+        try:
+            # IMMEDIATE — write-lock сразу, два consumer'а не заберут одну задачу
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, task, payload FROM download_jobs "
+                "WHERE status = 'queued' OR (status = 'running' AND started_at < ? AND attempts < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (self._stale_before().isoformat(), config.JOB_MAX_ATTEMPTS),
+            ).fetchone()
+            if not row:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE download_jobs SET status = 'running', worker = ?, started_at = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (worker_id, datetime.now().isoformat(), row[0]),
+            )
+            conn.execute("COMMIT")
+            return row[0], row[1], json.loads(row[2])
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _finish_sync(self, job_id: str, result: Any, error: Optional[str]) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE download_jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (
+                    "failed" if error else "done",
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    datetime.now().isoformat(),
+                    job_id,
+                ),
+            )
+
+    async def enqueue(self, task, payload):
+        return await asyncio.to_thread(self._enqueue_sync, task, payload)
+
+    async def fetch(self, job_id):
+        return await asyncio.to_thread(self._fetch_sync, job_id)
+
+    async def cancel(self, job_id):
+        await asyncio.to_thread(self._cancel_sync, job_id)
+
+    async def claim(self, worker_id):
+        return await asyncio.to_thread(self._claim_sync, worker_id)
+
+    async def finish(self, job_id, result=None, error=None):
+        await asyncio.to_thread(self._finish_sync, job_id, result, error)
+
+
+class PostgresBackend(_SharedBackend):
+    """Очередь в основной БД (таблица download_jobs), consumer'ы на любых хостах: FOR UPDATE SKIP LOCKED."""
+
+    def __init__(self, db_url: str):
+        self._engine = create_async_engine(db_url, echo=False, pool_size=5)
+        self._sessionmaker = async_sessionmaker(self._engine, expire_on_commit=False)
+
+    async def enqueue(self, task, payload):
+        job_id = uuid.uuid4().hex
+        async with self._sessionmaker() as session:
+            session.add(DownloadJob(id=job_id, task=task, payload=json.dumps(payload), status='queued', attempts=0))
+            await session.commit()
+        return job_id
+
+    async def fetch(self, job_id):
+        async with self._sessionmaker() as session:
+            row = (await session.execute(
+                select(DownloadJob.status, DownloadJob.result, DownloadJob.error).where(DownloadJob.id == job_id)
+            )).first()
+        if not row:
+            return "failed", None, "job disappeared"
+        return row.status, json.loads(row.result) if row.result else None, row.error
+
+    async def cancel(self, job_id):
+        async with self._sessionmaker() as session:
+            await session.execute(
+                update(DownloadJob)
+                .where(DownloadJob.id == job_id, DownloadJob.status == 'queued')
+                .values(status='failed', error='timeout', finished_at=datetime.now())
+            )
+            await session.commit()
+
+    async def claim(self, worker_id):
+        async with self._sessionmaker() as session:
+            job = (await session.execute(
+                select(DownloadJob)
+                .where(or_(
+                    DownloadJob.status == 'queued',
+                    and_(
+                        DownloadJob.status == 'running',
+                        DownloadJob.started_at < self._stale_before(),
+                        DownloadJob.attempts < config.JOB_MAX_ATTEMPTS,
+                    ),
+                ))
+                .order_by(DownloadJob.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )).scalars().first()
+            if job is None:
+                return None
+            job.status = 'running'
+            job.worker = worker_id
+            job.started_at = datetime.now()
+            job.attempts = (job.attempts or 0) + 1
+            await session.commit()
+            return job.id, job.task, json.loads(job.payload)
+
+    async def finish(self, job_id, result=None, error=None):
+        async with self._sessionmaker() as session:
+            await session.execute(
+                update(DownloadJob)
+                .where(DownloadJob.id == job_id)
+                .values(
+                    status='failed' if error else 'done',
+                    result=json.dumps(result) if result is not None else None,
+                    error=error,
+                    finished_at=datetime.now(),
+                )
+            )
+            await session.commit()
+
+
+def create_backend(name: Optional[str] = None):
+    name = (name or config.JOB_QUEUE_BACKEND or "inprocess").lower()
+    if name == "sqlite":
+        return SQLiteBackend(config.JOB_QUEUE_SQLITE_PATH)
+    if name in ("postgres", "postgresql"):
+        return PostgresBackend(config.DB_PATH)
+    if name != "inprocess":
+        logger.warning(f"Unknown JOB_QUEUE_BACKEND={name!r}, using inprocess")
+    return InProcessBackend(config.JOB_WORKERS)
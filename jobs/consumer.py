@@ -0,0 +1,76 @@
+"""
+Consumer очереди: `python worker.py queue`.
+JOB_WORKERS процессов, каждый забирает задачи из sqlite/postgres и выполняет их по одной.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import traceback
+
+from data import config
+from jobs.backends import create_backend
+from jobs.tasks import execute
+
+
+logger = logging.getLogger(__name__)
+
+
+async def _consume(worker_id: str) -> None:
+    backend = create_backend()
+    logger.info(f"Job consumer {worker_id} started ({config.JOB_QUEUE_BACKEND})")
+    while True:
+        try:
+            job = await backend.claim(worker_id)
+        except Exception as e:
+            logger.error(f"Job consumer {worker_id}: claim failed: {e}")
+            await asyncio.sleep(5)
+            continue
+        if job is None:
+            await asyncio.sleep(config.JOB_POLL_INTERVAL)
+            continue
+        job_id, task, payload = job
+        logger.info(f"Job {job_id} ({task}) -> {worker_id}")
+        try:
+            # Задачи синхронные и сами крутят asyncio.run — выносим из loop'а consumer'а
+            result = await asyncio.to_thread(execute, task, payload)
+            await backend.finish(job_id, result=result)
+        except Exception as e:
+            logger.error(f"Job {job_id} ({task}) failed: {e}\n{traceback.format_exc()}")
+            await backend.finish(job_id, error=f"{type(e).__name__}: {e}"[:2000])
+
+
+def _consumer_main(index: int) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    try:
+        asyncio.run(_consume(worker_id))
+    except KeyboardInterrupt:
+        pass
+
+
+def serve(workers: int = None) -> None:
+    """Запустить пул consumer'ов и ждать (Ctrl+C — остановка)."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if config.JOB_QUEUE_BACKEND not in ("sqlite", "postgres", "postgresql"):
+        logger.error(
+            f"JOB_QUEUE_BACKEND={config.JOB_QUEUE_BACKEND!r}: задачи выполняются внутри бота, consumer не нужен"
+        )
+        return
+    workers = workers or config.JOB_WORKERS
+    processes = [
+        multiprocessing.Process(target=_consumer_main, args=(i,), name=f"job-consumer-{i}", daemon=True)
+        for i in range(max(1, workers))
+    ]
+    for p in processes:
+        p.start()
+    logger.info(f"Started {len(processes)} job consumers")
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        logger.info("Stopping job consumers...")
+        for p in processes:
+            p.terminate()
@@ -0,0 +1,94 @@
+"""
+Задачи скачивания, выполняемые в процессах пула / consumer'а.
+Функции синхронные и верхнего уровня (pickle для ProcessPoolExecutor),
+аргументы и результат — JSON-совместимые (для sqlite/postgres очереди).
+Все результаты — пути к файлам относительно cwd бота.
+workdir — рабочая папка задачи (workspace.job_workspace); без неё (задачи, поставленные
+старой версией бота) — общие папки, как раньше.
+watermark — водяной знак на видео накладывается здесь же, в процессе-исполнителе, а не в обработчике бота.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Callable, Dict, Optional
+
+import pinterest
+import thumbnails
+import worker
+
+
+logger = logging.getLogger(__name__)
+
+
+def _finish_video(file_path: Optional[str], watermark: bool) -> Optional[str]:
+    """Водяной знак (если нужен) — результат задачи уже с ним, оригинал удаляется."""
+    if not file_path or not watermark:
+        return file_path
+    return worker.add_watermark_if_needed(file_path, True)
+
+
+def youtube_video(
+    link: str, format_id: str = "best", workdir: Optional[str] = None, watermark: bool = False
+) -> Optional[str]:
+    path = workdir or "./videos/youtube"
+    filename = asyncio.run(worker.download_from_youtube(link, path=path, format_id=format_id))
+    return _finish_video(f"{path}/{filename}" if filename else None, watermark)
+
+
+def youtube_audio(link: str, workdir: Optional[str] = None) -> Optional[Dict[str, Optional[str]]]:
+    """{'audio': путь к mp3, 'thumbnail': путь к обложке или None}"""
+    path = workdir or "./audio/youtube"
+    src_path = f"{workdir}/src" if workdir else None
+
+    async def run():
+        try:
+            return await worker.get_audio_from_youtube(link, path=path, src_path=src_path)
+        finally:
+            await thumbnails.close_session()
+
+    result = asyncio.run(run())
+    if not result or not result.get("audio"):
+        return None
+    return {"audio": f"{path}/{result['audio']}", "thumbnail": result.get("thumbnail")}
+
+
+def instagram_reels(link: str, workdir: Optional[str] = None, watermark: bool = False) -> Optional[str]:
+    return _finish_video(worker._download_instagram_reels_sync(link, path=workdir or "./videos/reels"), watermark)
+
+
+def tiktok(link: str, workdir: Optional[str] = None, watermark: bool = False) -> Optional[str]:
+    path = workdir or "./videos/tiktok"
+    filename = worker.TikTokDownloader(path).download_video(link)
+    return _finish_video(f"{path}/{filename}" if filename else None, watermark)
+
+
+def pinterest_video(link: str, workdir: Optional[str] = None, watermark: bool = False) -> Optional[str]:
+    path = workdir or "./videos/pinterest"
+    filename = pinterest.download_pin(link, path=path)
+    return _finish_video(f"{path}/{filename}.mp4" if filename else None, watermark)
+
+
+def compress(path: str, max_size_mb: float, workdir: Optional[str] = None) -> Optional[str]:
+    """Сжать готовое видео под max_size_mb (worker.compress_to_size); исходник не трогается."""
+    base = os.path.splitext(os.path.basename(path))[0]
+    out_dir = workdir or os.path.dirname(path) or "."
+    return worker.compress_to_size(path, f"{out_dir}/{base}_small.mp4", max_size_mb)
+
+
+TASKS: Dict[str, Callable[..., Any]] = {
+    "youtube_video": youtube_video,
+    "youtube_audio": youtube_audio,
+    "instagram_reels": instagram_reels,
+    "tiktok": tiktok,
+    "pinterest": pinterest_video,
+    "compress": compress,
+}
+
+
+def execute(task: str, payload: Dict[str, Any]) -> Any:
+    """Точка входа в процессе-исполнителе."""
+    func = TASKS.get(task)
+    if func is None:
+        raise ValueError(f"Unknown job task: {task}")
+    return func(**payload)
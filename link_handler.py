@@ -1,17 +1,17 @@
 import worker
+import jobs
 import logging
 import os
-import pinterest
 import re
 
-from aiogram.types import Message, FSInputFile, InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.types import Message, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
 from aiogram.enums.chat_action import ChatAction
-from aiogram.exceptions import TelegramEntityTooLarge
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from data import config
 from db.download_log import log_download, should_add_watermark
+from delivery import send_from_cache, deliver_video, remember_delivery
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -44,44 +44,38 @@ async def handle_instagram_link(message: Message, session: AsyncSession):
     
     # Проверяем, нужен ли водяной знак
     add_wm = await should_add_watermark(session, user_id)
+
+    if await send_from_cache(message.bot, session, message.chat.id, link, 'video',
+                             "Ваш reels готов!\n@django_media_helper_bot", watermark=add_wm):
+        await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #reels (кеш)")
+        await log_download(session, user_id, 'reels', link, status=True)
+        return
     
     try:
-        path = await worker.download_instagram_reels(link)
+        path = await jobs.run_job('instagram_reels', link=link, watermark=add_wm)
     except Exception as e:
         logger.error(e)
         path = None
         
     if path:
-        # Добавляем водяной знак если нужно
-        final_path = worker.add_watermark_if_needed(path, add_wm)
-        
         try:
-            await message.answer_video(video=FSInputFile(final_path), caption="Ваш reels готов!\n@django_media_helper_bot")
-            await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #reels напрямую")
-            # Логируем успешную загрузку
-            await log_download(session, user_id, 'reels', link, status=True)
-        except TelegramEntityTooLarge:
-            logger.info("Обнаружен TelegramEntityTooLarge, переходим к отправке через API")
-            from bot_commands import send_video_through_api
-            width, height = worker.get_video_resolution_moviepy(final_path)
-            sended = send_video_through_api(message.chat.id, final_path, width, height)
-            if not sended:
+            delivery = await deliver_video(message.bot, message.chat.id, path,
+                                           "Ваш reels готов!\n@django_media_helper_bot")
+            if delivery.ok:
+                await remember_delivery(session, link, 'video', delivery, watermark=add_wm)
+                await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #reels напрямую")
+                # Логируем успешную загрузку
+                await log_download(session, user_id, 'reels', link, status=True)
+            elif delivery.too_large:
                 await message.answer("Извините, размер файла слишком большой для отправки по Telegram.")
                 await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать видео из #reels, размер файла слишком большой")
                 await log_download(session, user_id, 'reels', link, status=False)
             else:
-                await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #reels")
-                await log_download(session, user_id, 'reels', link, status=True)
-        except Exception as e:
-            logger.error(f"Другая ошибка при отправке: {e}")
-            await message.answer("Извините, произошла неизвестная ошибка при отправке видео.")
-            await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать видео из #reels, {e}")
-            await log_download(session, user_id, 'reels', link, status=False)
+                await message.answer("Извините, произошла неизвестная ошибка при отправке видео.")
+                await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) не смог скачать видео из #reels, {delivery.error}")
+                await log_download(session, user_id, 'reels', link, status=False)
         finally:
-            if os.path.isfile(final_path):
-                os.remove(final_path)
-            # Удаляем оригинал если он отличается от финального
-            if final_path != path and os.path.isfile(path):
+            if os.path.isfile(path):
                 os.remove(path)
     else:
         await message.answer("Произошла ошибка при загрузке reels. Попробуйте воспользоваться функцией позже.")
@@ -105,35 +99,35 @@ async def handle_youtube_shorts(message: Message, session: AsyncSession):
     
     # Проверяем, нужен ли водяной знак
     add_wm = await should_add_watermark(session, user_id)
+
+    if await send_from_cache(message.bot, session, message.chat.id, url, 'video',
+                             "Ваш Shorts готов!\n@django_media_helper_bot", watermark=add_wm):
+        await message.bot.send_message(
+            chat_id=config.DEV_CHANEL_ID,
+            text=f"Пользователь @{username} (ID: {user_id}) успешно скачал #shorts (кеш)"
+        )
+        await log_download(session, user_id, 'shorts', url, status=True)
+        return
     
     try:
-        video_filename = await worker.download_from_youtube(url)
+        video_path = await jobs.run_job('youtube_video', link=url, watermark=add_wm)
         
-        if video_filename:
-            video_path = f"./videos/youtube/{video_filename}"
-            # Добавляем водяной знак если нужно
-            final_path = worker.add_watermark_if_needed(video_path, add_wm)
-            
+        if video_path:
             try:
-                await message.answer_video(
-                    video=FSInputFile(final_path),
-                    caption="Ваш Shorts готов!\n@django_media_helper_bot"
-                )
-                await message.bot.send_message(
-                    chat_id=config.DEV_CHANEL_ID,
-                    text=f"Пользователь @{username} (ID: {user_id}) успешно скачал #shorts"
-                )
-                await log_download(session, user_id, 'shorts', url, status=True)
-            except TelegramEntityTooLarge:
-                await message.answer_document(
-                    document=FSInputFile(final_path),
-                    caption="Ваш Shorts готов!\n@django_media_helper_bot"
-                )
-                await log_download(session, user_id, 'shorts', url, status=True)
+                delivery = await deliver_video(message.bot, message.chat.id, video_path,
+                                               "Ваш Shorts готов!\n@django_media_helper_bot")
+                if delivery.ok:
+                    await remember_delivery(session, url, 'video', delivery, watermark=add_wm)
+                    await message.bot.send_message(
+                        chat_id=config.DEV_CHANEL_ID,
+                        text=f"Пользователь @{username} (ID: {user_id}) успешно скачал #shorts"
+                    )
+                    await log_download(session, user_id, 'shorts', url, status=True)
+                else:
+                    await message.answer("❌ Не удалось отправить Shorts.")
+                    await log_download(session, user_id, 'shorts', url, status=False)
             finally:
-                if os.path.isfile(final_path):
-                    os.remove(final_path)
-                if final_path != video_path and os.path.isfile(video_path):
+                if os.path.isfile(video_path):
                     os.remove(video_path)
         else:
             await message.answer("❌ Не удалось скачать Shorts.")
@@ -213,35 +207,32 @@ async def handle_tiktok_link(message: Message, session: AsyncSession):
     
     # Проверяем, нужен ли водяной знак
     add_wm = await should_add_watermark(session, user_id)
+
+    if await send_from_cache(message.bot, session, message.chat.id, link, 'video',
+                             "Ваш tiktok готов!\n@django_media_helper_bot", watermark=add_wm):
+        await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #tiktok (кеш)")
+        await log_download(session, user_id, 'tiktok', link, status=True)
+        return
     
-    tiktok_downloader = worker.TikTokDownloader("./videos/tiktok")
     try:
-        filename = tiktok_downloader.download_video(link)
+        video_path = await jobs.run_job('tiktok', link=link, watermark=add_wm)
     except Exception as e:
         logger.error(e)
-        filename = None
-        
-    if filename:
-        video_path = f"./videos/tiktok/{filename}"
-        # Добавляем водяной знак если нужно
-        final_path = worker.add_watermark_if_needed(video_path, add_wm)
+        video_path = None
         
+    if video_path:
         try:
-            doc = await message.answer_video(video=FSInputFile(final_path),
-                                                caption="Ваш tiktok готов!\n@django_media_helper_bot")
-            await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #tiktok напрямую")
-            await log_download(session, user_id, 'tiktok', link, status=True)
-            if doc:
-                if os.path.isfile(final_path):
-                    os.remove(final_path)
-                if final_path != video_path and os.path.isfile(video_path):
-                    os.remove(video_path)
-        except Exception as e:
-            logger.error(e)
-            await log_download(session, user_id, 'tiktok', link, status=False)
-            if os.path.isfile(final_path):
-                os.remove(final_path)
-            if final_path != video_path and os.path.isfile(video_path):
+            delivery = await deliver_video(message.bot, message.chat.id, video_path,
+                                           "Ваш tiktok готов!\n@django_media_helper_bot")
+            if delivery.ok:
+                await remember_delivery(session, link, 'video', delivery, watermark=add_wm)
+                await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #tiktok напрямую")
+                await log_download(session, user_id, 'tiktok', link, status=True)
+            else:
+                logger.error(f"tiktok: delivery failed ({delivery.route}): {delivery.error}")
+                await log_download(session, user_id, 'tiktok', link, status=False)
+        finally:
+            if os.path.isfile(video_path):
                 os.remove(video_path)
     else:
         await message.answer("Извините, произошла ошибка. Видео недоступно, либо указана неверная ссылка!")
@@ -258,34 +249,32 @@ async def handle_pinterest_link(message: Message, session: AsyncSession):
     
     # Проверяем, нужен ли водяной знак
     add_wm = await should_add_watermark(session, user_id)
+
+    if await send_from_cache(message.bot, session, message.chat.id, link, 'video',
+                             "Ваше видео готово!\n@django_media_helper_bot", watermark=add_wm):
+        await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #Pinterest (кеш)")
+        await log_download(session, user_id, 'pinterest', link, status=True)
+        return
     
     try:
-        filename = pinterest.download_pin(link)
+        video_path = await jobs.run_job('pinterest', link=link, watermark=add_wm)
     except Exception as e:
         logger.error(e)
-        filename = None
-        
-    if filename:
-        video_path = f"./videos/pinterest/{filename}.mp4"
-        # Добавляем водяной знак если нужно
-        final_path = worker.add_watermark_if_needed(video_path, add_wm)
+        video_path = None
         
+    if video_path:
         try:
-            doc = await message.answer_video(video=FSInputFile(final_path),
-                                                caption="Ваше видео готово!\n@django_media_helper_bot")
-            await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #Pinterest напрямую")
-            await log_download(session, user_id, 'pinterest', link, status=True)
-            if doc:
-                if os.path.isfile(final_path):
-                    os.remove(final_path)
-                if final_path != video_path and os.path.isfile(video_path):
-                    os.remove(video_path)
-        except Exception as e:
-            logger.error(e)
-            await log_download(session, user_id, 'pinterest', link, status=False)
-            if os.path.isfile(final_path):
-                os.remove(final_path)
-            if final_path != video_path and os.path.isfile(video_path):
+            delivery = await deliver_video(message.bot, message.chat.id, video_path,
+                                           "Ваше видео готово!\n@django_media_helper_bot")
+            if delivery.ok:
+                await remember_delivery(session, link, 'video', delivery, watermark=add_wm)
+                await message.bot.send_message(chat_id=config.DEV_CHANEL_ID, text=f"Пользователь @{username} (ID: {user_id}) успешно скачал видео из #Pinterest напрямую")
+                await log_download(session, user_id, 'pinterest', link, status=True)
+            else:
+                logger.error(f"Pinterest: delivery failed ({delivery.route}): {delivery.error}")
+                await log_download(session, user_id, 'pinterest', link, status=False)
+        finally:
+            if os.path.isfile(video_path):
                 os.remove(video_path)
     else:
         await message.answer("Извините, произошла ошибка. Видео недоступно, либо указана неверная ссылка!")
@@ -0,0 +1,174 @@
+"""
+Проба медиафайлов через ffprobe: один запуск на файл → размеры, длительность, кодеки, битрейт, поворот.
+Результат кешируется по (путь, inode, mtime, размер): доставка, водяной знак и метаданные
+переиспользуют одну пробу, а изменённый/перезаписанный файл пробуется заново.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import subprocess
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIMENSIONS = (1280, 720)
+
+_FFPROBE_CMD = ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams']
+_CACHE_SIZE = 512
+_cache: "OrderedDict[Tuple[str, int, int, int], MediaInfo]" = OrderedDict()
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    path: str
+    size: int
+    duration: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    bitrate: Optional[int] = None
+    rotation: int = 0
+    streams: List[Dict[str, Any]] = field(default_factory=list, repr=False, compare=False)
+
+    @property
+    def dimensions(self) -> Tuple[int, int]:
+        """(ширина, высота) как их покажет плеер — с учётом поворота; для файлов без видео — 1280x720."""
+        if not self.width or not self.height:
+            return DEFAULT_DIMENSIONS
+        if self.rotation % 180 == 90:
+            return self.height, self.width
+        return self.width, self.height
+
+
+def _cache_key(path: str) -> Optional[Tuple[str, int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return os.path.abspath(path), st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _rotation(stream: Dict[str, Any]) -> int:
+    rotate = (stream.get('tags') or {}).get('rotate')
+    if rotate is None:
+        for side_data in stream.get('side_data_list') or []:
+            if 'rotation' in side_data:
+                rotate = side_data['rotation']
+                break
+    try:
+        return int(float(rotate or 0)) % 360
+    except (TypeError, ValueError):
+        return 0
+
+
+def _to_number(value, cast):
+    try:
+        return cast(value) if value not in (None, '', 'N/A') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse(path: str, size: int, data: Dict[str, Any]) -> MediaInfo:
+    streams = data.get('streams') or []
+    fmt = data.get('format') or {}
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    duration = _to_number(fmt.get('duration'), float)
+    if duration is None and video:
+        duration = _to_number(video.get('duration'), float)
+    return MediaInfo(
+        path=path,
+        size=size,
+        duration=duration,
+        width=_to_number(video.get('width'), int) if video else None,
+        height=_to_number(video.get('height'), int) if video else None,
+        video_codec=video.get('codec_name') if video else None,
+        audio_codec=audio.get('codec_name') if audio else None,
+        bitrate=_to_number(fmt.get('bit_rate'), int),
+        rotation=_rotation(video) if video else 0,
+        streams=streams,
+    )
+
+
+def _remember(key, info: MediaInfo) -> MediaInfo:
+    _cache[key] = info
+    _cache.move_to_end(key)
+    while len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return info
+
+
+def _cached(key) -> Optional[MediaInfo]:
+    info = _cache.get(key)
+    if info is not None:
+        _cache.move_to_end(key)
+    return info
+
+
+async def probe(path: str) -> Optional[MediaInfo]:
+    """ffprobe без блокировки event loop; None — файла нет или это не медиа."""
+    key = _cache_key(path)
+    if key is None:
+        return None
+    info = _cached(key)
+    if info is not None:
+        return info
+    proc = None
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *_FFPROBE_CMD, path, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=30)
+        if proc.returncode != 0:
+            logger.warning(f"ffprobe error for {path}: {stderr.decode(errors='ignore')[:300]}")
+            return None
+        data = json.loads(stdout or b'{}')
+    except Exception as e:
+        logger.warning(f"ffprobe failed for {path}: {e}")
+        return None
+    finally:
+        # Таймаут или отмена вызывающего — ffprobe не должен остаться висеть
+        if proc is not None and proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+    return _remember(key, _parse(path, key[3], data))
+
+
+def probe_sync(path: str) -> Optional[MediaInfo]:
+    """То же для синхронного кода (потоки, задачи очереди, CLI)."""
+    key = _cache_key(path)
+    if key is None:
+        return None
+    info = _cached(key)
+    if info is not None:
+        return info
+    try:
+        result = subprocess.run([*_FFPROBE_CMD, path], capture_output=True, text=True, timeout=30)
+    except Exception as e:
+        logger.warning(f"ffprobe failed for {path}: {e}")
+        return None
+    if result.returncode != 0:
+        logger.warning(f"ffprobe error for {path}: {result.stderr[:300]}")
+        return None
+    try:
+        data = json.loads(result.stdout or '{}')
+    except ValueError as e:
+        logger.warning(f"ffprobe output for {path} is not JSON: {e}")
+        return None
+    return _remember(key, _parse(path, key[3], data))
+
+
+async def get_dimensions(path: str) -> Tuple[int, int]:
+    info = await probe(path)
+    return info.dimensions if info else DEFAULT_DIMENSIONS
+
+
+def get_dimensions_sync(path: str) -> Tuple[int, int]:
+    info = probe_sync(path)
+    return info.dimensions if info else DEFAULT_DIMENSIONS
@@ -5,6 +5,8 @@ import pyheif # for heic files
 import exifread # for heic files
 import io
 
+import media_probe
+
 from PIL import Image
 from PIL.ExifTags import TAGS
 from PIL import Image, ExifTags
@@ -95,7 +97,7 @@ def image_metadata_jpg(path_f: str):
 
 def vid_aud_matadata(path_f: str):
     try:
-        return ffmpeg.probe(path_f)["streams"]
+        return media_probe.probe_sync(path_f).streams
     except:
         return None
 
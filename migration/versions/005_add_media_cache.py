@@ -0,0 +1,42 @@
+"""Add media_cache table (Telegram file_id cache)
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Кеш file_id: одна запись на (нормализованная ссылка, вариант)
+    op.create_table(
+        'media_cache',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('source_key', sa.Text(), nullable=False),
+        sa.Column('variant', sa.String(length=100), nullable=False),
+        sa.Column('media_type', sa.String(length=20), nullable=False),
+        sa.Column('file_id', sa.String(length=255), nullable=False),
+        sa.Column('file_unique_id', sa.String(length=255), nullable=True),
+        sa.Column('hits', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.func.now(), nullable=False),
+        sa.Column('last_used_at', sa.TIMESTAMP(), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_media_cache_key', 'media_cache', ['cache_key'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_media_cache_key', table_name='media_cache')
+    op.drop_table('media_cache')
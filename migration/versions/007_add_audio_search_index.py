@@ -0,0 +1,62 @@
+"""Add trigram search key to user_audio
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Ключ поиска: "название исполнитель" в нижнем регистре, кириллица транслитерирована в латиницу —
+# «Кино» и «kino» дают один ключ. Верхний регистр кириллицы переводится явно: lower() не трогает
+# кириллицу в базах с LC_CTYPE=C. Тот же ключ строится из запроса (db.audio_commands.get_user_audio_list).
+SEARCH_KEY_FUNCTION = """
+CREATE OR REPLACE FUNCTION audio_search_key(title text, artist text) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT translate(
+        replace(replace(replace(replace(replace(replace(replace(
+            lower(translate(
+                coalesce(title, '') || ' ' || coalesce(artist, ''),
+                'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',
+                'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+            )),
+            'щ', 'shch'), 'ш', 'sh'), 'ч', 'ch'), 'ж', 'zh'), 'ц', 'ts'), 'ю', 'yu'), 'я', 'ya'),
+        'абвгдеёзийклмнопрстуфхыэъь',
+        'abvgdeeziiklmnoprstufhye'
+    )
+$$
+"""
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(SEARCH_KEY_FUNCTION)
+    # Хранимая генерируемая колонка (PostgreSQL 12+): заполняется для существующих строк при добавлении
+    op.add_column(
+        'user_audio',
+        sa.Column('search_key', sa.Text(), sa.Computed('audio_search_key(title, artist)', persisted=True))
+    )
+    op.create_index(
+        'ix_user_audio_search_key_trgm',
+        'user_audio',
+        ['search_key'],
+        postgresql_using='gin',
+        postgresql_ops={'search_key': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_audio_search_key_trgm', table_name='user_audio')
+    op.drop_column('user_audio', 'search_key')
+    op.execute("DROP FUNCTION IF EXISTS audio_search_key(text, text)")
@@ -65,6 +65,16 @@ export const api = {
     return fetchApi(`/audio/${audioId}/stream-url`)
   },
   
+  /**
+   * URL для стриминга нескольких треков сразу (предзагрузка очереди)
+   */
+  async getStreamUrls(audioIds) {
+    return fetchApi('/audio/stream-urls', {
+      method: 'POST',
+      body: JSON.stringify({ audio_ids: audioIds })
+    })
+  },
+  
   /**
    * Обновить URL для стриминга
    */
@@ -189,13 +199,97 @@ export const api = {
   },
 
   /**
-   * Скачать с YouTube на сервере, отправить аудио в чат через Bot API, сохранить в библиотеку.
+   * Комбинированный поиск по частям (NDJSON): onPart вызывается сначала с { library },
+   * затем с { youtube, youtube_timed_out } — библиотеку можно показать, не дожидаясь YouTube.
+   */
+  async searchCombinedStream(q, onPart) {
+    const query = new URLSearchParams({ q }).toString()
+    const response = await fetch(`${API_BASE}/search/stream?${query}`, { headers: getHeaders() })
+
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({ detail: 'Unknown error' }))
+      throw new Error(error.detail || `HTTP ${response.status}`)
+    }
+
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    while (true) {
+      const { done, value } = await reader.read()
+      buffer += decoder.decode(value || new Uint8Array(), { stream: !done })
+      let newline
+      while ((newline = buffer.indexOf('\n')) >= 0) {
+        const line = buffer.slice(0, newline).trim()
+        buffer = buffer.slice(newline + 1)
+        if (line) onPart(JSON.parse(line))
+      }
+      if (done) break
+    }
+    if (buffer.trim()) onPart(JSON.parse(buffer))
+  },
+
+  /**
+   * Поставить импорт с YouTube: сервер в фоне скачает аудио, отправит его в чат через Bot API
+   * и сохранит в библиотеку. Возвращает задачу { job_id, status, audio, error }.
    */
   async importYoutubeVideo(videoId) {
     return fetchApi('/youtube/import', {
       method: 'POST',
       body: JSON.stringify({ video_id: videoId })
     })
+  },
+
+  /**
+   * Статус задачи импорта
+   */
+  async getImportJob(jobId) {
+    return fetchApi(`/youtube/import/${jobId}`)
+  },
+
+  /**
+   * Дождаться конца импорта: события SSE (через fetch — EventSource не умеет заголовок авторизации),
+   * при обрыве потока — опрос статуса. onStatus получает каждое обновление задачи.
+   * Возвращает трек (AudioResponse) или бросает ошибку с текстом от сервера.
+   */
+  async waitForImport(job, onStatus = () => {}) {
+    const finish = (j) => {
+      if (j.status === 'done' && j.audio) return j.audio
+      throw new Error(j.error || 'Не удалось добавить трек')
+    }
+    if (job.status === 'done' || job.status === 'failed') return finish(job)
+
+    try {
+      const response = await fetch(`${API_BASE}/youtube/import/${job.job_id}/events`, { headers: getHeaders() })
+      if (response.ok && response.body) {
+        const reader = response.body.getReader()
+        const decoder = new TextDecoder()
+        let buffer = ''
+        while (true) {
+          const { done, value } = await reader.read()
+          if (done) break
+          buffer += decoder.decode(value, { stream: true })
+          let boundary
+          while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+            const event = buffer.slice(0, boundary)
+            buffer = buffer.slice(boundary + 2)
+            const data = event.split('\n').find(line => line.startsWith('data: '))
+            if (!data) continue
+            job = JSON.parse(data.slice(6))
+            onStatus(job)
+            if (job.status === 'done' || job.status === 'failed') return finish(job)
+          }
+        }
+      }
+    } catch (error) {
+      console.warn('Import events stream failed, polling:', error)
+    }
+
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 2000))
+      job = await this.getImportJob(job.job_id)
+      onStatus(job)
+      if (job.status === 'done' || job.status === 'failed') return finish(job)
+    }
   }
 }
 
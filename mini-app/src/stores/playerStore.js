@@ -19,6 +19,9 @@ export const usePlayerStore = defineStore('player', () => {
   // Stream URL (временный, обновляется каждый час)
   const streamUrl = ref(null)
   const streamUrlExpiresAt = ref(null)
+  // URL следующих треков очереди, полученные заранее: id → { url, expiresAt }
+  const prefetchedUrls = new Map()
+  const PREFETCH_AHEAD = 50
   
   // Audio element
   let audio = null
@@ -240,6 +243,14 @@ export const usePlayerStore = defineStore('player', () => {
       return streamUrl.value
     }
 
+    const prefetched = prefetchedUrls.get(audioId)
+    prefetchedUrls.delete(audioId)
+    if (prefetched && Date.now() < prefetched.expiresAt) {
+      streamUrl.value = prefetched.url
+      streamUrlExpiresAt.value = prefetched.expiresAt
+      return prefetched.url
+    }
+
     try {
       const data = await api.getStreamUrl(audioId)
       streamUrl.value = data.url
@@ -252,6 +263,26 @@ export const usePlayerStore = defineStore('player', () => {
     }
   }
 
+  // Получить URL следующих треков очереди одним запросом (в фоне, ошибки не мешают воспроизведению)
+  async function prefetchQueueUrls() {
+    const now = Date.now()
+    const ids = queue.value
+      .slice(queueIndex.value + 1, queueIndex.value + 1 + PREFETCH_AHEAD)
+      .map(t => t.id)
+      .filter(id => !(prefetchedUrls.get(id)?.expiresAt > now))
+    if (ids.length === 0) return
+
+    try {
+      const data = await api.getStreamUrls(ids)
+      for (const item of data.items) {
+        // Запас в 5 минут, как и для текущего трека
+        prefetchedUrls.set(item.audio_id, { url: item.url, expiresAt: now + (item.expires_in * 1000) - 300000 })
+      }
+    } catch (error) {
+      console.warn('Failed to prefetch stream URLs:', error)
+    }
+  }
+
   // Refresh stream URL
   async function refreshStreamUrl() {
     if (!currentTrack.value) return
@@ -262,6 +293,7 @@ export const usePlayerStore = defineStore('player', () => {
       // Сбрасываем кэш чтобы принудительно получить новый URL
       streamUrl.value = null
       streamUrlExpiresAt.value = null
+      prefetchedUrls.delete(currentTrack.value.id)
       
       const url = await getStreamUrl(currentTrack.value.id)
       const wasPlaying = isPlaying.value
@@ -307,6 +339,7 @@ export const usePlayerStore = defineStore('player', () => {
     try {
       const url = await getStreamUrl(track.id)
       audio.src = url
+      prefetchQueueUrls()
       await audio.play()
     } catch (error) {
       console.error('Failed to play track:', error)
@@ -386,6 +419,7 @@ export const usePlayerStore = defineStore('player', () => {
     try {
       const url = await getStreamUrl(track.id)
       audio.src = url
+      prefetchQueueUrls()
       await audio.play()
     } catch (error) {
       console.error('Failed to play track:', error)
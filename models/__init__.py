@@ -4,6 +4,8 @@ from .audio import UserAudio
 from .playlist import Playlist, PlaylistTrack
 from .favorite import Favorite
 from .download_log import DownloadLog
+from .media_cache import MediaCache
+from .download_job import DownloadJob
 
 __all__ = [
     'Base',
@@ -13,4 +15,6 @@ __all__ = [
     'PlaylistTrack',
     'Favorite',
     'DownloadLog',
+    'MediaCache',
+    'DownloadJob',
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, BigInteger, TIMESTAMP, ForeignKey, Text, Index
+from sqlalchemy import Column, Computed, Integer, String, BigInteger, TIMESTAMP, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .base import Base
@@ -9,6 +9,10 @@ class UserAudio(Base):
     __tablename__ = 'user_audio'
     __table_args__ = (
         Index('ix_user_audio_file_id', 'file_id'),
+        Index(
+            'ix_user_audio_search_key_trgm', 'search_key',
+            postgresql_using='gin', postgresql_ops={'search_key': 'gin_trgm_ops'},
+        ),
     )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -31,6 +35,9 @@ class UserAudio(Base):
     source = Column(String(50), nullable=True)  # 'youtube', 'soundcloud', etc.
     source_url = Column(Text, nullable=True)  # Оригинальная ссылка
     
+    # Ключ поиска (название + исполнитель, транслит, нижний регистр) — считает PostgreSQL, см. миграцию 007
+    search_key = Column(Text, Computed("audio_search_key(title, artist)", persisted=True))
+    
     # Timestamps
     created_at = Column(TIMESTAMP, server_default=func.now())
     
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, Index
+from sqlalchemy.sql import func
+from .base import Base
+
+
+class DownloadJob(Base):
+    """Задача скачивания для очереди JOB_QUEUE_BACKEND=postgres (забирается consumer'ом через SKIP LOCKED)"""
+    __tablename__ = 'download_jobs'
+    __table_args__ = (
+        Index('ix_download_jobs_status_created', 'status', 'created_at'),
+    )
+
+    id = Column(String(32), primary_key=True)  # uuid4().hex
+    task = Column(String(50), nullable=False)  # youtube_video, youtube_audio, instagram_reels, tiktok, pinterest
+    payload = Column(Text, nullable=False)  # JSON аргументов
+    status = Column(String(20), nullable=False, default='queued')  # queued, running, done, failed
+    result = Column(Text, nullable=True)  # JSON результата
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker = Column(String(100), nullable=True)  # host:pid consumer'а
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    started_at = Column(TIMESTAMP, nullable=True)
+    finished_at = Column(TIMESTAMP, nullable=True)
+
+    def __repr__(self):
+        return f"<DownloadJob(id='{self.id}', task='{self.task}', status='{self.status}')>"
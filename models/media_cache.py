@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, BigInteger, Text, TIMESTAMP, Index
+from sqlalchemy.sql import func
+from .base import Base
+
+
+class MediaCache(Base):
+    """Telegram file_id уже отправленных файлов: повторная ссылка → пересылка без скачивания"""
+    __tablename__ = 'media_cache'
+    __table_args__ = (
+        Index('ix_media_cache_key', 'cache_key', unique=True),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    cache_key = Column(String(64), nullable=False)  # sha256(normalized_url|variant)
+    source_key = Column(Text, nullable=False)  # Нормализованная ссылка (url_utils.normalize_source_url)
+    variant = Column(String(100), nullable=False)  # video|fmt=best|wm=0 и т.п.
+    media_type = Column(String(20), nullable=False)  # video, audio, document
+    file_id = Column(String(255), nullable=False)
+    file_unique_id = Column(String(255), nullable=True)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    last_used_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<MediaCache(source_key='{self.source_key}', variant='{self.variant}')>"
@@ -1,137 +1,135 @@
 import os
 import re
 import json
-import requests
+import asyncio
 from datetime import datetime
+from typing import Optional
 import logging
+
+import aiofiles
+import aiohttp
 import yt_dlp
 from bs4 import BeautifulSoup
 
+from cache_utils import LoopSession
+
 logger = logging.getLogger(__name__)
 
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
 
-def download_via_scraping(url, path, filename):
-    """Fallback метод - скачивание через парсинг страницы"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-    }
+# Общая HTTP-сессия (пул соединений) для fallback-парсинга; привязана к event loop'у
+_session = LoopSession(lambda: aiohttp.ClientSession(headers=HEADERS))
+
+
+async def close_session() -> None:
+    """Закрыть общую HTTP-сессию (при остановке бота или в конце своего event loop'а)."""
+    await _session.close()
+
+
+def _find_video_url(html: bytes) -> Optional[str]:
+    """Ищет ссылку на mp4 в HTML страницы пина"""
+    soup = BeautifulSoup(html, 'html.parser')
     
-    try:
-        # Разрешаем редиректы для коротких ссылок
-        response = requests.get(url, headers=headers, allow_redirects=True, timeout=15)
-        if response.status_code != 200:
-            logger.error(f"Failed to fetch page: {response.status_code}")
-            return None
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        video_url = None
-        
-        # Способ 1: ищем video тег
-        video_tag = soup.find('video')
-        if video_tag:
-            video_url = video_tag.get('src')
-            if not video_url:
-                source = video_tag.find('source')
-                if source:
-                    video_url = source.get('src')
-        
-        # Способ 2: ищем в JSON данных на странице
-        if not video_url:
-            scripts = soup.find_all('script', type='application/json')
-            for script in scripts:
-                try:
-                    if script.string:
-                        data = json.loads(script.string)
-                        # Ищем video URL в JSON
-                        json_str = json.dumps(data)
-                        # Ищем паттерны video URL
-                        patterns = [
-                            r'"V_720P":"([^"]+)"',
-                            r'"V_EXP7":"([^"]+)"',
-                            r'"video_url":"([^"]+)"',
-                            r'"contentUrl":"([^"]+\.mp4[^"]*)"',
-                        ]
-                        for pattern in patterns:
-                            match = re.search(pattern, json_str)
-                            if match:
-                                video_url = match.group(1).replace('\\u002F', '/')
-                                break
-                        if video_url:
-                            break
-                except (json.JSONDecodeError, TypeError):
-                    continue
-        
-        # Способ 3: ищем в inline scripts
+    video_url = None
+    
+    # Способ 1: ищем video тег
+    video_tag = soup.find('video')
+    if video_tag:
+        video_url = video_tag.get('src')
         if not video_url:
-            for script in soup.find_all('script'):
+            source = video_tag.find('source')
+            if source:
+                video_url = source.get('src')
+    
+    # Способ 2: ищем в JSON данных на странице
+    if not video_url:
+        scripts = soup.find_all('script', type='application/json')
+        for script in scripts:
+            try:
                 if script.string:
+                    data = json.loads(script.string)
+                    # Ищем video URL в JSON
+                    json_str = json.dumps(data)
+                    # Ищем паттерны video URL
                     patterns = [
-                        r'"V_720P"\s*:\s*"([^"]+)"',
-                        r'"V_EXP7"\s*:\s*"([^"]+)"',
-                        r'(https://v1\.pinimg\.com/videos/[^"]+\.mp4)',
+                        r'"V_720P":"([^"]+)"',
+                        r'"V_EXP7":"([^"]+)"',
+                        r'"video_url":"([^"]+)"',
+                        r'"contentUrl":"([^"]+\.mp4[^"]*)"',
                     ]
                     for pattern in patterns:
-                        match = re.search(pattern, script.string)
+                        match = re.search(pattern, json_str)
                         if match:
                             video_url = match.group(1).replace('\\u002F', '/')
                             break
                     if video_url:
                         break
+            except (json.JSONDecodeError, TypeError):
+                continue
+    
+    # Способ 3: ищем в inline scripts
+    if not video_url:
+        for script in soup.find_all('script'):
+            if script.string:
+                patterns = [
+                    r'"V_720P"\s*:\s*"([^"]+)"',
+                    r'"V_EXP7"\s*:\s*"([^"]+)"',
+                    r'(https://v1\.pinimg\.com/videos/[^"]+\.mp4)',
+                ]
+                for pattern in patterns:
+                    match = re.search(pattern, script.string)
+                    if match:
+                        video_url = match.group(1).replace('\\u002F', '/')
+                        break
+                if video_url:
+                    break
+    
+    return video_url
+
+
+async def download_via_scraping(url, path, filename):
+    """Fallback метод - скачивание через парсинг страницы (aiohttp, файл пишется потоково)"""
+    output_path = f"{path}/{filename}.mp4"
+    try:
+        session = await _session.get()
+        # Разрешаем редиректы для коротких ссылок
+        async with session.get(url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=15)) as response:
+            if response.status != 200:
+                logger.error(f"Failed to fetch page: {response.status}")
+                return None
+            html = await response.read()
         
+        video_url = await asyncio.to_thread(_find_video_url, html)
         if not video_url:
             logger.error("Could not find video URL in page")
             return None
         
         # Скачиваем видео
         logger.info(f"Downloading video from: {video_url[:60]}...")
-        video_response = requests.get(video_url, headers=headers, stream=True, timeout=60)
-        
-        if video_response.status_code == 200:
-            output_path = f"{path}/{filename}.mp4"
-            with open(output_path, 'wb') as f:
-                for chunk in video_response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            if os.path.isfile(output_path) and os.path.getsize(output_path) > 0:
-                logger.info(f"Successfully downloaded via scraping: {filename}")
-                return filename
-            else:
-                logger.error("Downloaded file is empty")
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=60)
+        async with session.get(video_url, timeout=timeout) as video_response:
+            if video_response.status != 200:
+                logger.error(f"Failed to download video: {video_response.status}")
                 return None
-        else:
-            logger.error(f"Failed to download video: {video_response.status_code}")
-            return None
-            
+            async with aiofiles.open(output_path, 'wb') as f:
+                async for chunk in video_response.content.iter_chunked(64 * 1024):
+                    await f.write(chunk)
+        
+        if os.path.isfile(output_path) and os.path.getsize(output_path) > 0:
+            logger.info(f"Successfully downloaded via scraping: {filename}")
+            return filename
+        logger.error("Downloaded file is empty")
     except Exception as e:
         logger.error(f"Scraping fallback error: {e}")
-        return None
+    if os.path.isfile(output_path):
+        os.remove(output_path)
+    return None
 
 
-def download_pin(url, path='./videos/pinterest', filename=None, out_format='mp4'):
-    """
-    Скачивает видео с Pinterest.
-    Сначала пробует yt-dlp, потом fallback на прямой парсинг.
-    """
-    os.makedirs(path, exist_ok=True)
-    
-    # Проверка URL
-    if "pinterest" not in url and "pin.it" not in url:
-        logger.error(f"Invalid Pinterest URL: {url}")
-        return None
-    
-    # Генерируем уникальное имя файла
-    if not filename:
-        filename = datetime.now().strftime("pin_%Y%m%d_%H%M%S")
-    
-    # Убедимся, что имя файла уникальное
-    base_filename = filename
-    ind = 1
-    while os.path.isfile(f"{path}/{filename}.{out_format}"):
-        filename = f"{base_filename}_{ind}"
-        ind += 1
-    
-    # Способ 1: yt-dlp
+def _download_via_ytdlp(url, path, filename):
+    """Способ 1: yt-dlp (синхронно, вызывается в потоке через asyncio.to_thread)"""
     ydl_opts = {
         'format': 'bestvideo*+bestaudio/best/bestvideo/bestaudio',
         'outtmpl': f'{path}/{filename}.%(ext)s',
@@ -139,9 +137,7 @@ def download_pin(url, path='./videos/pinterest', filename=None, out_format='mp4'
         'quiet': True,
         'no_warnings': True,
         'merge_output_format': 'mp4',
-        'http_headers': {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        },
+        'http_headers': HEADERS,
         'socket_timeout': 30,
         'retries': 3,
         'postprocessors': [{
@@ -172,13 +168,58 @@ def download_pin(url, path='./videos/pinterest', filename=None, out_format='mp4'
         logger.warning(f"yt-dlp failed, trying scraping fallback: {e}")
     except Exception as e:
         logger.warning(f"yt-dlp error, trying scraping fallback: {e}")
+    return None
+
+
+async def download_pin_async(url, path='./videos/pinterest', filename=None, out_format='mp4'):
+    """
+    Скачивает видео с Pinterest, не блокируя event loop.
+    Сначала пробует yt-dlp (в потоке), потом fallback на прямой парсинг.
+    Сколько пинов качается одновременно, ограничивает очередь (jobs._TASK_LIMITS, PINTEREST_MAX_CONCURRENCY).
+    Возвращает имя файла без расширения или None.
+    """
+    os.makedirs(path, exist_ok=True)
+    
+    # Проверка URL
+    if "pinterest" not in url and "pin.it" not in url:
+        logger.error(f"Invalid Pinterest URL: {url}")
+        return None
+    
+    # Генерируем уникальное имя файла
+    if not filename:
+        filename = datetime.now().strftime("pin_%Y%m%d_%H%M%S_%f")
+    
+    # Убедимся, что имя файла уникальное
+    base_filename = filename
+    ind = 1
+    while os.path.isfile(f"{path}/{filename}.{out_format}"):
+        filename = f"{base_filename}_{ind}"
+        ind += 1
+    
+    result = await asyncio.to_thread(_download_via_ytdlp, url, path, filename)
+    if result:
+        return result
     
     # Способ 2: Fallback на прямой парсинг
     logger.info("Trying scraping fallback for Pinterest...")
-    result = download_via_scraping(url, path, filename)
+    result = await download_via_scraping(url, path, filename)
     
     if result:
         return result
     
     logger.error("All download methods failed for Pinterest")
     return None
+
+
+def download_pin(url, path='./videos/pinterest', filename=None, out_format='mp4'):
+    """
+    Синхронная обёртка над download_pin_async (задачи очереди, CLI).
+    Нельзя вызывать из работающего event loop — там нужен download_pin_async.
+    """
+    async def run():
+        try:
+            return await download_pin_async(url, path, filename, out_format)
+        finally:
+            await close_session()
+
+    return asyncio.run(run())
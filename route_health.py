@@ -0,0 +1,254 @@
+"""
+Здоровье маршрутов скачивания: прокси (PROXY / SIMPLE_PROXY, 'direct') и cookie-слоты Instagram.
+
+По каждому маршруту хранится доля успехов, EWMA задержки удачных попыток, последние задержки
+(для p50/p95) и класс последней ошибки. Маршрут, упавший HEALTH_FAIL_THRESHOLD раз подряд,
+выключается (circuit open) на HEALTH_OPEN_SECONDS; потом отдаётся в одну пробную попытку (half-open).
+Ошибки контента (приватное, удалённое, недоступное видео) маршрут не штрафуют — он тут ни при чём.
+Состояние — в SQLite (HEALTH_DB_PATH): переживает рестарт и общее для процессов очереди на хосте.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from data import config
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+KIND_PROXY = "proxy"  # прокси для YouTube
+KIND_INSTAGRAM_PROXY = "instagram_proxy"  # те же прокси, но для Instagram: его блокировки — не YouTube
+KIND_INSTAGRAM_COOKIE = "instagram_cookie"
+KIND_DELIVERY = "delivery"  # маршруты отправки файла пользователю (delivery.py)
+
+_EWMA_ALPHA = 0.3
+_LATENCY_WINDOW = 50
+
+# Признаки ошибок самого контента (текст ошибки yt-dlp в нижнем регистре)
+_CONTENT_ERRORS = (
+    "private video",
+    "video is private",
+    "this video is unavailable",
+    "video unavailable",
+    "has been removed",
+    "was deleted",
+    "does not exist",
+    "no longer available",
+    "copyright",
+    "members-only",
+    "premieres in",
+    "live event will begin",
+    "http error 404",
+)
+
+_initialized = False
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+    if not _initialized:
+        os.makedirs(os.path.dirname(os.path.abspath(config.HEALTH_DB_PATH)), exist_ok=True)
+    conn = sqlite3.connect(config.HEALTH_DB_PATH, timeout=10, isolation_level=None)
+    if not _initialized:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS route_health (
+                kind TEXT NOT NULL,
+                route TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                successes INTEGER NOT NULL DEFAULT 0,
+                consecutive_failures INTEGER NOT NULL DEFAULT 0,
+                ewma_latency REAL,
+                latencies TEXT NOT NULL DEFAULT '[]',
+                last_error TEXT,
+                last_error_at REAL,
+                open_until REAL NOT NULL DEFAULT 0,
+                updated_at REAL,
+                PRIMARY KEY (kind, route)
+            )
+            """
+        )
+        _initialized = True
+    return conn
+
+
+def mask_route(route: str) -> str:
+    """user:password@host → ***@host (для логов и /health)."""
+    return re.sub(r"//[^/@]+@", "//***@", route or "")
+
+
+def is_content_error(error: Optional[BaseException]) -> bool:
+    """Ошибка про сам контент (приватный, удалён, недоступен), а не про маршрут."""
+    if error is None:
+        return False
+    text = str(error).lower()
+    return any(marker in text for marker in _CONTENT_ERRORS)
+
+
+def begin(kind: str, route: Optional[str]) -> float:
+    """
+    Отметить начало попытки через маршрут; возвращает time.monotonic() для record().
+    Если маршрут ждал пробной попытки (half-open), проба занимается здесь: следующая — не раньше
+    чем через HEALTH_OPEN_SECONDS (или сразу после удачи).
+    """
+    started = time.monotonic()
+    if not route:
+        return started
+    now = time.time()
+    try:
+        with closing(_connect()) as conn:
+            conn.execute(
+                "UPDATE route_health SET open_until = ? "
+                "WHERE kind = ? AND route = ? AND consecutive_failures >= ? AND open_until <= ?",
+                (now + config.HEALTH_OPEN_SECONDS, kind, route, config.HEALTH_FAIL_THRESHOLD, now),
+            )
+    except Exception as e:
+        logger.warning(f"route_health: begin failed: {e}")
+    return started
+
+
+def record(kind: str, route: Optional[str], ok: bool, latency: float, error: Optional[BaseException] = None) -> None:
+    """
+    Записать исход попытки. Ошибки контента не учитываются (is_content_error).
+    Ошибки хранилища только логируются — скачивание важнее статистики.
+    """
+    if not route or (not ok and is_content_error(error)):
+        return
+    now = time.time()
+    try:
+        with closing(_connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT attempts, successes, consecutive_failures, ewma_latency, latencies, open_until "
+                "FROM route_health WHERE kind = ? AND route = ?",
+                (kind, route),
+            ).fetchone()
+            attempts, successes, fails, ewma, latencies, open_until = row or (0, 0, 0, None, "[]", 0)
+            latencies = json.loads(latencies)
+            attempts += 1
+            last_error = None
+            if ok:
+                successes += 1
+                fails = 0
+                open_until = 0
+                ewma = latency if ewma is None else _EWMA_ALPHA * latency + (1 - _EWMA_ALPHA) * ewma
+                latencies = (latencies + [round(latency, 2)])[-_LATENCY_WINDOW:]
+            else:
+                fails += 1
+                last_error = f"{type(error).__name__}: {error}"[:300] if error else "failed"
+                if fails >= config.HEALTH_FAIL_THRESHOLD:
+                    open_until = now + config.HEALTH_OPEN_SECONDS
+            conn.execute(
+                """
+                INSERT INTO route_health (kind, route, attempts, successes, consecutive_failures, ewma_latency,
+                                          latencies, last_error, last_error_at, open_until, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (kind, route) DO UPDATE SET
+                    attempts = excluded.attempts,
+                    successes = excluded.successes,
+                    consecutive_failures = excluded.consecutive_failures,
+                    ewma_latency = excluded.ewma_latency,
+                    latencies = excluded.latencies,
+                    last_error = COALESCE(excluded.last_error, route_health.last_error),
+                    last_error_at = COALESCE(excluded.last_error_at, route_health.last_error_at),
+                    open_until = excluded.open_until,
+                    updated_at = excluded.updated_at
+                """,
+                (kind, route, attempts, successes, fails, ewma, json.dumps(latencies),
+                 last_error, now if last_error else None, open_until, now),
+            )
+            conn.execute("COMMIT")
+        if not ok and fails == config.HEALTH_FAIL_THRESHOLD:
+            logger.warning(f"route_health: {kind} {mask_route(route)} disabled for {config.HEALTH_OPEN_SECONDS}s")
+    except Exception as e:
+        logger.warning(f"route_health: record failed: {e}")
+
+
+def order(kind: str, items: Sequence[T], route_of: Callable[[T], Optional[str]]) -> List[T]:
+    """
+    Упорядочить кандидатов: сначала рабочие по EWMA задержки (без истории — первыми, чтобы их попробовать),
+    затем маршруты, которым пора на пробную попытку. Выключенные отбрасываются;
+    если выключены все — возвращаются все (лучше попробовать, чем сразу отказать).
+    Порядок равных сохраняется — вызывающий может предварительно перемешать список.
+    Только читает состояние: пробу занимает begin() в момент самой попытки.
+    """
+    items = list(items)
+    if not items:
+        return items
+    try:
+        with closing(_connect()) as conn:
+            rows = {
+                r[0]: r[1:]
+                for r in conn.execute(
+                    "SELECT route, consecutive_failures, ewma_latency, open_until FROM route_health WHERE kind = ?",
+                    (kind,),
+                )
+            }
+            now = time.time()
+            healthy, probes, disabled = [], [], []
+            for item in items:
+                route = route_of(item)
+                fails, ewma, open_until = rows.get(route, (0, None, 0))
+                if fails < config.HEALTH_FAIL_THRESHOLD:
+                    healthy.append((ewma or 0.0, item))
+                elif now >= open_until:
+                    probes.append(item)
+                else:
+                    disabled.append((open_until, item))
+    except Exception as e:
+        logger.warning(f"route_health: order failed: {e}")
+        return items
+    healthy.sort(key=lambda x: x[0])
+    result = [item for _, item in healthy] + probes
+    if not result:
+        disabled.sort(key=lambda x: x[0])
+        result = [item for _, item in disabled]
+    return result
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def snapshot() -> List[Dict[str, Any]]:
+    """Состояние всех маршрутов для /health."""
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            "SELECT kind, route, attempts, successes, consecutive_failures, ewma_latency, latencies, "
+            "last_error, last_error_at, open_until FROM route_health ORDER BY kind, route"
+        ).fetchall()
+    now = time.time()
+    out = []
+    for kind, route, attempts, successes, fails, ewma, latencies, last_error, last_error_at, open_until in rows:
+        latencies = json.loads(latencies or "[]")
+        if fails < config.HEALTH_FAIL_THRESHOLD:
+            state = "ok"
+        elif now < open_until:
+            state = "open"
+        else:
+            state = "half-open"
+        out.append({
+            "kind": kind,
+            "route": mask_route(route),
+            "state": state,
+            "attempts": attempts,
+            "success_rate": successes / attempts if attempts else None,
+            "ewma_latency": ewma,
+            "p50": _percentile(latencies, 0.5),
+            "p95": _percentile(latencies, 0.95),
+            "last_error": last_error.split(":", 1)[0] if last_error else None,
+            "last_error_at": last_error_at,
+        })
+    return out
@@ -1,7 +1,10 @@
 import argparse
+import asyncio
 import os
 import requests
 
+import bot_api
+
 from data.config import BOT_TOKEN
 from bot_commands import send_video_through_api
 from worker import get_video_resolution_moviepy
@@ -24,6 +27,13 @@ def send_message_to_chat(message, chat_id):
         print(f"Failed to send message. Error: {response.text}")
 
 
+async def _send_video(chat_id, video_path, width, height):
+    try:
+        return await send_video_through_api(chat_id, video_path, width, height)
+    finally:
+        await bot_api.close_session()
+
+
 def main():
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -69,7 +79,7 @@ def main():
         width, height = get_video_resolution_moviepy(args.video)
         print(f"Video resolution: {width}x{height}")
         
-        send_video_through_api(args.chat_id, args.video, width, height)
+        asyncio.run(_send_video(args.chat_id, args.video, width, height))
 
 
 if __name__ == "__main__":
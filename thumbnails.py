@@ -0,0 +1,140 @@
+"""
+Обложки YouTube для аудио: квадрат THUMB_SIZE x THUMB_SIZE в JPEG.
+
+Размеры maxres / hq / mq запрашиваются одновременно через общий aiohttp-пул, берётся лучший из
+пришедших; обрезка и масштаб — Pillow в потоке, без ffprobe/ffmpeg. Готовые обложки лежат в
+THUMB_CACHE_DIR под именем <video_id>_square.jpg — кеш на диске, общий для бота, очереди и API,
+ограничен THUMB_CACHE_MAX_MB (вытесняются давно не использованные). Файлы кеша не удаляются
+после отправки: для этого discard().
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from io import BytesIO
+from typing import Optional
+
+import aiohttp
+from PIL import Image
+
+from cache_utils import LoopSession, evict_lru
+from data.config import THUMB_CACHE_DIR, THUMB_CACHE_MAX_MB, THUMB_SIZE
+
+logger = logging.getLogger(__name__)
+
+_QUALITIES = ("maxresdefault", "hqdefault", "mqdefault")
+_MIN_BYTES = 1000  # меньше — заглушка YouTube «нет обложки»
+
+_session = LoopSession(lambda: aiohttp.ClientSession(
+    connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=60),
+    timeout=aiohttp.ClientTimeout(total=15),
+))
+
+
+async def close_session() -> None:
+    """Закрыть общую сессию (в конце своего event loop'а, при остановке бота / API)."""
+    await _session.close()
+
+
+def cache_path(video_id: str) -> str:
+    return os.path.join(THUMB_CACHE_DIR, f"{video_id}_square.jpg")
+
+
+def is_cached(path: Optional[str]) -> bool:
+    """Файл лежит в кеше обложек (его нельзя удалять после отправки)."""
+    if not path:
+        return False
+    return os.path.dirname(os.path.abspath(path)) == os.path.abspath(THUMB_CACHE_DIR)
+
+
+def discard(path: Optional[str]) -> None:
+    """Удалить обложку после отправки, если это не файл кеша."""
+    if path and not is_cached(path) and os.path.isfile(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Не удалось удалить thumbnail {path}: {e}")
+
+
+async def _fetch(url: str, proxy: Optional[str]) -> Optional[bytes]:
+    try:
+        session = await _session.get()
+        async with session.get(url, proxy=proxy) as resp:
+            if resp.status != 200:
+                return None
+            data = await resp.read()
+            return data if len(data) > _MIN_BYTES else None
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        logger.warning(f"Failed to download thumbnail from {url}: {e}")
+        return None
+
+
+async def _fetch_best(video_id: str, proxy: Optional[str]) -> Optional[bytes]:
+    """Все размеры сразу; результат — первый удачный по порядку качества."""
+    urls = [f"https://img.youtube.com/vi/{video_id}/{q}.jpg" for q in _QUALITIES]
+    results = await asyncio.gather(*(_fetch(url, proxy) for url in urls))
+    return next((data for data in results if data), None)
+
+
+def _square(data: bytes, dest: str) -> None:
+    """Центральный квадрат → THUMB_SIZE, JPEG; запись атомарная (другие процессы читают тот же кеш)."""
+    with Image.open(BytesIO(data)) as img:
+        img = img.convert("RGB")
+        side = min(img.size)
+        left = (img.width - side) // 2
+        top = (img.height - side) // 2
+        img = img.crop((left, top, left + side, top + side)).resize((THUMB_SIZE, THUMB_SIZE), Image.LANCZOS)
+        fd, tmp = tempfile.mkstemp(suffix=".jpg", dir=os.path.dirname(dest))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, "JPEG", quality=90)
+            os.replace(tmp, dest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+
+def _evict() -> None:
+    """Держать кеш в THUMB_CACHE_MAX_MB: удаляются файлы с самым старым mtime (он обновляется при попадании)."""
+    evict_lru(THUMB_CACHE_DIR, THUMB_CACHE_MAX_MB * 1024 * 1024, lambda name: name.endswith("_square.jpg"))
+
+
+async def get_youtube_thumbnail(video_id: str, proxy: Optional[str] = None) -> Optional[str]:
+    """
+    Путь к квадратной обложке видео из кеша (скачивает при промахе).
+
+    Args:
+        proxy: http(s)-прокси для второй попытки, если напрямую YouTube не отдал ни одного размера
+
+    Returns:
+        Путь в THUMB_CACHE_DIR или None
+    """
+    dest = cache_path(video_id)
+    if os.path.isfile(dest):
+        try:
+            os.utime(dest)
+        except OSError:
+            pass
+        return dest
+
+    os.makedirs(THUMB_CACHE_DIR, exist_ok=True)
+    data = await _fetch_best(video_id, None)
+    if data is None and proxy and proxy.startswith(("http://", "https://")):
+        data = await _fetch_best(video_id, proxy)
+        if data:
+            logger.info(f"Downloaded thumbnail via proxy: {video_id}")
+    if data is None:
+        return None
+
+    started = time.monotonic()
+    try:
+        await asyncio.to_thread(_square, data, dest)
+        await asyncio.to_thread(_evict)
+    except Exception as e:
+        logger.error(f"Error processing thumbnail {video_id}: {e}")
+        return None
+    logger.info(f"Thumbnail {video_id} cached in {time.monotonic() - started:.2f}s")
+    return dest
@@ -0,0 +1,94 @@
+"""Нормализация ссылок на медиа: один и тот же ролик → один и тот же ключ."""
+
+import re
+from typing import Optional
+from urllib.parse import urlencode, urlsplit, parse_qs, parse_qsl
+
+
+_YOUTUBE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+# Параметры, которые не меняют содержимое (метки шаринга и аналитики) — в ключ не попадают
+_TRACKING_PARAMS = {"si", "feature", "igshid", "igsh", "fbclid", "gclid", "is_from_webapp", "sender_device"}
+
+
+def _youtube_id(host: str, path: str, query: str) -> Optional[str]:
+    if host == "youtu.be":
+        vid = path.strip("/").split("/")[0]
+        return vid if _YOUTUBE_ID_RE.match(vid) else None
+    if not host.endswith("youtube.com"):
+        return None
+    vid = (parse_qs(query).get("v") or [""])[0]
+    if _YOUTUBE_ID_RE.match(vid):
+        return vid
+    m = re.match(r"^/(?:shorts|embed|v|live)/([A-Za-z0-9_-]{11})", path)
+    return m.group(1) if m else None
+
+
+def normalize_source_url(url: str) -> str:
+    """
+    Канонический ключ ссылки для кешей и дедупликации:
+    youtube.com/watch?v=X, youtu.be/X и /shorts/X → 'youtube:X',
+    reel/p/CODE → 'instagram:CODE', /video/ID → 'tiktok:ID', /pin/ID → 'pinterest:ID'.
+    Короткие ссылки (vm.tiktok.com, pin.it) без сетевого запроса не раскрыть — ключ по коду.
+    Остальное — host+path и отсортированный query без меток шаринга (utm_*, si, ...), без fragment:
+    ссылки, которые различаются параметрами (плейлист, id в query), дают разные ключи.
+
+    >>> normalize_source_url("https://youtu.be/dQw4w9WgXcQ?si=abc")
+    'youtube:dQw4w9WgXcQ'
+    >>> normalize_source_url("https://www.youtube.com/playlist?list=PL1")
+    'youtube.com/playlist?list=PL1'
+    >>> normalize_source_url("youtube.com/playlist?list=PL2&utm_source=x")
+    'youtube.com/playlist?list=PL2'
+    >>> normalize_source_url("https://example.com/v?b=2&a=1#t") == normalize_source_url("example.com/v/?a=1&b=2")
+    True
+    """
+    raw = (url or "").strip()
+    if not raw:
+        return ""
+    if "://" not in raw:
+        raw = f"https://{raw}"
+    parts = urlsplit(raw)
+    host = (parts.hostname or "").lower()
+    for prefix in ("www.", "m.", "mobile."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+
+    vid = _youtube_id(host, path, parts.query)
+    if vid:
+        return f"youtube:{vid}"
+
+    if host.endswith("instagram.com") or host == "instagr.am":
+        m = re.match(r"^/(?:[^/]+/)?(?:reel|reels|p|tv)/([^/?#]+)", path)
+        if m:
+            return f"instagram:{m.group(1)}"
+
+    if host.endswith("tiktok.com"):
+        m = re.search(r"/video/(\d+)", path)
+        if m:
+            return f"tiktok:{m.group(1)}"
+        if host in ("vm.tiktok.com", "vt.tiktok.com"):
+            code = path.strip("/").split("/")[0]
+            if code:
+                return f"tiktok:short:{code}"
+
+    if "pinterest." in host:
+        m = re.search(r"/pin/(?:[^/]*--)?(\d+)", path)
+        if m:
+            return f"pinterest:{m.group(1)}"
+    if host == "pin.it":
+        code = path.strip("/").split("/")[0]
+        if code:
+            return f"pinterest:short:{code}"
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in _TRACKING_PARAMS and not k.lower().startswith("utm_")
+    )
+    key = f"{host}{path.rstrip('/') or '/'}"
+    return f"{key}?{urlencode(query)}" if query else key
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -1,25 +1,32 @@
 import asyncio
 import os
 import base64
+import hashlib
 import yt_dlp
 import subprocess
 import fnmatch
 import random
 import re
-import requests
 import json
 import logging
-import urllib
 import shutil
 import tempfile
+import threading
+import time
+import weakref
 from pathlib import Path
 
+import media_probe
+import route_health
+import thumbnails
+import yt_search
+from url_utils import normalize_source_url
+
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 from moviepy import VideoFileClip, AudioFileClip, concatenate_audioclips
-from youtube_search import YoutubeSearch
 from yt_dlp.networking.exceptions import SSLError
-from yt_dlp.utils import DownloadError
+from yt_dlp.utils import DownloadCancelled, DownloadError
 
 from data.config import (
     BGUTIL_DISABLE,
@@ -31,6 +38,16 @@ from data.config import (
     YT_VISITOR_DATA,
     SIMPLE_PROXY,
     YTDLP_REMOTE_COMPONENTS,
+    YT_HEDGE_ENABLED,
+    YT_HEDGE_DELAY,
+    YT_HEDGE_MAX_PARALLEL,
+    YT_HEDGE_PER_PROXY,
+    YT_HEDGE_DEADLINE,
+    YT_INFO_CACHE_DIR,
+    YT_INFO_CACHE_TTL,
+    COMPRESS_PRESET,
+    COMPRESS_TWO_PASS,
+    COMPRESS_AUDIO_KBPS,
 )
 
 
@@ -233,7 +250,7 @@ def get_random_proxy():
     Если массив пуст — используется SIMPLE_PROXY как {url: None} (куки из DEFAULT_YT_COOKIE в get_yt_dlp_conf).
     """
     if PARSED_PROXYS:
-        return random.choice(PARSED_PROXYS)
+        return _all_proxy_candidates()[0]
     if SIMPLE_PROXY and str(SIMPLE_PROXY).strip():
         url = str(SIMPLE_PROXY).strip().rstrip("/")
         if not url.startswith(("http://", "https://", "socks5://", "socks5h://")):
@@ -242,19 +259,145 @@ def get_random_proxy():
     return None
 
 
-def _all_proxy_candidates():
+def _proxy_url(proxy: Optional[Dict]) -> Optional[str]:
+    """URL из записи прокси {url: cookie_path} (None для пустой записи)."""
+    if not proxy:
+        return None
+    keys = [k for k in proxy.keys() if k is not None and str(k).strip()]
+    return str(keys[0]).rstrip("/") if keys else None
+
+
+def _all_proxy_candidates(kind: str = route_health.KIND_PROXY):
     """
-    Прокси для перебора после неудачи без прокси: все из PROXY (в случайном порядке),
+    Прокси для перебора после неудачи без прокси: все из PROXY в порядке здоровья для платформы kind
+    (route_health: быстрые и рабочие первыми, выключенные пропускаются; равные — в случайном порядке),
     либо одна запись из SIMPLE_PROXY, если PROXY пуст.
     """
     if PARSED_PROXYS:
         lst = list(PARSED_PROXYS)
         random.shuffle(lst)
-        return lst
+        return route_health.order(kind, lst, _proxy_url)
     p = get_random_proxy()
     return [p] if p else []
 
 
+def _begin_proxy_attempt(proxy_url: Optional[str]) -> float:
+    """Начало попытки через прокси (или напрямую); возвращает started для _record_proxy_attempt."""
+    return route_health.begin(route_health.KIND_PROXY, proxy_url or "direct")
+
+
+def _record_proxy_attempt(proxy_url: Optional[str], ok: bool, started: float, error=None) -> None:
+    """Исход попытки через прокси (или напрямую — 'direct') для route_health."""
+    route_health.record(route_health.KIND_PROXY, proxy_url or "direct", ok, time.monotonic() - started, error)
+
+
+def _ordered_instagram_cookie_slots() -> List[str]:
+    """Слоты instagram{N}.txt в порядке здоровья (вместо случайного перебора)."""
+    slots = ["0", "1", "2"]
+    random.shuffle(slots)
+    return route_health.order(route_health.KIND_INSTAGRAM_COOKIE, slots, lambda slot: f"instagram{slot}.txt")
+
+
+def _begin_instagram_attempt(cookie: str, proxy: Optional[Dict]) -> float:
+    route_health.begin(route_health.KIND_INSTAGRAM_COOKIE, f"instagram{cookie}.txt")
+    return route_health.begin(route_health.KIND_INSTAGRAM_PROXY, _proxy_url(proxy) or "direct")
+
+
+def _record_instagram_attempt(cookie: str, proxy: Optional[Dict], ok: bool, started: float, error=None) -> None:
+    latency = time.monotonic() - started
+    route_health.record(route_health.KIND_INSTAGRAM_COOKIE, f"instagram{cookie}.txt", ok, latency, error)
+    route_health.record(route_health.KIND_INSTAGRAM_PROXY, _proxy_url(proxy) or "direct", ok, latency, error)
+
+
+# Single-flight: одинаковые загрузки (ссылка, формат, тип), идущие одновременно, выполняются один раз.
+# Ключ → список ожидающих futures; первый получает сам файл, остальные — жёсткие ссылки на него,
+# так что файл (inode) живёт, пока последний получатель не удалит свой путь после доставки.
+_inflight: Dict[Any, List[asyncio.Future]] = {}
+_inflight_tasks = set()
+
+
+def _link_artifact_path(path: Optional[str]) -> Optional[str]:
+    """Жёсткая ссылка на готовый файл рядом с ним: name(1).ext, name(2).ext ... (копия, если ФС не умеет)."""
+    if not path or not os.path.isfile(path):
+        return path
+    base, ext = os.path.splitext(path)
+    ind = 1
+    while True:
+        candidate = f"{base}({ind}){ext}"
+        try:
+            os.link(path, candidate)
+            return candidate
+        except FileExistsError:
+            ind += 1
+        except OSError:
+            shutil.copy2(path, candidate)
+            return candidate
+
+
+def _link_artifact(result):
+    """Отдельный «handle» на результат загрузки: путь или dict путей ({'audio', 'thumbnail'})."""
+    if isinstance(result, str):
+        return _link_artifact_path(result)
+    if isinstance(result, dict):
+        # Обложка из кеша thumbnails общая — её не размножаем и не удаляем
+        return {
+            k: _link_artifact_path(v) if isinstance(v, str) and not thumbnails.is_cached(v) else v
+            for k, v in result.items()
+        }
+    return result
+
+
+def _remove_artifact(result) -> None:
+    paths = [result] if isinstance(result, str) else list(result.values()) if isinstance(result, dict) else []
+    for p in paths:
+        if isinstance(p, str) and os.path.isfile(p) and not thumbnails.is_cached(p):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+
+async def _lead_flight(key, factory) -> None:
+    try:
+        result = await factory()
+    except asyncio.CancelledError:
+        for fut in _inflight.pop(key, []):
+            fut.cancel()
+        raise
+    except Exception as e:
+        for fut in _inflight.pop(key, []):
+            if not fut.done():
+                fut.set_exception(e)
+        return
+    # Ключ снимаем до раздачи: новые запросы после этого момента качают заново
+    waiters = [fut for fut in _inflight.pop(key, []) if not fut.done()]
+    if not waiters:
+        # Все ожидающие отвалились по таймауту — файл никому не нужен
+        _remove_artifact(result)
+        return
+    for i, fut in enumerate(waiters):
+        fut.set_result(result if i == 0 else _link_artifact(result))
+
+
+async def single_flight(key, factory):
+    """
+    Выполнить factory() (корутину-загрузку) один раз на ключ, пока она в процессе.
+    Каждый вызывающий получает свой путь к тому же файлу и удаляет его сам, как и раньше.
+    Отмена одного ожидающего не отменяет загрузку для остальных.
+    """
+    fut = asyncio.get_running_loop().create_future()
+    waiters = _inflight.get(key)
+    if waiters is not None:
+        waiters.append(fut)
+        logger.info(f"single_flight: joined in-flight download {key} ({len(waiters)} waiting)")
+    else:
+        _inflight[key] = [fut]
+        task = asyncio.ensure_future(_lead_flight(key, factory))
+        _inflight_tasks.add(task)
+        task.add_done_callback(_inflight_tasks.discard)
+    return await fut
+
+
 def get_name_from_path(path: str):
     filename = path.split("/")
     filename = filename[-1]
@@ -265,40 +408,19 @@ def get_name_from_path(path: str):
 
 def compress_video_ffmpeg(input_file, output_file, max_size_mb=50, path='./videos/youtube'):
     """
-    Сжимает видеофайл до нужного размера (меньше 50 МБ).
-    Использует FFmpeg для сжатия видео.
+    Сжимает видеофайл до нужного размера (меньше 50 МБ) — см. compress_to_size.
+    Возвращает имя сжатого файла, исходное (если сжатие не нужно) или None, если уложиться не удалось.
     """
-    # Определим максимальный размер в байтах
     max_size_bytes = max_size_mb * 1024 * 1024
-    up_threashhold = 100 * 1024 * 1024
-    
-    # Проверим размер файла
     file_size = os.path.getsize(f"{path}/{input_file}")
-    
     if file_size <= max_size_bytes:
         return input_file  # Если файл уже меньше или равен 50 МБ, просто возвращаем его
-    
-    # Параметры сжатия: снижаем битрейт и качество видео
-    command = [
-        'ffmpeg', '-i', f"{path}/{input_file}",
-        '-vcodec', 'libx264',  # Используем кодек H.264
-        '-crf', '28',  # Constant Rate Factor, компромисс между качеством и размером (22-28)
-        '-preset', 'fast',  # Настройка скорости сжатия
-        '-y',  # Перезаписываем выходной файл
-        f"{path}/{output_file}"
-    ]
-    
-    # Выполняем команду
-    subprocess.run(command, check=True)
-    
-    # Проверяем, уменьшился ли файл до нужного размера
-    output_size = os.path.getsize(f"{path}/{output_file}")
-    if output_size > max_size_bytes:
-        logger.warning(f"Warning: Video is still larger than {max_size_mb} MB.")
+
+    if not compress_to_size(f"{path}/{input_file}", f"{path}/{output_file}", max_size_mb):
+        return None
 
     if os.path.isfile(f"{path}/{input_file}"):
         os.remove(f"{path}/{input_file}")
-    
     return output_file
 
 
@@ -311,12 +433,9 @@ def compress_video(input_path, output_path, target_size_mb=50):
         logger.info(f"Видео {input_path} имеет размер {file_size_mb:.2f} МБ, что больше {target_size_mb} МБ.")
         logger.info("Запуск сжатия...")
 
-        # Открываем видеофайл с помощью moviepy
-        video = VideoFileClip(input_path)
+        if not compress_to_size(input_path, output_path, target_size_mb):
+            return False
 
-        # Пример сжатия, уменьшив битрейт
-        video.write_videofile(output_path, bitrate="500k", codec="libx264", audio_codec="aac")
-        
         logger.info(f"Видео сжато и сохранено как {output_path}")
         if os.path.isfile(f"{input_path}"):
             os.remove(f"{input_path}")
@@ -361,12 +480,14 @@ def cleanup_temp_cookies():
     _temp_cookie_files = []
 
 
-def get_yt_dlp_conf(path, proxy=None, player_client=None, *, skip_po_token: bool = False):
+def get_yt_dlp_conf(path, proxy=None, player_client=None, *, skip_po_token: bool = False, set_env: bool = True):
     """
     Возвращает ydl_opts. Если proxy_url задан — он подставляется (нормализуется).
     Использует временную копию cookies чтобы не портить оригинал.
     Поддерживает PO Token для обхода age-restriction.
     skip_po_token=True — не подставлять po_token (доп. попытки при сбоях yt-dlp).
+    set_env=False — не трогать ALL_PROXY/HTTP(S)_PROXY процесса, прокси только в ydl_opts['proxy']
+    ('' — явно напрямую); нужно, когда параллельно идут попытки через разные прокси (hedged-режим).
     """
     if player_client is None:
         player_client = ["web"]
@@ -429,7 +550,15 @@ def get_yt_dlp_conf(path, proxy=None, player_client=None, *, skip_po_token: bool
             ydl_opts['cookiefile'] = temp_cookie
             logger.debug("Using YouTube cookies: %s", _cookie_path)
 
-    if proxy:
+    if not set_env:
+        keys = [k for k in (proxy or {}).keys() if k is not None and str(k).strip()]
+        ydl_opts['proxy'] = str(keys[0]).rstrip('/') if keys else ''
+        if keys:
+            temp_proxy_cookie = get_temp_cookie_copy(proxy[keys[0]])
+            if temp_proxy_cookie:
+                ydl_opts['cookiefile'] = temp_proxy_cookie
+            ydl_opts['socket_timeout'] = 150
+    elif proxy:
         keys = [k for k in proxy.keys() if k is not None and str(k).strip()]
         if not keys:
             logger.warning("get_yt_dlp_conf: пропуск записи прокси с пустым URL")
@@ -465,6 +594,125 @@ def extract_info_sync(opts, url, download=False):
         return ydl.extract_info(url, download=download)
 
 
+# Кеш полного info.json роликов YouTube на диске (YT_INFO_CACHE_DIR, TTL YT_INFO_CACHE_TTL).
+# Ссылки на потоки привязаны к IP и клиенту, поэтому ключ — video_id + маршрут (прокси, player_client, po_token);
+# для названия/канала подходит запись с любого маршрута.
+
+def _youtube_cache_id(url: str) -> Optional[str]:
+    key = normalize_source_url(url)
+    return key.split(":", 1)[1] if key.startswith("youtube:") else None
+
+
+def _yt_info_route(opts: Dict[str, Any]) -> str:
+    youtube_args = (opts.get('extractor_args') or {}).get('youtube') or {}
+    route = [opts.get('proxy') or 'direct', youtube_args.get('player_client'), bool(youtube_args.get('po_token'))]
+    return hashlib.sha1(json.dumps(route).encode()).hexdigest()[:12]
+
+
+def _fresh_info_file(path: str) -> bool:
+    try:
+        if time.time() - os.path.getmtime(path) < YT_INFO_CACHE_TTL:
+            return True
+        os.remove(path)
+    except OSError:
+        pass
+    return False
+
+
+def _cached_yt_info_file(url: str, opts: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Путь к свежему info.json для ролика (для opts — того же маршрута, без opts — любого)."""
+    video_id = _youtube_cache_id(url)
+    if not video_id:
+        return None
+    if opts is not None:
+        path = os.path.join(YT_INFO_CACHE_DIR, f"{video_id}.{_yt_info_route(opts)}.info.json")
+        return path if os.path.isfile(path) and _fresh_info_file(path) else None
+    for path in sorted(find(f"{video_id}.*.info.json", YT_INFO_CACHE_DIR), key=os.path.getmtime, reverse=True):
+        if _fresh_info_file(path):
+            return path
+    return None
+
+
+def _load_yt_info(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return yt_dlp.YoutubeDL.sanitize_info(json.load(f), remove_private_keys=True)
+    except (OSError, ValueError) as e:
+        logger.warning(f"yt info cache: broken {path}: {e}")
+        return None
+
+
+def _store_yt_info(url: str, opts: Dict[str, Any], info: Optional[Dict[str, Any]]) -> None:
+    video_id = _youtube_cache_id(url)
+    if not video_id or not info or not info.get('formats'):
+        return
+    try:
+        os.makedirs(YT_INFO_CACHE_DIR, exist_ok=True)
+        path = os.path.join(YT_INFO_CACHE_DIR, f"{video_id}.{_yt_info_route(opts)}.info.json")
+        fd, tmp_path = tempfile.mkstemp(dir=YT_INFO_CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=True), f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"yt info cache: store failed for {video_id}: {e}")
+
+
+def extract_youtube_info(opts: Dict[str, Any], url: str) -> Dict[str, Any]:
+    """extract_info(download=False) через кеш: повторные вызовы для того же ролика и маршрута не ходят в YouTube."""
+    cached_file = _cached_yt_info_file(url, opts)
+    if cached_file:
+        info = _load_yt_info(cached_file)
+        if info:
+            logger.info(f"yt info cache hit: {os.path.basename(cached_file)}")
+            return info
+    info = extract_info_sync(opts, url, download=False)
+    _store_yt_info(url, opts, info)
+    return info
+
+
+def download_youtube_with_info(opts: Dict[str, Any], url: str) -> Dict[str, Any]:
+    """
+    extract_info(download=True), но при наличии кешированного info — сразу process_ie_result по нему
+    (как yt-dlp --load-info-json): выбор формата и загрузка без повторного запроса страницы и плеера.
+    Если ссылки в кеше протухли — кеш сбрасывается и идёт обычная загрузка.
+    """
+    cached_file = _cached_yt_info_file(url, opts)
+    info = _load_yt_info(cached_file) if cached_file else None
+    if info:
+        try:
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                logger.info(f"Downloading from cached info: {os.path.basename(cached_file)}")
+                return ydl.process_ie_result(info, download=True)
+        except DownloadCancelled:
+            raise
+        except Exception as e:
+            logger.warning(f"Download from cached info failed ({e}), re-extracting")
+            try:
+                os.remove(cached_file)
+            except OSError:
+                pass
+    result = extract_info_sync(opts, url, download=True)
+    _store_yt_info(url, opts, result)
+    return result
+
+
+def _youtube_info_opts(proxy=None) -> Dict[str, Any]:
+    """
+    Опции для одних метаданных — тот же маршрут, что у первой стратегии download_from_youtube,
+    чтобы закешированный info переиспользовался выбором формата и загрузкой.
+    """
+    opts = get_yt_dlp_conf('./videos/youtube', proxy=proxy, player_client=YTDLP_PC_PRIMARY)
+    opts.pop('format', None)
+    opts.update({
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True,
+        'extract_flat': 'in_playlist',
+        'ignore_no_formats_error': True,
+    })
+    return opts
+
+
 async def get_format_for_youtube(ydl_opts, link, format_id='best', res='720p'):
     loop = asyncio.get_running_loop()
 
@@ -475,7 +723,7 @@ async def get_format_for_youtube(ydl_opts, link, format_id='best', res='720p'):
     info_opts['ignore_no_formats_error'] = True  # Игнорируем ошибки форматов
 
     try:
-        info = await loop.run_in_executor(None, lambda: extract_info_sync(info_opts, link, download=False))
+        info = await loop.run_in_executor(None, lambda: extract_youtube_info(info_opts, link))
     except (DownloadError, SSLError, Exception) as e:
         # не падаем — логируем и возвращаем fallback
         logger.warning(f"get_format_for_youtube: failed to extract info (will fallback). Error: {e}")
@@ -526,7 +774,218 @@ async def get_format_for_youtube(ydl_opts, link, format_id='best', res='720p'):
         return format_id
 
 
-async def download_from_youtube(link, path='./videos/youtube', out_format="mp4", res="720p", format_id="best", filename=None):
+# Широкие форматы финальных шагов download_from_youtube (без PO-токена): напрямую и через прокси
+_YT_LOOSE_FORMATS = (
+    'bestvideo+bestaudio/best',
+    'bestvideo[height<=720]+bestaudio/best',
+    'best[ext=mp4]/best[ext=webm]/best',
+    '18/best',
+    'worst',
+)
+_YT_PROXY_LOOSE_FORMATS = ('bestvideo+bestaudio/best', 'best[ext=mp4]/best', '18/best')
+
+# audio_only: одна звуковая дорожка (m4a/opus) вместо 1080p-видео; 18 (360p mp4) — крайний случай
+_YT_AUDIO_FORMAT = 'bestaudio[ext=m4a]/bestaudio/best'
+_YT_AUDIO_LOOSE_FORMATS = ('bestaudio/best', '18/best', 'worstaudio/worst')
+_YT_AUDIO_PROXY_LOOSE_FORMATS = ('bestaudio/best', '18/best')
+
+
+async def _youtube_format(opts, link, format_id, res, audio_only=False) -> str:
+    """Формат для «выбранного» шага: bestaudio для audio_only, иначе подбор через get_format_for_youtube."""
+    if audio_only:
+        return _YT_AUDIO_FORMAT
+    fmt = await get_format_for_youtube(opts, link, format_id, res)
+    return f"{fmt}/best" if fmt != 'best' else 'best'
+
+
+def _youtube_strategies(path, link, format_id, res, audio_only=False):
+    """
+    Стратегии download_from_youtube для hedged-режима, в том же порядке, что и последовательный перебор:
+    список (метка, URL прокси или None, async-фабрика ydl_opts).
+    """
+    def chosen_format(player_client, proxy=None):
+        async def build():
+            # Прокси (или '' — напрямую) явно в opts: проба форматов и загрузка идут тем же маршрутом
+            opts = get_yt_dlp_conf(path, proxy=proxy, player_client=player_client, set_env=False)
+            opts['format'] = await _youtube_format(opts, link, format_id, res, audio_only)
+            return opts
+        return build
+
+    def fixed_format(player_client, fmt, proxy=None, skip_po_token=False):
+        async def build():
+            opts = get_yt_dlp_conf(
+                path, proxy=proxy, player_client=player_client, skip_po_token=skip_po_token, set_env=False
+            )
+            opts['format'] = fmt
+            return opts
+        return build
+
+    best = 'bestaudio/best' if audio_only else 'best'
+    strategies = [
+        ("primary", None, chosen_format(YTDLP_PC_PRIMARY)),
+        ("web", None, fixed_format(YTDLP_PC_WEB, best)),
+    ]
+    proxies = _all_proxy_candidates()
+    for proxy in proxies:
+        strategies.append(("proxy primary", _proxy_url(proxy), chosen_format(YTDLP_PC_PRIMARY, proxy)))
+        strategies.append(("proxy web", _proxy_url(proxy), fixed_format(YTDLP_PC_WEB, best, proxy)))
+    for fmt in _YT_AUDIO_LOOSE_FORMATS if audio_only else _YT_LOOSE_FORMATS:
+        strategies.append((f"loose {fmt}", None, fixed_format(YTDLP_PC_PRIMARY, fmt, skip_po_token=True)))
+    for proxy in proxies:
+        for fmt in _YT_AUDIO_PROXY_LOOSE_FORMATS if audio_only else _YT_PROXY_LOOSE_FORMATS:
+            strategies.append(
+                (f"proxy loose {fmt}", _proxy_url(proxy), fixed_format(YTDLP_PC_PRIMARY, fmt, proxy, skip_po_token=True))
+            )
+    return strategies
+
+
+# Лимит одновременных загрузок через один прокси (на event loop: задачи очереди крутят свой asyncio.run)
+_hedge_proxy_slots = weakref.WeakKeyDictionary()
+
+
+def _hedge_proxy_slot(proxy_url: str) -> asyncio.Semaphore:
+    slots = _hedge_proxy_slots.setdefault(asyncio.get_running_loop(), {})
+    if proxy_url not in slots:
+        slots[proxy_url] = asyncio.Semaphore(max(1, YT_HEDGE_PER_PROXY))
+    return slots[proxy_url]
+
+
+def _downloaded_file(info, attempt_dir: str) -> Optional[str]:
+    for d in (info or {}).get('requested_downloads') or []:
+        fp = d.get('filepath')
+        if fp and os.path.isfile(fp):
+            return fp
+    files = [os.path.join(attempt_dir, f) for f in os.listdir(attempt_dir)]
+    files = [f for f in files if os.path.isfile(f)]
+    return max(files, key=os.path.getsize) if files else None
+
+
+async def _hedge_attempt(label, proxy_url, build, link, attempt_dir, cancel: threading.Event) -> Optional[str]:
+    """Одна стратегия в своей папке; возвращает путь к скачанному файлу или None."""
+    slot = _hedge_proxy_slot(proxy_url) if proxy_url else None
+    started = None
+    if slot:
+        await slot.acquire()
+    try:
+        if cancel.is_set():
+            return None
+        ydl_opts = await build()
+        if cancel.is_set():
+            return None
+        ydl_opts['outtmpl'] = f'{attempt_dir}/%(title)s.%(ext)s'
+
+        def stop_if_cancelled(_):
+            # yt-dlp крутится в потоке — снять его можно только из хука
+            if cancel.is_set():
+                raise DownloadCancelled()
+
+        ydl_opts['progress_hooks'] = [stop_if_cancelled]
+        ydl_opts['postprocessor_hooks'] = [stop_if_cancelled]
+        logger.info(f"Hedged attempt '{label}' proxy={proxy_url} format={ydl_opts.get('format')}")
+        loop = asyncio.get_running_loop()
+        started = _begin_proxy_attempt(proxy_url)
+        info = await loop.run_in_executor(None, lambda: download_youtube_with_info(ydl_opts, link))
+        _record_proxy_attempt(proxy_url, True, started)
+        return _downloaded_file(info, attempt_dir)
+    except DownloadCancelled:
+        logger.info(f"Hedged attempt '{label}' cancelled")
+    except Exception as e:
+        logger.warning(f"Hedged attempt '{label}' failed: {e}")
+        if started is not None:
+            _record_proxy_attempt(proxy_url, False, started, e)
+    finally:
+        if slot:
+            slot.release()
+    return None
+
+
+# Сколько ждать остановки проигравших попыток перед удалением их папок, сек
+_HEDGE_CLEANUP_WAIT = 5
+
+
+async def _hedge_cleanup(running: Dict[asyncio.Future, str]) -> None:
+    """
+    Дождаться проигравших (они останавливаются на ближайшем хуке yt-dlp) не дольше _HEDGE_CLEANUP_WAIT
+    и убрать их папки. Кто не успел — убирает свою папку сам, когда завершится.
+    """
+    if not running:
+        return
+    await asyncio.wait(running.keys(), timeout=_HEDGE_CLEANUP_WAIT)
+    for task, attempt_dir in running.items():
+        if task.done():
+            shutil.rmtree(attempt_dir, ignore_errors=True)
+        else:
+            task.add_done_callback(lambda _, d=attempt_dir: shutil.rmtree(d, ignore_errors=True))
+
+
+def _claim_unique_path(path: str, filename: str) -> str:
+    """Свободное имя в path: name.ext, name(0).ext, ... Файл создаётся сразу — параллельная загрузка его не займёт."""
+    stem, ext = os.path.splitext(filename)
+    candidate, ind = filename, 0
+    while True:
+        target = os.path.join(path, candidate)
+        try:
+            os.close(os.open(target, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return target
+        except FileExistsError:
+            candidate = f"{stem}({ind}){ext}"
+            ind += 1
+
+
+async def _download_from_youtube_hedged(link, path, format_id, res, audio_only=False) -> Optional[str]:
+    """
+    Hedged-вариант download_from_youtube: стратегия стартует сразу после неудачи предыдущей
+    или через YT_HEDGE_DELAY сек, если та ещё идёт (не больше YT_HEDGE_MAX_PARALLEL одновременно).
+    Первая удачная побеждает, остальные отменяются. Каждая пишет в свою папку — файлы не пересекаются.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + YT_HEDGE_DEADLINE
+    try:
+        pending = _youtube_strategies(path, link, format_id, res, audio_only)
+    except Exception as e:
+        logger.exception(f"_youtube_strategies failed: {e}")
+        return None
+    cancel = threading.Event()
+    running: Dict[asyncio.Future, str] = {}
+    winner = None
+
+    def launch():
+        label, proxy_url, build = pending.pop(0)
+        attempt_dir = tempfile.mkdtemp(prefix='.hedge-', dir=path)
+        task = asyncio.ensure_future(_hedge_attempt(label, proxy_url, build, link, attempt_dir, cancel))
+        running[task] = attempt_dir
+
+    try:
+        launch()
+        while running and winner is None:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                logger.warning(f"download_from_youtube: hedged deadline {YT_HEDGE_DEADLINE}s exceeded for {link}")
+                break
+            can_hedge = bool(pending) and len(running) < YT_HEDGE_MAX_PARALLEL
+            done, _ = await asyncio.wait(
+                running.keys(),
+                timeout=min(YT_HEDGE_DELAY, remaining) if can_hedge else remaining,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                attempt_dir = running.pop(task)
+                file_path = task.result()
+                if file_path and winner is None:
+                    winner = _claim_unique_path(path, os.path.basename(file_path))
+                    os.replace(file_path, winner)
+                shutil.rmtree(attempt_dir, ignore_errors=True)
+            # Неудача или истёк YT_HEDGE_DELAY — запускаем следующую стратегию
+            if winner is None and pending and len(running) < YT_HEDGE_MAX_PARALLEL:
+                launch()
+    finally:
+        cancel.set()
+        await _hedge_cleanup(running)
+
+    return os.path.basename(winner) if winner else None
+
+
+async def download_from_youtube(link, path='./videos/youtube', out_format="mp4", res="720p", format_id="best", filename=None, audio_only=False):
     """
     Логика:
     1) Без прокси (web_creator / mweb / tv), затем клиент web.
@@ -534,23 +993,38 @@ async def download_from_youtube(link, path='./videos/youtube', out_format="mp4",
     3) Финально — широкие format strings без YT_PO_TOKEN (спасает при битом токене в .env).
     Видеофайл временно в path; после конвертации в get_audio_from_youtube исходник удаляется.
     Возвращает имя файла (строку) или None.
+    При YT_HEDGE_ENABLED те же шаги идут внахлёст (_download_from_youtube_hedged).
+    audio_only=True — те же шаги, но качается только звуковая дорожка (bestaudio: m4a/opus).
     """
     os.makedirs(path, exist_ok=True)
+    if YT_HEDGE_ENABLED:
+        try:
+            return await _download_from_youtube_hedged(link, path, format_id, res, audio_only)
+        finally:
+            os.environ.pop('ALL_PROXY', None)
+            os.environ.pop('HTTP_PROXY', None)
+            os.environ.pop('HTTPS_PROXY', None)
+            cleanup_temp_cookies()
     loop = asyncio.get_running_loop()
-    logger.info(f"Trying to download video in format: {format_id}")
+    logger.info(f"Trying to download {'audio' if audio_only else 'video'} in format: {format_id}")
     result = None
+    best = 'bestaudio/best' if audio_only else 'best'
 
     async def try_strategy(ydl_opts, tries=3):
         backoff = 1.0
         for i in range(1, tries + 1):
+            started = _begin_proxy_attempt(ydl_opts.get('proxy'))
             try:
                 logger.info(f"Download attempt {i} for client={ydl_opts.get('extractor_args', {}).get('youtube', {}).get('player_client')} proxy={ydl_opts.get('proxy')} format={ydl_opts.get('format')}")
-                res_local = await loop.run_in_executor(None, lambda: extract_info_sync(ydl_opts, link, download=True))
+                res_local = await loop.run_in_executor(None, lambda: download_youtube_with_info(ydl_opts, link))
+                _record_proxy_attempt(ydl_opts.get('proxy'), True, started)
                 return res_local
             except SSLError as e:
                 logger.warning(f"SSLError attempt {i}: {e}")
+                _record_proxy_attempt(ydl_opts.get('proxy'), False, started, e)
             except Exception as e:
                 logger.warning(f"Download attempt {i} failed: {e}")
+                _record_proxy_attempt(ydl_opts.get('proxy'), False, started, e)
                 if 'Unable to download webpage' in str(e):
                     ydl_opts['user_agent'] = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
             if i < tries:
@@ -561,9 +1035,8 @@ async def download_from_youtube(link, path='./videos/youtube', out_format="mp4",
     # 1) no-proxy, web-like (пробуем разные клиенты)
     try:
         ydl_opts = get_yt_dlp_conf(path, proxy=None, player_client=YTDLP_PC_PRIMARY)
-        chosen_format = await get_format_for_youtube(ydl_opts, link, format_id, res)
-        # Добавляем fallback на 'best' если выбранный формат недоступен
-        ydl_opts['format'] = f"{chosen_format}/best" if chosen_format != 'best' else 'best'
+        # С fallback на 'best', если выбранный формат недоступен
+        ydl_opts['format'] = await _youtube_format(ydl_opts, link, format_id, res, audio_only)
         logger.info(f"Chosen format (no-proxy): {ydl_opts['format']}")
         result = await try_strategy(ydl_opts, tries=1)
     except Exception as e:
@@ -574,7 +1047,7 @@ async def download_from_youtube(link, path='./videos/youtube', out_format="mp4",
     if result is None:
         try:
             ydl_opts_alt = get_yt_dlp_conf(path, proxy=None, player_client=YTDLP_PC_WEB)
-            ydl_opts_alt['format'] = 'best'
+            ydl_opts_alt['format'] = best
             result = await try_strategy(ydl_opts_alt, tries=1)
         except Exception as e:
             logger.exception(f"Unexpected error in no-proxy fallback: {e}")
@@ -594,8 +1067,7 @@ async def download_from_youtube(link, path='./videos/youtube', out_format="mp4",
             # primary: web_creator / mweb / tv
             try:
                 ydl_opts_p = get_yt_dlp_conf(path, proxy=proxy, player_client=YTDLP_PC_PRIMARY)
-                chosen_format_p = await get_format_for_youtube(ydl_opts_p, link, format_id, res)
-                ydl_opts_p['format'] = f"{chosen_format_p}/best" if chosen_format_p != 'best' else 'best'
+                ydl_opts_p['format'] = await _youtube_format(ydl_opts_p, link, format_id, res, audio_only)
                 logger.info(f"Chosen format (proxy): {ydl_opts_p['format']}")
                 result = await try_strategy(ydl_opts_p, tries=1)
             except Exception as e:
@@ -605,7 +1077,7 @@ async def download_from_youtube(link, path='./videos/youtube', out_format="mp4",
             if result is None:
                 try:
                     ydl_opts_p2 = get_yt_dlp_conf(path, proxy=proxy, player_client=YTDLP_PC_WEB)
-                    ydl_opts_p2['format'] = 'best'
+                    ydl_opts_p2['format'] = best
                     result = await try_strategy(ydl_opts_p2, tries=1)
                 except Exception as e:
                     logger.exception(f"Unexpected error in proxy fallback (web): {e}")
@@ -613,13 +1085,7 @@ async def download_from_youtube(link, path='./videos/youtube', out_format="mp4",
 
     # 3) Широкие форматы без PO-токена (неверный YT_PO_TOKEN → «only images» / format not available)
     if result is None:
-        for fmt in (
-            'bestvideo+bestaudio/best',
-            'bestvideo[height<=720]+bestaudio/best',
-            'best[ext=mp4]/best[ext=webm]/best',
-            '18/best',
-            'worst',
-        ):
+        for fmt in _YT_AUDIO_LOOSE_FORMATS if audio_only else _YT_LOOSE_FORMATS:
             if result is not None:
                 break
             try:
@@ -641,7 +1107,7 @@ async def download_from_youtube(link, path='./videos/youtube', out_format="mp4",
         for proxy in pl:
             if result is not None:
                 break
-            for fmt in ('bestvideo+bestaudio/best', 'best[ext=mp4]/best', '18/best'):
+            for fmt in _YT_AUDIO_PROXY_LOOSE_FORMATS if audio_only else _YT_PROXY_LOOSE_FORMATS:
                 if result is not None:
                     break
                 try:
@@ -680,60 +1146,21 @@ async def download_from_youtube(link, path='./videos/youtube', out_format="mp4",
     return None
 
 
-class YoutubeSearchWithProxy(YoutubeSearch):
-    def __init__(self, search_terms: str, max_results=None, proxy=None):
-        self.proxy = proxy
-        super().__init__(search_terms, max_results)
-    
-    def _search(self):
-        # Убедитесь, что установлен пакет для поддержки SOCKS: pip install requests[socks]
-        encoded_search = urllib.parse.quote_plus(self.search_terms)
-        BASE_URL = "https://youtube.com"
-        url = f"{BASE_URL}/results?search_query={encoded_search}"
-        
-        # Настройка прокси для SOCKS5h
-        proxies = None
-        if self.proxy:
-            proxies = {
-                'http': self.proxy,
-                'https': self.proxy
-            }
-        
-        response = requests.get(url, proxies=proxies).text
-        while "ytInitialData" not in response:
-            response = requests.get(url, proxies=proxies).text
-            
-        results = self._parse_html(response)
-        if self.max_results is not None and len(results) > self.max_results:
-            return results[: self.max_results]
-        return results
-
-
-def search_videos(query, max_results=10):
+async def search_videos(query, max_results=10):
     """
-    Поиск видео по запросу (сырой вывод youtube-search, без фильтров и эвристик).
+    Поиск видео по запросу (сырой вывод выдачи YouTube, без фильтров и эвристик).
     Используется в Telegram-боте. Для Mini App — только search_youtube_music_candidates.
     """
     try:
-        rp = get_random_proxy()
-        if rp:
-            proxy = list(rp.keys())[0]
-            results = YoutubeSearchWithProxy(query, max_results=max_results, proxy=proxy).to_dict()
-        else:
-            results = YoutubeSearch(query, max_results=max_results).to_dict()
-        return results
+        return await yt_search.search(query, max_results=max_results, proxy=_proxy_url(get_random_proxy()))
     except Exception as e:
         logging.error(f"Ошибка поиска: {e}")
-        try:
-            return YoutubeSearch(query, max_results=max_results).to_dict()
-        except Exception as e2:
-            logging.error(f"Повтор поиска без прокси не удался: {e2}")
-            return []
+        return []
 
 
 def parse_youtube_duration_to_seconds(duration_str: Optional[str]) -> Optional[int]:
     """
-    Парсит строку длительности из youtube-search (например '3:45', '1:23:45') в секунды.
+    Парсит строку длительности из выдачи YouTube (например '3:45', '1:23:45') в секунды.
     """
     if not duration_str or not isinstance(duration_str, str):
         return None
@@ -798,24 +1225,7 @@ def score_youtube_music_candidate(
     return score
 
 
-def _fetch_youtube_search_raw(query: str, max_fetch: int) -> List[Dict[str, Any]]:
-    """Сырые результаты youtube-search (с прокси или без)."""
-    try:
-        rp = get_random_proxy()
-        if rp:
-            proxy = list(rp.keys())[0]
-            return YoutubeSearchWithProxy(query, max_results=max_fetch, proxy=proxy).to_dict()
-        return YoutubeSearch(query, max_results=max_fetch).to_dict()
-    except Exception as e:
-        logger.warning(f"YouTube search (proxied) failed: {e}, retry without proxy")
-        try:
-            return YoutubeSearch(query, max_results=max_fetch).to_dict()
-        except Exception as e2:
-            logger.error(f"YouTube search failed: {e2}")
-            return []
-
-
-def search_youtube_music_candidates(
+async def search_youtube_music_candidates(
     query: str,
     max_results: int = 20,
     max_duration_sec: int = 600,
@@ -827,7 +1237,7 @@ def search_youtube_music_candidates(
     Возвращает список словарей с ключами:
     video_id, title, channel, duration_seconds, duration_label, thumbnail_url, music_score
     """
-    raw = _fetch_youtube_search_raw(query.strip(), fetch_cap)
+    raw = await search_videos(query.strip(), max_results=fetch_cap)
     if not raw:
         return []
 
@@ -869,73 +1279,34 @@ def search_youtube_music_candidates(
 
 
 def get_video_formats(url: str, max_formats=5):
-    """Получение доступных форматов видео"""
+    """Получение доступных форматов видео (info берётся из кеша и кешируется для последующей загрузки)"""
     
     def extract_formats(ydl_opts):
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            
-            # Фильтруем форматы: только видео+аудио в MP4
-            video_formats = []
-            for f in info.get('formats', []):
-                if (f.get('vcodec') != 'none' and 
-                    f.get('acodec') != 'none' and 
-                    f.get('ext') == 'mp4'):
-                    
-                    format_info = {
-                        'format_id': f.get('format_id'),
-                        'resolution': f.get('resolution', 'N/A'),
-                        'format_note': f.get('format_note', 'N/A'),
-                        'filesize': format_filesize(f.get('filesize')),
-                        'quality': get_quality_score(f)
-                    }
-                    video_formats.append(format_info)
-            
-            # Сортируем по качеству и берем топ
-            video_formats.sort(key=lambda x: x['quality'], reverse=True)
-            return video_formats[:max_formats]
-    
-    # Попытка без прокси (используем временную копию куки!)
-    youtube_args = {}
-    if not _has_default_yt_cookie_file():
-        if YT_PO_TOKEN:
-            raw = _strip_env_secret(YT_PO_TOKEN)
-            if raw:
-                youtube_args['po_token'] = [f'web+{raw}']
-                logger.info("Using YouTube PO Token from .env (cookies file not set)")
-        if YT_VISITOR_DATA:
-            vd = _strip_env_secret(YT_VISITOR_DATA)
-            if vd:
-                youtube_args['visitor_data'] = [vd]
-                logger.info("Using YouTube Visitor Data from .env (cookies file not set)")
-
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'age_limit': None,  # Снимаем ограничение возраста
-        'extractor_args': _build_extractor_args(youtube_args),
-        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'referer': 'https://www.youtube.com/',
-        **_core_youtube_ydl_opts(),
-    }
-    
-    _cf = _resolve_yt_cookie_path()
-    cookie_exists = bool(_cf)
-    logger.info("get_video_formats: Cookie file exists: %s, path: %s", cookie_exists, _cf or DEFAULT_YT_COOKIE)
-
-    temp_cookie = None
-    if _cf:
-        temp_cookie = get_temp_cookie_copy(_cf)
-        if temp_cookie:
-            ydl_opts['cookiefile'] = temp_cookie
-            logger.info("get_video_formats: Using temp cookie: %s", temp_cookie)
-        else:
-            logger.warning("get_video_formats: Failed to create temp cookie copy!")
-    else:
-        logger.warning("get_video_formats: Cookie file NOT found at %s (cwd=%s)", DEFAULT_YT_COOKIE, os.getcwd())
+        info = extract_youtube_info(ydl_opts, url)
+
+        # Фильтруем форматы: только видео+аудио в MP4
+        video_formats = []
+        for f in info.get('formats', []):
+            if (f.get('vcodec') != 'none' and 
+                f.get('acodec') != 'none' and 
+                f.get('ext') == 'mp4'):
+                
+                format_info = {
+                    'format_id': f.get('format_id'),
+                    'resolution': f.get('resolution', 'N/A'),
+                    'format_note': f.get('format_note', 'N/A'),
+                    'filesize': format_filesize(f.get('filesize')),
+                    'quality': get_quality_score(f)
+                }
+                video_formats.append(format_info)
+        
+        # Сортируем по качеству и берем топ
+        video_formats.sort(key=lambda x: x['quality'], reverse=True)
+        return video_formats[:max_formats]
     
+    # Тот же маршрут (клиенты, cookies, PO token), что и у загрузки — форматы совпадут, info переиспользуется
     try:
-        result = extract_formats(ydl_opts)
+        result = extract_formats(_youtube_info_opts())
         cleanup_temp_cookies()
         return result
     except Exception as e:
@@ -945,19 +1316,15 @@ def get_video_formats(url: str, max_formats=5):
     try:
         proxy = get_random_proxy()
         if proxy:
-            proxy_url = list(proxy.keys())[0]
-            proxy_cookie = proxy[proxy_url]
-            ydl_opts['proxy'] = str(proxy_url).rstrip('/')
-            # Используем временную копию прокси-куки тоже
-            temp_proxy_cookie = get_temp_cookie_copy(proxy_cookie)
-            if temp_proxy_cookie:
-                ydl_opts['cookiefile'] = temp_proxy_cookie
-            ydl_opts['socket_timeout'] = 150
-            result = extract_formats(ydl_opts)
+            result = extract_formats(_youtube_info_opts(proxy))
             cleanup_temp_cookies()
             return result
     except Exception as e:
         logger.error(f"Ошибка получения форматов с прокси: {e}")
+    finally:
+        os.environ.pop('ALL_PROXY', None)
+        os.environ.pop('HTTP_PROXY', None)
+        os.environ.pop('HTTPS_PROXY', None)
     
     cleanup_temp_cookies()
     return []
@@ -1058,7 +1425,6 @@ async def convert_to_audio(video, path='./audio/converted', out_format="mp3", fi
     return result
 
 def _convert_audio(video, path, out_format, filename):
-    clip = VideoFileClip(video)
     ind = 1
     # Генерируем уникальное имя файла
     while os.path.isfile(f"{path}/{filename}.{out_format}"):
@@ -1066,20 +1432,22 @@ def _convert_audio(video, path, out_format, filename):
         ind += 1
     # Сохраняем аудио в нужном формате
     filename = filename.strip()
-    clip.audio.write_audiofile(f"{path}/{filename}.{out_format}")
-    clip.close()
+    if not postprocess_media(video, f"{path}/{filename}.{out_format}", audio_format=out_format):
+        raise RuntimeError(f"ffmpeg could not extract audio from {video}")
     return f"{filename}.{out_format}"
 
-async def get_audio_from_youtube(link, path="./audio/youtube", out_format="mp3", filename=None):
+async def get_audio_from_youtube(link, path="./audio/youtube", out_format="mp3", filename=None, src_path=None):
     """
-    Скачивает видео и конвертирует в аудио с метаданными (автор, название).
+    Скачивает только звуковую дорожку (bestaudio) и одним проходом ffmpeg
+    перепаковывает/конвертирует её с метаданными (автор, название) и обложкой.
     
     Returns:
         dict: {'audio': 'filename.mp3', 'thumbnail': '/path/to/thumbnail.jpg'} или None
     """
     audio = None
     thumbnail = None
-    video_path = "./videos/youtube"
+    # Отдельная папка: исходник не пересекается по имени с параллельной загрузкой того же ролика как видео
+    video_path = src_path or "./videos/youtube/audio_src"
     
     # Извлекаем video_id для обложки
     video_id = extract_video_id(link)
@@ -1094,23 +1462,25 @@ async def get_audio_from_youtube(link, path="./audio/youtube", out_format="mp3",
         title = "Unknown"
         artist = "Unknown"
     
-    # Скачиваем обложку ПАРАЛЛЕЛЬНО с видео
+    # Скачиваем обложку ПАРАЛЛЕЛЬНО со звуком
     async def download_thumbnail_async():
         if video_id:
             try:
-                return await asyncio.to_thread(download_youtube_thumbnail, video_id)
+                return await thumbnails.get_youtube_thumbnail(video_id, _proxy_url(get_random_proxy()))
             except Exception as e:
                 logger.warning(f"Could not download thumbnail: {e}")
         return None
     
     # Запускаем параллельно
     thumbnail_task = asyncio.create_task(download_thumbnail_async())
-    video = await download_from_youtube(link)
+    video = await download_from_youtube(link, path=video_path, audio_only=True)
     thumbnail = await thumbnail_task  # Получаем результат (уже готов или почти готов)
     
     # Проверка на None СРАЗУ после скачивания
     if video is None:
         logger.warning("get_audio_from_youtube: download_from_youtube вернул None")
+        if src_path:
+            shutil.rmtree(src_path, ignore_errors=True)
         return None
     
     # Извлекаем имя файла без расширения
@@ -1131,30 +1501,15 @@ async def get_audio_from_youtube(link, path="./audio/youtube", out_format="mp3",
     output_file = f"{path}/{output_filename}.{out_format}"
     
     try:
-        # Конвертируем через ffmpeg с метаданными
-        ffmpeg_cmd = [
-            'ffmpeg', '-i', input_file,
-            '-vn',  # Без видео
-            '-acodec', 'libmp3lame' if out_format == 'mp3' else 'aac',
-            '-ab', '192k',
-            '-metadata', f'title={title}',
-            '-metadata', f'artist={artist}',
-            '-metadata', 'album=YouTube',
-            '-y',
-            output_file
-        ]
-        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
+        # Один проход ffmpeg: теги + обложка; если звук уже в нужном кодеке — без перекодирования
+        if postprocess_media(
+            input_file,
+            output_file,
+            audio_format=out_format,
+            metadata={'title': title, 'artist': artist, 'album': 'YouTube'},
+            cover=thumbnail if thumbnail and os.path.isfile(thumbnail) else None,
+        ):
             audio = f"{output_filename}.{out_format}"
-        else:
-            logger.error(f"FFmpeg error: {result.stderr}")
-            # Не оставляем битый/частичный файл на диске
-            if os.path.isfile(output_file):
-                try:
-                    os.remove(output_file)
-                except OSError:
-                    pass
     except Exception as e:
         logger.error(f"Error converting to audio: {e}")
         if os.path.isfile(output_file):
@@ -1163,9 +1518,12 @@ async def get_audio_from_youtube(link, path="./audio/youtube", out_format="mp3",
             except OSError:
                 pass
     finally:
-        # Исходное видео после конвертации не храним на сервере
+        # Исходник после конвертации не храним на сервере
         if os.path.isfile(input_file):
             os.remove(input_file)
+        if src_path:
+            # Своя папка исходников задачи (workspace) — убираем целиком, чтобы папка задачи опустела
+            shutil.rmtree(src_path, ignore_errors=True)
     
     if audio:
         return {
@@ -1177,29 +1535,14 @@ async def get_audio_from_youtube(link, path="./audio/youtube", out_format="mp3",
 def reencode_video(path_to_video):
     """
     Перекодирует видео для совместимости с iOS/Telegram.
-    Оптимизировано для скорости с сохранением совместимости.
+    Если кодеки уже подходят (H.264 yuv420p + AAC) — только remux с +faststart, без перекодирования.
     """
     output_path = path_to_video.replace('.mp4', '_reencoded.mp4')
-    command = [
-        'ffmpeg', '-i', path_to_video,
-        '-c:v', 'libx264',
-        '-preset', 'veryfast',      # Быстрое кодирование (в 3-5 раз быстрее дефолта)
-        '-crf', '23',               # Хорошее качество
-        '-profile:v', 'baseline',   # Максимальная совместимость с iOS
-        '-level', '3.1',
-        '-pix_fmt', 'yuv420p',      # Совместимость с iOS
-        '-c:a', 'aac',
-        '-b:a', '128k',             # Битрейт аудио
-        '-movflags', '+faststart',  # Метаданные в начале для стриминга
-        '-y',                       # Перезаписывать без вопросов
-        output_path
-    ]
-    subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    postprocess_media(path_to_video, output_path, ios=True)
     return output_path
 
-def _download_instagram_reels_sync(reels_url):
+def _download_instagram_reels_sync(reels_url, path="./videos/reels"):
     """Синхронная функция скачивания Instagram reels (внутренняя). Сначала без прокси, затем те же прокси, что у YouTube."""
-    path = "./videos/reels"
     os.makedirs(path, exist_ok=True)
     match = re.search(r"reel/([^/?]+)", reels_url)
     filename = match.group(1) if match else "instagram_video"
@@ -1209,13 +1552,10 @@ def _download_instagram_reels_sync(reels_url):
         ind += 1
     filename = filename.strip()
 
-    cookie_slots = ["0", "1", "2"]
-    random.shuffle(cookie_slots)
+    cookie_slots = _ordered_instagram_cookie_slots()
     proxy_phases: List[Optional[Dict]] = [None]
     try:
-        rest = list(_all_proxy_candidates())
-        random.shuffle(rest)
-        proxy_phases.extend(rest)
+        proxy_phases.extend(_all_proxy_candidates(route_health.KIND_INSTAGRAM_PROXY))
     except Exception as e:
         logger.warning("Instagram reels: не удалось разобрать список прокси: %s", e)
 
@@ -1225,6 +1565,7 @@ def _download_instagram_reels_sync(reels_url):
             if not original:
                 continue
             tmp_cookie_path = None
+            started = None
             try:
                 tmp_fd, tmp_cookie_path = tempfile.mkstemp(suffix=".txt")
                 os.close(tmp_fd)
@@ -1240,10 +1581,14 @@ def _download_instagram_reels_sync(reels_url):
                     cookie,
                     label,
                 )
+                started = _begin_instagram_attempt(cookie, proxy)
                 with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                     ydl.download([reels_url])
+                _record_instagram_attempt(cookie, proxy, True, started)
                 return f"{path}/{filename}.mp4"
             except Exception as e:
+                if started is not None:
+                    _record_instagram_attempt(cookie, proxy, False, started, e)
                 logger.error(
                     "Instagram reels failed cookie=%s proxy=%s: %s",
                     cookie,
@@ -1268,7 +1613,7 @@ async def download_instagram_reels(reels_url):
 def _download_instagram_reels_sync_v2(reels_url):
     """
     Скачивание Instagram reels с автоматическим перекодированием для iOS.
-    Скачивает видео, затем перекодирует через ffmpeg в одной функции.
+    Скачивает видео, затем один проход ffmpeg: совместимость с iOS и +faststart.
     Сначала без прокси, затем те же прокси, что у YouTube.
 
     Для тестирования: python worker.py, затем выбрать вариант 9 и ввести ссылку.
@@ -1282,13 +1627,10 @@ def _download_instagram_reels_sync_v2(reels_url):
         ind += 1
     filename = filename.strip()
 
-    cookie_slots = ["0", "1", "2"]
-    random.shuffle(cookie_slots)
+    cookie_slots = _ordered_instagram_cookie_slots()
     proxy_phases: List[Optional[Dict]] = [None]
     try:
-        rest = list(_all_proxy_candidates())
-        random.shuffle(rest)
-        proxy_phases.extend(rest)
+        proxy_phases.extend(_all_proxy_candidates(route_health.KIND_INSTAGRAM_PROXY))
     except Exception as e:
         logger.warning("Instagram reels v2: не удалось разобрать список прокси: %s", e)
 
@@ -1298,6 +1640,7 @@ def _download_instagram_reels_sync_v2(reels_url):
             if not original:
                 continue
             tmp_cookie_path = None
+            started = None
             try:
                 tmp_fd, tmp_cookie_path = tempfile.mkstemp(suffix=".txt")
                 os.close(tmp_fd)
@@ -1312,8 +1655,11 @@ def _download_instagram_reels_sync_v2(reels_url):
                     cookie,
                     "direct" if proxy is None else next(iter(proxy.keys()), ""),
                 )
+                started = _begin_instagram_attempt(cookie, proxy)
                 with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                     ydl.download([reels_url])
+                _record_instagram_attempt(cookie, proxy, True, started)
+                started = None
 
                 downloaded = _find_reels_temp_media(path, filename)
                 if not downloaded:
@@ -1325,36 +1671,12 @@ def _download_instagram_reels_sync_v2(reels_url):
                     continue
 
                 output_file = f"{path}/{filename}.mp4"
-                ffmpeg_cmd = [
-                    "ffmpeg",
-                    "-i",
+                if not postprocess_media(
                     downloaded,
-                    "-c:v",
-                    "libx264",
-                    "-preset",
-                    "ultrafast",
-                    "-crf",
-                    "23",
-                    "-profile:v",
-                    "baseline",
-                    "-level",
-                    "3.1",
-                    "-pix_fmt",
-                    "yuv420p",
-                    "-c:a",
-                    "aac",
-                    "-b:a",
-                    "128k",
-                    "-movflags",
-                    "+faststart",
-                    "-y",
                     output_file,
-                ]
-                logger.info(f"Running ffmpeg: {' '.join(ffmpeg_cmd)}")
-                result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True)
-
-                if result.returncode != 0:
-                    logger.error(f"FFmpeg error: {result.stderr}")
+                    ios=True,
+                    preset='ultrafast',
+                ):
                     _cleanup_reels_temp_prefix(path, filename)
                     continue
 
@@ -1366,6 +1688,8 @@ def _download_instagram_reels_sync_v2(reels_url):
                 logger.info(f"Downloaded and encoded for iOS: {output_file}")
                 return output_file
             except Exception as e:
+                if started is not None:
+                    _record_instagram_attempt(cookie, proxy, False, started, e)
                 logger.error(
                     "Instagram reels v2 failed cookie=%s proxy=%s: %s",
                     cookie,
@@ -1397,42 +1721,30 @@ def format_duration(seconds: int) -> str:
         return f"{minutes}:{seconds:02d}"
 
 def get_yt_info(ydl_opts, url, video_id):
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=False)
-        video_info = {
-            'id': video_id,
-            'title': info.get('title', 'Неизвестно'),
-            'channel': info.get('uploader', 'Неизвестно'),
-            'duration': format_duration(info.get('duration', 0)),
-            'views': 'N/A'
-        }
-    return video_info
+    info = extract_youtube_info(ydl_opts, url)
+    return _video_info_dict(info, video_id)
 
-def get_youtube_video_info(url):
-    os.environ.pop('ALL_PROXY', None)
-    os.environ.pop('HTTP_PROXY', None)
-    os.environ.pop('HTTPS_PROXY', None)
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'skip_download': True,  # Явно указываем что не скачиваем
-        'extract_flat': 'in_playlist',  # Для одиночных видео - полная инфа, для плейлистов - только метаданные
-        'ignore_no_formats_error': True,  # Игнорируем ошибки форматов - нам нужны только метаданные
-        **_core_youtube_ydl_opts(),
-    }
-    if _effective_bgutil_base_url():
-        ydl_opts['extractor_args'] = _build_extractor_args({})
 
-    _cf_info = _resolve_yt_cookie_path()
-    if _cf_info:
-        temp_cookie = get_temp_cookie_copy(_cf_info)
-        if temp_cookie:
-            ydl_opts['cookiefile'] = temp_cookie
+def _video_info_dict(info, video_id):
+    return {
+        'id': video_id,
+        'title': info.get('title', 'Неизвестно'),
+        'channel': info.get('uploader', 'Неизвестно'),
+        'duration': format_duration(info.get('duration', 0)),
+        'views': 'N/A'
+    }
 
+def get_youtube_video_info(url):
     video_id = extract_video_id(url)
+    # Название/канал одинаковы с любого маршрута — берём любой свежий info из кеша
+    cached_file = _cached_yt_info_file(url)
+    cached = _load_yt_info(cached_file) if cached_file else None
+    if cached:
+        return _video_info_dict(cached, video_id)
+
     video_info = None
     try:
-        video_info = get_yt_info(ydl_opts, url, video_id)
+        video_info = get_yt_info(_youtube_info_opts(), url, video_id)
         cleanup_temp_cookies()
         return video_info
     except Exception as e:
@@ -1440,128 +1752,17 @@ def get_youtube_video_info(url):
         try:
             proxy = get_random_proxy()
             if proxy:
-                proxy_url = list(proxy.keys())[0]
-                proxy_cookie = proxy[proxy_url]
-                p = str(proxy_url).rstrip('/')
-                ydl_opts['proxy'] = p
-                # Используем временную копию прокси-куки тоже
-                temp_proxy_cookie = get_temp_cookie_copy(proxy_cookie)
-                if temp_proxy_cookie:
-                    ydl_opts['cookiefile'] = temp_proxy_cookie
-                ydl_opts['socket_timeout'] = 150
-                # ставим env на всякий случай, очищаем HTTP_PROXY/HTTPS_PROXY
-                os.environ['ALL_PROXY'] = p
-                os.environ.pop('HTTP_PROXY', None)
-                os.environ.pop('HTTPS_PROXY', None)
-                video_info = get_yt_info(ydl_opts, url, video_id)
+                video_info = get_yt_info(_youtube_info_opts(proxy), url, video_id)
         except Exception as e2:
             logger.error(f"Got Error with proxy too: {e2}")
         cleanup_temp_cookies()
+    finally:
+        os.environ.pop('ALL_PROXY', None)
+        os.environ.pop('HTTP_PROXY', None)
+        os.environ.pop('HTTPS_PROXY', None)
     return video_info
 
 
-def download_youtube_thumbnail(video_id: str, output_path: str = "./thumbnails") -> Optional[str]:
-    """
-    Скачивает и обрабатывает обложку видео с YouTube.
-    Возвращает путь к квадратной обложке 320x320 для Telegram.
-    """
-    os.makedirs(output_path, exist_ok=True)
-    
-    # Пробуем разные качества обложек
-    thumbnail_urls = [
-        f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg",
-        f"https://img.youtube.com/vi/{video_id}/hqdefault.jpg",
-        f"https://img.youtube.com/vi/{video_id}/mqdefault.jpg",
-    ]
-    
-    thumbnail_path = os.path.join(output_path, f"{video_id}.jpg")
-    square_thumbnail_path = os.path.join(output_path, f"{video_id}_square.jpg")
-    
-    # Скачиваем обложку (сначала напрямую, потом через прокси)
-    downloaded = False
-    
-    # Попытка 1: без прокси
-    for url in thumbnail_urls:
-        try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200 and len(response.content) > 1000:
-                with open(thumbnail_path, 'wb') as f:
-                    f.write(response.content)
-                downloaded = True
-                break
-        except Exception as e:
-            logger.warning(f"Failed to download thumbnail from {url}: {e}")
-            continue
-    
-    # Попытка 2: с прокси если не удалось напрямую
-    if not downloaded:
-        proxy = get_random_proxy()
-        if proxy:
-            proxy_url = list(proxy.keys())[0]
-            proxies = {
-                'http': proxy_url,
-                'https': proxy_url
-            }
-            for url in thumbnail_urls:
-                try:
-                    response = requests.get(url, timeout=15, proxies=proxies)
-                    if response.status_code == 200 and len(response.content) > 1000:
-                        with open(thumbnail_path, 'wb') as f:
-                            f.write(response.content)
-                        downloaded = True
-                        logger.info(f"Downloaded thumbnail via proxy: {video_id}")
-                        break
-                except Exception as e:
-                    logger.warning(f"Failed to download thumbnail via proxy from {url}: {e}")
-                    continue
-    
-    if not downloaded:
-        return None
-    
-    # Обрезаем до квадрата с помощью ffmpeg
-    try:
-        # Получаем размеры изображения
-        probe_cmd = [
-            'ffprobe', '-v', 'error',
-            '-select_streams', 'v:0',
-            '-show_entries', 'stream=width,height',
-            '-of', 'json',
-            thumbnail_path
-        ]
-        probe_result = subprocess.run(probe_cmd, capture_output=True, text=True)
-        probe_data = json.loads(probe_result.stdout)
-        
-        width = probe_data['streams'][0]['width']
-        height = probe_data['streams'][0]['height']
-        
-        # Вычисляем размер квадрата (минимум из ширины и высоты)
-        size = min(width, height)
-        x_offset = (width - size) // 2
-        y_offset = (height - size) // 2
-        
-        # Обрезаем до квадрата и масштабируем до 320x320
-        ffmpeg_cmd = [
-            'ffmpeg', '-i', thumbnail_path,
-            '-vf', f'crop={size}:{size}:{x_offset}:{y_offset},scale=320:320',
-            '-y',
-            square_thumbnail_path
-        ]
-        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            # Удаляем оригинальный файл
-            if os.path.exists(thumbnail_path):
-                os.remove(thumbnail_path)
-            return square_thumbnail_path
-        else:
-            logger.error(f"FFmpeg thumbnail error: {result.stderr}")
-            return thumbnail_path  # Возвращаем оригинал если не получилось обрезать
-            
-    except Exception as e:
-        logger.error(f"Error processing thumbnail: {e}")
-        return thumbnail_path  # Возвращаем оригинал если ошибка
-
-
 def replace_audio(video_path, audio_path, path="./videos/for_replace/ready"):
     os.makedirs(path, exist_ok=True)
     # Загружаем видео
@@ -1600,7 +1801,7 @@ def replace_audio(video_path, audio_path, path="./videos/for_replace/ready"):
         return None
     
 def get_video_resolution_moviepy(video_path):
-    """Получает разрешение видеофайла с помощью moviepy.
+    """Получает разрешение видеофайла (через media_probe — один ffprobe, без открытия VideoFileClip).
 
     Args:
     video_path: Путь к видеофайлу.
@@ -1609,10 +1810,7 @@ def get_video_resolution_moviepy(video_path):
     Кортеж (ширина, высота).
     """
 
-    clip = VideoFileClip(video_path)
-    width, height = clip.size
-    clip.close()
-    return width, height
+    return media_probe.get_dimensions_sync(video_path)
 
 
 class TikTokDownloader:
@@ -1640,7 +1838,7 @@ class TikTokDownloader:
             logger.info("\nDownload completed, finalizing...")
 
     def get_filename(self, video_url: str, custom_name: Optional[str] = None) -> str:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         if custom_name:
             return f"{custom_name}_{timestamp}.mp4"
         return f"tiktok_{timestamp}.mp4"
@@ -1735,6 +1933,279 @@ class TikTokDownloader:
         return None
 
 
+# ==================== Пост-обработка (один проход ffmpeg) ====================
+
+_MP4_FAMILY = ('.mp4', '.m4a', '.mov', '.m4v')
+_IOS_PIX_FMTS = ('yuv420p', 'yuvj420p')
+_AUDIO_ENCODERS = {'mp3': ('mp3', 'libmp3lame'), 'm4a': ('aac', 'aac'), 'aac': ('aac', 'aac')}
+_PP_AUDIO_BITRATE_K = 128
+
+
+def _watermark_filter(
+    text: str = "tg: @django_media_helper_bot",
+    fontsize: int = 20,
+    opacity: float = 0.7
+) -> str:
+    """drawtext для правого нижнего угла."""
+    return (
+        f"drawtext=text='{text}':fontsize={fontsize}:fontcolor=white@{opacity}"
+        f":x=w-tw-10:y=h-th-10:shadowcolor=black@0.5:shadowx=1:shadowy=1"
+    )
+
+
+def _ios_compatible(info: Optional[media_probe.MediaInfo]) -> bool:
+    """H.264 8-bit 4:2:0 + AAC (или без звука) — iOS/Telegram играют без перекодирования."""
+    if info is None or info.video_codec != 'h264':
+        return False
+    video = next((s for s in info.streams if s.get('codec_type') == 'video'), {})
+    if video.get('pix_fmt') not in _IOS_PIX_FMTS:
+        return False
+    return info.audio_codec in (None, 'aac')
+
+
+def build_postprocess_cmd(
+    input_path: str,
+    output_path: str,
+    info: Optional[media_probe.MediaInfo],
+    ios: bool = False,
+    watermark: Optional[str] = None,
+    max_size_mb: Optional[float] = None,
+    faststart: bool = True,
+    audio_format: Optional[str] = None,
+    metadata: Optional[Dict[str, str]] = None,
+    cover: Optional[str] = None,
+    preset: str = 'veryfast',
+) -> List[str]:
+    """
+    Собирает одну команду ffmpeg из нужных шагов вместо цепочки перекодирований.
+
+    Args:
+        info: Проба входного файла (media_probe); None — считаем, что ничего не подходит
+        ios: Совместимость с iOS (H.264 baseline, yuv420p, AAC)
+        watermark: Фильтр drawtext (см. _watermark_filter) или None
+        max_size_mb: Ограничение размера — видео кодируется с битрейтом под этот размер
+        faststart: moov-атом в начало файла (для mp4/m4a)
+        audio_format: 'mp3' / 'm4a' / ... — извлечь только звук
+        metadata: Теги -metadata (title, artist, ...)
+        cover: JPEG-обложка для audio_format mp3/m4a (attached picture)
+        preset: Пресет libx264, если видео всё-таки кодируется
+
+    Если кодеки входа уже подходят, потоки копируются (-c copy) — остаётся только remux.
+    """
+    cmd = ['ffmpeg', '-y', '-i', input_path]
+
+    if audio_format:
+        target_codec, encoder = _AUDIO_ENCODERS.get(audio_format, (None, None))
+        if cover and target_codec:
+            cmd += ['-i', cover, '-map', '0:a:0', '-map', '1:v:0', '-c:v', 'copy', '-disposition:v:0', 'attached_pic']
+            if audio_format == 'mp3':
+                cmd += ['-id3v2_version', '3']
+        else:
+            cmd += ['-vn']
+        if target_codec and info is not None and info.audio_codec == target_codec:
+            cmd += ['-c:a', 'copy']
+        else:
+            if encoder:
+                cmd += ['-c:a', encoder]
+            cmd += ['-b:a', '192k']
+    else:
+        size_limit = max_size_mb * 1024 * 1024 if max_size_mb else None
+        over_size = bool(size_limit and (info is None or info.size > size_limit))
+        encode_video = bool(watermark) or over_size or (ios and not _ios_compatible(info))
+
+        if encode_video:
+            cmd += ['-c:v', 'libx264', '-preset', preset, '-pix_fmt', 'yuv420p']
+            if ios:
+                cmd += ['-profile:v', 'baseline', '-level', '3.1']
+            if over_size and info is not None and info.duration:
+                # Битрейт под размер: всё, что остаётся после звука, с запасом 5% на контейнер
+                total_k = size_limit * 8 / 1000 / info.duration * 0.95
+                video_k = max(int(total_k - _PP_AUDIO_BITRATE_K), 100)
+                cmd += ['-b:v', f'{video_k}k', '-maxrate', f'{video_k}k', '-bufsize', f'{video_k * 2}k']
+            else:
+                cmd += ['-crf', '28' if over_size else '23']
+            if watermark:
+                cmd += ['-vf', watermark]
+        else:
+            cmd += ['-c:v', 'copy']
+
+        audio_codec = info.audio_codec if info is not None else None
+        if audio_codec == 'aac' or (audio_codec and not ios and not over_size):
+            cmd += ['-c:a', 'copy']
+        else:
+            cmd += ['-c:a', 'aac', '-b:a', f'{_PP_AUDIO_BITRATE_K}k']
+
+    for key, value in (metadata or {}).items():
+        cmd += ['-metadata', f'{key}={value}']
+    if faststart and os.path.splitext(output_path)[1].lower() in _MP4_FAMILY:
+        cmd += ['-movflags', '+faststart']
+    cmd.append(output_path)
+    return cmd
+
+
+def postprocess_media(
+    input_path: str,
+    output_path: str,
+    timeout: Optional[float] = None,
+    **steps
+) -> Optional[str]:
+    """
+    Пост-обработка одним вызовом ffmpeg (шаги — см. build_postprocess_cmd).
+
+    Returns:
+        output_path или None при ошибке (частичный файл удаляется)
+    """
+    info = media_probe.probe_sync(input_path)
+    cmd = build_postprocess_cmd(input_path, output_path, info, **steps)
+    logger.info(f"Running ffmpeg: {' '.join(cmd)}")
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        if result.returncode == 0 and os.path.isfile(output_path):
+            return output_path
+        logger.error(f"FFmpeg error: {result.stderr[-2000:]}")
+    except subprocess.TimeoutExpired:
+        logger.error(f"FFmpeg timeout ({timeout}s): {input_path}")
+    except Exception as e:
+        logger.error(f"FFmpeg postprocess failed: {e}")
+    if os.path.isfile(output_path):
+        try:
+            os.remove(output_path)
+        except OSError:
+            pass
+    return None
+
+
+# ==================== Сжатие под размер ====================
+
+# (короткая сторона кадра, минимальный битрейт видео в кбит/с, при котором она ещё смотрится)
+_COMPRESS_LADDER = ((1080, 2500), (720, 1200), (540, 700), (480, 500), (360, 280), (240, 0))
+_COMPRESS_OVERHEAD = 0.97     # запас на контейнер mp4
+_COMPRESS_MIN_VIDEO_K = 60    # ниже — смотреть уже нечего, отказываемся
+_COMPRESS_ATTEMPTS = 3
+
+
+def plan_compression(
+    info: media_probe.MediaInfo,
+    max_size_mb: float,
+    video_k_cap: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Битрейты и разрешение под бюджет размера (video_k_cap — потолок битрейта после перебора).
+
+    Returns:
+        {'video_k', 'audio_k', 'short_side'} или None, если длительность неизвестна
+        или бюджета не хватит даже на минимальное качество
+    """
+    if not info.duration:
+        return None
+    audio_k = COMPRESS_AUDIO_KBPS if info.audio_codec else 0
+    total_k = max_size_mb * 1024 * 1024 * 8 / 1000 / info.duration * _COMPRESS_OVERHEAD
+    video_k = int(total_k - audio_k)
+    if video_k < _COMPRESS_MIN_VIDEO_K and audio_k:
+        # Долгое видео: звук ужимаем, чтобы оставить место картинке
+        audio_k = 48
+        video_k = int(total_k - audio_k)
+    if video_k_cap is not None:
+        video_k = min(video_k, video_k_cap)
+    if video_k < _COMPRESS_MIN_VIDEO_K:
+        return None
+    width, height = info.dimensions
+    source_short = min(width, height)
+    short_side = next((side for side, min_k in _COMPRESS_LADDER if side <= source_short and video_k >= min_k), 240)
+    return {'video_k': video_k, 'audio_k': audio_k, 'short_side': min(short_side, source_short)}
+
+
+def _compress_cmds(
+    input_path: str,
+    output_path: str,
+    info: media_probe.MediaInfo,
+    plan: Dict[str, Any],
+    passlog: str,
+) -> List[List[str]]:
+    """Команды ffmpeg: два прохода ABR (COMPRESS_TWO_PASS) или один CRF с потолком битрейта."""
+    width, height = info.dimensions
+    side = plan['short_side']
+    video_k = plan['video_k']
+    scale = []
+    if side < min(width, height):
+        scale = ['-vf', f'scale=-2:{side}' if width >= height else f'scale={side}:-2']
+    video = ['-map', '0:v:0', '-c:v', 'libx264', '-preset', COMPRESS_PRESET, '-pix_fmt', 'yuv420p', *scale]
+    if plan['audio_k']:
+        audio = ['-map', '0:a:0', '-c:a', 'aac', '-b:a', f"{plan['audio_k']}k"]
+    else:
+        audio = ['-an']
+    tail = ['-movflags', '+faststart', output_path]
+
+    if not COMPRESS_TWO_PASS:
+        rate = ['-crf', '23', '-maxrate', f'{video_k}k', '-bufsize', f'{video_k * 2}k']
+        return [['ffmpeg', '-y', '-i', input_path, *video, *rate, *audio, *tail]]
+
+    rate = ['-b:v', f'{video_k}k', '-maxrate', f'{int(video_k * 1.5)}k', '-bufsize', f'{video_k * 2}k',
+            '-passlogfile', passlog]
+    return [
+        ['ffmpeg', '-y', '-i', input_path, *video, *rate, '-pass', '1', '-an', '-f', 'mp4', os.devnull],
+        ['ffmpeg', '-y', '-i', input_path, *video, *rate, '-pass', '2', *audio, *tail],
+    ]
+
+
+def compress_to_size(
+    input_path: str,
+    output_path: str,
+    max_size_mb: float,
+    timeout: Optional[float] = None,
+) -> Optional[str]:
+    """
+    Сжимает видео в H.264/AAC так, чтобы результат гарантированно был не больше max_size_mb.
+
+    Битрейт видео считается из длительности и бюджета за вычетом звука; при низком битрейте
+    разрешение спускается по лестнице 1080→240. Если результат всё же вышел больше — битрейт
+    уменьшается пропорционально перебору и кодирование повторяется (до _COMPRESS_ATTEMPTS раз).
+
+    Returns:
+        output_path или None (длительность неизвестна, бюджета не хватает, ошибка ffmpeg)
+    """
+    info = media_probe.probe_sync(input_path)
+    if info is None or not info.video_codec:
+        logger.error(f"compress_to_size: no video stream in {input_path}")
+        return None
+    plan = plan_compression(info, max_size_mb)
+    if plan is None:
+        logger.error(f"compress_to_size: {input_path} cannot fit into {max_size_mb} MB")
+        return None
+
+    limit = max_size_mb * 1024 * 1024
+    workdir = tempfile.mkdtemp(prefix='compress_')
+    try:
+        for attempt in range(1, _COMPRESS_ATTEMPTS + 1):
+            logger.info(f"compress_to_size: {input_path} -> {max_size_mb} MB, attempt {attempt}, plan {plan}")
+            for cmd in _compress_cmds(input_path, output_path, info, plan, os.path.join(workdir, 'x264')):
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+                if result.returncode != 0:
+                    logger.error(f"FFmpeg error: {result.stderr[-2000:]}")
+                    break
+            else:
+                size = os.path.getsize(output_path)
+                if size <= limit:
+                    logger.info(f"compress_to_size: {size / 1024 / 1024:.1f} MB in {attempt} attempt(s)")
+                    return output_path
+                plan = plan_compression(info, max_size_mb, int(plan['video_k'] * limit / size * 0.95))
+                if plan is not None:
+                    continue
+            break
+    except subprocess.TimeoutExpired:
+        logger.error(f"FFmpeg timeout ({timeout}s): {input_path}")
+    except Exception as e:
+        logger.error(f"compress_to_size failed: {e}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if os.path.isfile(output_path):
+        try:
+            os.remove(output_path)
+        except OSError:
+            pass
+    return None
+
+
 # ==================== Watermark ====================
 
 def add_watermark(
@@ -1749,7 +2220,7 @@ def add_watermark(
     
     Args:
         input_path: Путь к исходному видео
-        output_path: Путь для сохранения (если None, создаётся автоматически)
+        output_path: Путь для сохранения (если None — рядом с исходником, <имя>_wm.mp4)
         text: Текст водяного знака
         fontsize: Размер шрифта
         opacity: Прозрачность (0.0 - 1.0)
@@ -1760,42 +2231,26 @@ def add_watermark(
     if not os.path.isfile(input_path):
         logger.error(f"add_watermark: file not found: {input_path}")
         return None
+
+    info = media_probe.probe_sync(input_path)
+    if info is not None and not info.video_codec:
+        logger.error(f"add_watermark: no video stream in {input_path}")
+        return None
     
     if output_path is None:
-        base, ext = os.path.splitext(input_path)
-        output_path = f"{base}_wm{ext}"
-    
-    try:
-        # FFmpeg команда для добавления текста в правый нижний угол
-        cmd = [
-            'ffmpeg', '-y',
-            '-i', input_path,
-            '-vf', f"drawtext=text='{text}':fontsize={fontsize}:fontcolor=white@{opacity}:x=w-tw-10:y=h-th-10:shadowcolor=black@0.5:shadowx=1:shadowy=1",
-            '-codec:a', 'copy',
-            '-preset', 'ultrafast',
-            output_path
-        ]
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        
-        if result.returncode == 0 and os.path.isfile(output_path):
-            logger.info(f"Watermark added successfully: {output_path}")
-            return output_path
-        else:
-            logger.error(f"FFmpeg watermark failed: {result.stderr}")
-            return None
-            
-    except subprocess.TimeoutExpired:
-        logger.error("FFmpeg watermark timeout")
-        return None
-    except Exception as e:
-        logger.error(f"Error adding watermark: {e}")
-        return None
+        # Видео перекодируется в H.264 + AAC — контейнер всегда mp4 (в .webm такие потоки не лягут)
+        output_path = f"{os.path.splitext(input_path)[0]}_wm.mp4"
+    
+    result = postprocess_media(
+        input_path,
+        output_path,
+        timeout=120,
+        watermark=_watermark_filter(text, fontsize, opacity),
+        preset='ultrafast',
+    )
+    if result:
+        logger.info(f"Watermark added successfully: {output_path}")
+    return result
 
 
 def add_watermark_if_needed(
@@ -1968,7 +2423,7 @@ async def recognize_and_download(audio_path: str, output_dir: str = "./audio/sha
     
     # Ищем на YouTube
     query = recognized['youtube_query']
-    search_results = search_videos(query, max_results=1)
+    search_results = await search_videos(query, max_results=1)
     
     if not search_results:
         logger.warning(f"No YouTube results for: {query}")
@@ -1999,6 +2454,12 @@ async def recognize_and_download(audio_path: str, output_dir: str = "./audio/sha
 
 
 if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "queue":
+        # Consumer очереди скачиваний (JOB_QUEUE_BACKEND=sqlite/postgres): python worker.py queue [N]
+        from jobs import serve
+        serve(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+        sys.exit(0)
     print("Welcome to audio/video helper!")
     print("To download youtube video input 1\nTo extract audio from video input 2\nTo download audio from youtube "
           "input 3\nTo download reels from instagram input 4\nTo change audio on video input 5\nTo download TikTok input 6 \n"
@@ -2035,7 +2496,7 @@ if __name__ == "__main__":
         #downloader.list_formats(link)
     elif choise == 7:
         text = input("Give me what u want to find: ")
-        res = search_videos(text)
+        res = asyncio.run(search_videos(text))
         for item in res:
             print(f"{item['title']}\n - https://www.youtube.com/watch?v={item['id']}\n")
     elif choise == 8:
@@ -0,0 +1,205 @@
+"""
+Рабочие папки задач скачивания.
+
+Каждая задача очереди (jobs.run_job) получает свою папку WORKSPACE_ROOT/<задача>-<id>: файлы параллельных
+загрузок не пересекаются по имени, а всё, что осталось от упавшей задачи, лежит в одном месте.
+Мелкие задачи (звук) при WORKSPACE_TMPFS_DIR кладутся в tmpfs.
+
+Допуск: задача стартует, только если (занято в WORKSPACE_ROOT + резервы запущенных задач + её резерв)
+укладывается в WORKSPACE_DISK_BUDGET_MB и на диске остаётся WORKSPACE_MIN_FREE_MB; иначе ждёт
+до WORKSPACE_ADMISSION_TIMEOUT сек, пока место освободится.
+
+Уборщик (start_janitor) раз в WORKSPACE_JANITOR_INTERVAL сек удаляет папки задач старше WORKSPACE_TTL,
+пустые папки (обработчик уже удалил файл после доставки) и забытые файлы в старых общих папках.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Set
+
+from data.config import (
+    WORKSPACE_ADMISSION_TIMEOUT,
+    WORKSPACE_DISK_BUDGET_MB,
+    WORKSPACE_JANITOR_INTERVAL,
+    WORKSPACE_MIN_FREE_MB,
+    WORKSPACE_ROOT,
+    WORKSPACE_TMPFS_DIR,
+    WORKSPACE_TMPFS_BUDGET_MB,
+    WORKSPACE_TTL,
+)
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+# Общие папки, куда файлы попадают в обход рабочих папок (загрузки пользователей, API, старые задачи)
+LEGACY_DIRS = ("./videos", "./audio", "./metadata")
+_EMPTY_GRACE = 300  # пустую папку не трогаем первые 5 мин — задача могла только что её создать
+
+_reserved = {"disk": 0, "tmpfs": 0}
+_active: Set[str] = set()
+_cond: Optional[asyncio.Condition] = None
+_janitor: Optional[asyncio.Task] = None
+
+
+class DiskBudgetExceeded(Exception):
+    """Место под задачу не освободилось за WORKSPACE_ADMISSION_TIMEOUT."""
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        total += _dir_size(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_blocks * 512
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return total
+
+
+def _fits(root: str, pool: str, budget_mb: float, need: int) -> bool:
+    os.makedirs(root, exist_ok=True)
+    used = _dir_size(root) + _reserved[pool]
+    if used + need > budget_mb * _MB:
+        return False
+    free = shutil.disk_usage(root).free - _reserved[pool]
+    return free - need >= WORKSPACE_MIN_FREE_MB * _MB
+
+
+def _tmpfs_root() -> Optional[str]:
+    if not WORKSPACE_TMPFS_DIR:
+        return None
+    parent = os.path.dirname(os.path.abspath(WORKSPACE_TMPFS_DIR))
+    return WORKSPACE_TMPFS_DIR if os.path.isdir(parent) else None
+
+
+async def _admit(need: int, small: bool) -> tuple:
+    """Дождаться места; возвращает (корень, пул) и записывает резерв."""
+    global _cond
+    if _cond is None:
+        _cond = asyncio.Condition()
+    tmpfs = _tmpfs_root() if small else None
+    deadline = time.monotonic() + WORKSPACE_ADMISSION_TIMEOUT
+    waited = False
+    async with _cond:
+        while True:
+            if tmpfs and await asyncio.to_thread(_fits, tmpfs, "tmpfs", WORKSPACE_TMPFS_BUDGET_MB, need):
+                root, pool = tmpfs, "tmpfs"
+                break
+            if await asyncio.to_thread(_fits, WORKSPACE_ROOT, "disk", WORKSPACE_DISK_BUDGET_MB, need):
+                root, pool = WORKSPACE_ROOT, "disk"
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DiskBudgetExceeded(f"no disk budget for {need / _MB:.0f} MB")
+            if not waited:
+                logger.warning(f"workspace: disk budget exhausted, job waits for {need / _MB:.0f} MB")
+                waited = True
+            # Место освобождают и задачи (notify), и обработчики, удаляющие файлы, — поэтому ещё и опрос
+            try:
+                await asyncio.wait_for(_cond.wait(), min(remaining, 2))
+            except asyncio.TimeoutError:
+                pass
+        _reserved[pool] += need
+    return root, pool
+
+
+async def _release(pool: str, need: int) -> None:
+    _reserved[pool] -= need
+    async with _cond:
+        _cond.notify_all()
+
+
+@asynccontextmanager
+async def job_workspace(kind: str, reserve_mb: float, small: bool = False) -> AsyncIterator[str]:
+    """
+    Папка под одну задачу. Резерв места держится, пока задача идёт; дальше файлы учитываются по факту.
+    Если задача упала — папка удаляется сразу; иначе результат в ней ждёт доставки (и уборщика).
+    """
+    need = int(reserve_mb * _MB)
+    root, pool = await _admit(need, small)
+    path = os.path.join(root, f"{kind}-{uuid.uuid4().hex[:12]}")
+    os.makedirs(path, exist_ok=True)
+    _active.add(os.path.abspath(path))
+    ok = False
+    try:
+        yield path
+        ok = True
+    finally:
+        _active.discard(os.path.abspath(path))
+        if not ok:
+            shutil.rmtree(path, ignore_errors=True)
+        await _release(pool, need)
+
+
+def _has_files(path: str) -> bool:
+    """Есть ли в папке хоть один файл (пустые подпапки вроде src/ не в счёт)."""
+    return any(filenames for _, _, filenames in os.walk(path))
+
+
+def sweep(ttl: float = WORKSPACE_TTL) -> int:
+    """Удалить устаревшие рабочие папки и забытые файлы; возвращает число удалённых объектов."""
+    now = time.time()
+    removed = 0
+    for root in filter(None, (WORKSPACE_ROOT, _tmpfs_root())):
+        if not os.path.isdir(root):
+            continue
+        for entry in os.scandir(root):
+            try:
+                if not entry.is_dir(follow_symlinks=False) or os.path.abspath(entry.path) in _active:
+                    continue
+                age = now - entry.stat(follow_symlinks=False).st_mtime
+                if age > ttl or (age > _EMPTY_GRACE and not _has_files(entry.path)):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                continue
+    for legacy in LEGACY_DIRS:
+        for dirpath, _, filenames in os.walk(legacy):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    # ctime: жёсткая ссылка (ingest из хранилища Bot API) сохраняет старый mtime оригинала,
+                    # но обновляет ctime — свежий файл пользователя не удаляется сразу
+                    st = os.stat(path)
+                    if now - max(st.st_mtime, st.st_ctime) > ttl:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+    if removed:
+        logger.info(f"workspace: janitor removed {removed} stale item(s)")
+    return removed
+
+
+async def _janitor_loop() -> None:
+    while True:
+        try:
+            await asyncio.to_thread(sweep)
+        except Exception as e:
+            logger.warning(f"workspace: janitor failed: {e}")
+        await asyncio.sleep(WORKSPACE_JANITOR_INTERVAL)
+
+
+async def start_janitor() -> None:
+    """Запустить уборщика в текущем event loop'е (на старте бота / API)."""
+    global _janitor
+    if _janitor is None or _janitor.done():
+        _janitor = asyncio.create_task(_janitor_loop())
+
+
+async def stop_janitor() -> None:
+    global _janitor
+    if _janitor is not None:
+        _janitor.cancel()
+        _janitor = None
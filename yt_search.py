@@ -0,0 +1,169 @@
+"""
+Поиск YouTube без блокировки event loop'а: общий для бота (search_videos) и Mini App (search_youtube_music_candidates).
+
+Страница выдачи запрашивается через общий aiohttp-пул; на поиск не больше YT_SEARCH_ATTEMPTS попыток
+по YT_SEARCH_TIMEOUT сек (сначала через http(s)-прокси, если он задан, затем напрямую), одновременно
+к YouTube — не больше YT_SEARCH_CONCURRENCY запросов. Разобранная выдача кешируется на YT_SEARCH_CACHE_TTL сек
+по нормализованному запросу (регистр и пробелы не важны); одинаковые запросы, пришедшие одновременно,
+ждут один поход в YouTube. Формат результатов — как у youtube-search (id, title, channel, duration, ...).
+"""
+
+import asyncio
+import json
+import logging
+import re
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from cache_utils import LoopSession, SingleFlight
+from data.config import YT_SEARCH_ATTEMPTS, YT_SEARCH_CACHE_TTL, YT_SEARCH_CONCURRENCY, YT_SEARCH_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+_SEARCH_URL = "https://www.youtube.com/results?search_query={}"
+_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/124.0 Safari/537.36"
+    ),
+    "Accept-Language": "en-US,en;q=0.9",
+}
+_INITIAL_DATA = re.compile(r"ytInitialData\"?\]?\s*=\s*")
+_CACHE_SIZE = 512
+
+_semaphore: Optional[asyncio.Semaphore] = None
+# нормализованный запрос → (monotonic-время, результаты)
+_cache: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+_inflight = SingleFlight()
+
+
+def _new_session() -> aiohttp.ClientSession:
+    global _semaphore
+    # Семафор привязан к loop'у так же, как сессия, — создаётся вместе с ней
+    _semaphore = asyncio.Semaphore(YT_SEARCH_CONCURRENCY)
+    return aiohttp.ClientSession(
+        headers=_HEADERS,
+        cookies={"CONSENT": "YES+1"},
+        connector=aiohttp.TCPConnector(limit=YT_SEARCH_CONCURRENCY, keepalive_timeout=60),
+        timeout=aiohttp.ClientTimeout(total=YT_SEARCH_TIMEOUT),
+    )
+
+
+_session = LoopSession(_new_session)
+
+
+async def close_session() -> None:
+    """Закрыть общую сессию (в конце своего event loop'а, при остановке бота / API)."""
+    await _session.close()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").split()).casefold()
+
+
+def _text(node: Dict[str, Any]) -> Optional[str]:
+    if not node:
+        return None
+    if "simpleText" in node:
+        return node["simpleText"]
+    runs = node.get("runs") or [{}]
+    return runs[0].get("text")
+
+
+def parse_results(html: str) -> Optional[List[Dict[str, Any]]]:
+    """Видео из ytInitialData страницы выдачи; None — страница без ytInitialData (капча, заглушка согласия)."""
+    match = _INITIAL_DATA.search(html)
+    if not match:
+        return None
+    try:
+        data, _ = json.JSONDecoder().raw_decode(html, match.end())
+        sections = (
+            data["contents"]["twoColumnSearchResultsRenderer"]["primaryContents"]
+            ["sectionListRenderer"]["contents"]
+        )
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    results = []
+    for section in sections:
+        for item in section.get("itemSectionRenderer", {}).get("contents", []):
+            video = item.get("videoRenderer")
+            if not video or not video.get("videoId"):
+                continue
+            results.append({
+                "id": video["videoId"],
+                "thumbnails": [t.get("url") for t in video.get("thumbnail", {}).get("thumbnails", [])],
+                "title": _text(video.get("title")),
+                "long_desc": _text(video.get("descriptionSnippet")),
+                "channel": _text(video.get("longBylineText")),
+                "duration": _text(video.get("lengthText")) or 0,
+                "views": _text(video.get("viewCountText")) or 0,
+                "publish_time": _text(video.get("publishedTimeText")) or 0,
+                "url_suffix": video.get("navigationEndpoint", {}).get("commandMetadata", {})
+                .get("webCommandMetadata", {}).get("url"),
+            })
+        if results:
+            break
+    return results
+
+
+async def _fetch_page(url: str, proxy: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    session = await _session.get()
+    async with _semaphore:
+        async with session.get(url, proxy=proxy) as resp:
+            if resp.status != 200:
+                logger.warning(f"YouTube search: HTTP {resp.status}")
+                return None
+            html = await resp.text()
+    return await asyncio.to_thread(parse_results, html)
+
+
+async def _fetch(query: str, proxy: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    """Не больше YT_SEARCH_ATTEMPTS запросов; None — YouTube так и не отдал выдачу."""
+    url = _SEARCH_URL.format(urllib.parse.quote_plus(query))
+    # aiohttp умеет только http(s)-прокси; socks — сразу напрямую
+    routes = [proxy] if proxy and proxy.startswith(("http://", "https://")) else []
+    routes.append(None)
+    for attempt in range(max(1, YT_SEARCH_ATTEMPTS)):
+        route = routes[min(attempt, len(routes) - 1)]
+        try:
+            results = await _fetch_page(url, route)
+            if results is not None:
+                return results
+            logger.warning(f"YouTube search: no ytInitialData (attempt {attempt + 1})")
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            logger.warning(f"YouTube search {'via proxy' if route else 'direct'} failed: {e!r}")
+        await asyncio.sleep(0.5 * (attempt + 1))
+    return None
+
+
+async def search(query: str, max_results: int = 10, proxy: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Выдача YouTube по запросу (первые max_results видео); [] — ничего не найдено или YouTube недоступен.
+
+    Args:
+        proxy: http(s)-прокси для первой попытки (остальные — напрямую)
+    """
+    key = normalize_query(query)
+    if not key:
+        return []
+    cached = _cache.get(key)
+    if cached and time.monotonic() - cached[0] < YT_SEARCH_CACHE_TTL:
+        _cache.move_to_end(key)
+        return [dict(item) for item in cached[1][:max_results]]
+
+    async def fetch_and_cache() -> Optional[List[Dict[str, Any]]]:
+        results = await _fetch(query.strip(), proxy)
+        if results is not None:
+            _cache[key] = (time.monotonic(), results)
+            _cache.move_to_end(key)
+            while len(_cache) > _CACHE_SIZE:
+                _cache.popitem(last=False)
+        return results
+
+    results = await _inflight.run(key, fetch_and_cache)
+    return [dict(item) for item in (results or [])[:max_results]]